@@ -11,6 +11,7 @@ from services.database_service import DatabaseService
 from routes.auth import auth_bp
 from routes.main import main_bp
 from routes.api import api_bp
+from utils import sqlite_profile
 from utils.logging_config import setup_logging
 from utils.error_handlers import register_error_handlers
 
@@ -29,8 +30,14 @@ def create_app(config_name='default'):
     if logging.getLogger("requests"):
         logging.getLogger("requests").setLevel(logging.ERROR)
     
-    # Initialize database
+    # Initialize database, with the engine options and pragmas of the SQLite profile
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        **sqlite_profile.engine_options(app.config),
+        **app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}),
+    }
     db.init_app(app)
+    with app.app_context():
+        sqlite_profile.register_pragmas(db.engine, app.config)
     
     # Register blueprints
     app.register_blueprint(auth_bp)
@@ -56,7 +63,7 @@ def create_app(config_name='default'):
             "main.dashboard", "main.load", "main.wait", "main.display"
         }
         public_endpoints = {
-            "api.status", "api.health_check", "api.debug_routes", "auth.index", "auth.login", "auth.callback"
+            "api.status", "api.health_check", "api.rate_limit", "api.debug_routes", "auth.index", "auth.login", "auth.callback"
         }
         
         # Log current request for debugging
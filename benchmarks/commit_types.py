@@ -0,0 +1,116 @@
+"""
+Micro-benchmark of the conventional commit classifier against the implementation it replaced.
+
+Run from the project root:
+
+    python -m benchmarks.commit_types [--messages 50000] [--repeat 5]
+
+Both implementations classify the same synthetic messages, a mix of conventional prefixes,
+aliases in free text, and messages of no type. That they give the same labels is tested in
+`tests.test_commit_type`.
+"""
+
+import argparse
+import random
+import re
+import time
+
+from utils.commit_type import CONVENTIONAL_TYPES, classify, classify_many
+
+_WORDS = [
+    "update", "readme", "add", "support", "for", "the", "parser", "remove", "unused",
+    "code", "bump", "version", "merge", "branch", "main", "into", "dev", "handle", "empty",
+    "input", "release", "notes", "config", "tweak", "typo", "layout", "Docs", "CI",
+]
+
+
+def legacy_commit_type(message: str) -> str:
+    """The classifier as it was before `utils.commit_type`, kept as the reference."""
+    commit_type = re.split(r"[:(!/\s]", message)[0].lower()
+    conventional_types = {
+        "feat": ["feature", "feat", "features", "feats"],
+        "fix": ["fix"],
+        "docs": ["docs", "doc", "documentation"],
+        "style": ["style", "styles"],
+        "refactor": ["refactor", "refactors", "refact"],
+        "test": ["test", "tests"],
+        "chore": ["chore", "chores"],
+        "perf": ["perf", "performance"],
+        "build": ["build", "builds"],
+        "revert": ["revert"],
+        "ci": ["ci", "cicd", "pipeline", "pipelines", "cd"],
+    }
+    for key, value in conventional_types.items():
+        if commit_type in value:
+            return key
+    for key, value in conventional_types.items():
+        for v in value:
+            if v in message:
+                return key
+    return "others"
+
+
+def make_messages(count: int, seed: int = 0) -> list:
+    """
+    Generate synthetic commit messages.
+
+    Args:
+        count (int): The number of messages.
+        seed (int): The random seed.
+
+    Returns:
+        list: The messages.
+    """
+    rng = random.Random(seed)
+    aliases = [alias for values in CONVENTIONAL_TYPES.values() for alias in values]
+    messages = []
+    for _ in range(count):
+        words = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(2, 8)))
+        kind = rng.random()
+        if kind < 0.4:
+            alias = rng.choice(aliases)
+            alias = alias.upper() if rng.random() < 0.1 else alias
+            scope = f"({rng.choice(_WORDS)})" if rng.random() < 0.3 else ""
+            messages.append(f"{alias}{scope}{rng.choice([':', '!:', '/'])} {words}")
+        elif kind < 0.7:
+            messages.append(f"{words} {rng.choice(aliases)} {words}")
+        else:
+            messages.append(words.capitalize())
+    return messages
+
+
+def _best_of(repeat: int, fn, messages: list) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(messages)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    """
+    Run the benchmark and print the time per message of each implementation.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages)
+    timings = {
+        "legacy": _best_of(
+            args.repeat, lambda ms: [legacy_commit_type(m) for m in ms], messages
+        ),
+        "classify": _best_of(args.repeat, lambda ms: [classify(m) for m in ms], messages),
+        "classify_many": _best_of(args.repeat, classify_many, messages),
+    }
+    for name, seconds in timings.items():
+        print(
+            f"{name:>14}: {seconds * 1e9 / len(messages):8.1f} ns/message"
+            f"  {timings['legacy'] / seconds:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
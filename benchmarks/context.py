@@ -0,0 +1,124 @@
+"""
+Benchmark of `build_context` against the multi-pass implementation it replaced.
+
+Run from the project root:
+
+    python -m benchmarks.context [--repos 500] [--commits 200000] [--repeat 3]
+
+Both implementations get the same synthetic account, see `benchmarks.synthetic`. The
+contexts are checked to be identical before the timings are printed.
+"""
+
+import argparse
+import time
+from datetime import datetime
+
+import pytz
+
+from benchmarks.commit_types import legacy_commit_type
+from benchmarks.synthetic import make_github_info
+from utils.context import _summarize, build_context
+
+
+def _legacy_parse_time(time_str: str, timezone: pytz.BaseTzInfo) -> str:
+    try:
+        return (
+            datetime.strptime(time_str, "%Y-%m-%dT%H:%M:%SZ")
+            .replace(tzinfo=pytz.UTC)
+            .astimezone(timezone)
+            .isoformat()
+        )
+    except ValueError:
+        return datetime(2000, 1, 1).isoformat()
+
+
+def legacy_build_context(data: dict, username: str, year: int, time_zone: str) -> dict:
+    """`build_context` as it was before `ContextAggregator`, kept as the reference."""
+    commit_type = [
+        legacy_commit_type(commit["messageHeadline"])
+        for _, detail in data["repo"].items()
+        for commit in detail["commits"]
+    ]
+    commit_type_num = {k: commit_type.count(k) for k in set(commit_type)}
+    if "others" in commit_type_num:
+        commit_type_num.pop("others", None)
+
+    commit_time = [
+        datetime.fromisoformat(
+            _legacy_parse_time(commit["committedDate"], pytz.timezone(time_zone))
+        ).hour
+        for _, detail in data["repo"].items()
+        for commit in detail["commits"]
+    ]
+    commit_time_num = [0] * 24
+    for hour in commit_time:
+        commit_time_num[hour] += 1
+
+    new_repos = [
+        detail
+        for _, detail in data["repo"].items()
+        if datetime.fromisoformat(
+            _legacy_parse_time(detail["createdAt"], pytz.timezone(time_zone))
+        ).year
+        == year
+    ]
+    language_in_new_repos = [
+        language for repo in new_repos for language in repo["languages"]
+    ]
+    language_in_new_repos_count = {
+        k: language_in_new_repos.count(k) for k in set(language_in_new_repos)
+    }
+
+    stars_num = sum(detail["stargazerCount"] for _, detail in data["repo"].items())
+    repo_commits_num = {
+        repo: len(detail["commits"]) for repo, detail in data["repo"].items()
+    }
+
+    return _summarize(
+        data["basic"],
+        data["contribution"],
+        username,
+        year,
+        commit_type_num,
+        commit_time_num,
+        language_in_new_repos_count,
+        stars_num,
+        repo_commits_num,
+    )
+
+
+def _best_of(repeat: int, fn, *args) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    """
+    Run the benchmark and print the time of each implementation.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repos", type=int, default=500)
+    parser.add_argument("--commits", type=int, default=200000)
+    parser.add_argument("--year", type=int, default=2023)
+    parser.add_argument("--time-zone", default="America/New_York")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    data = make_github_info(args.repos, args.commits, args.year)
+    arguments = (data, "synthetic", args.year, args.time_zone)
+    if build_context(*arguments) != legacy_build_context(*arguments):
+        raise SystemExit("build_context differs from the legacy implementation")
+
+    legacy = _best_of(args.repeat, legacy_build_context, *arguments)
+    current = _best_of(args.repeat, build_context, *arguments)
+    print(f"{args.repos} repos, {args.commits} commits")
+    print(f"        legacy: {legacy:8.3f} s")
+    print(f" build_context: {current:8.3f} s  {legacy / current:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+A local fake of the GitHub GraphQL API, serving a synthetic account to the fetch layer.
+
+It answers the queries of `utils.fetch_data` (basic info, contributions, repository pages with
+or without history, and aliased commit and language batches) from data in the shape of
+`get_github_info`, see `benchmarks.synthetic`. Commit pages honour `since`, `until`, `after`
+and the requested commit fields, so crawls behave like against GitHub, minus the network.
+
+Classes:
+    FakeGitHubServer:
+        A threaded HTTP server answering GraphQL queries about one account.
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config.config import Config
+from utils.query_fields import COMMIT_FIELDS
+
+_PAGE_SIZE = re.compile(r"repositories\(first: (\d+)")
+_ALIAS = re.compile(r"r(\d+): repository\(name: \$name(\d+)\)")
+_RATE_LIMIT = {"cost": 1, "remaining": 4999, "resetAt": "2099-01-01T00:00:00Z"}
+
+
+class _Repository:
+    """A repository of the account, with its commits in ascending `committedDate` order."""
+
+    def __init__(self, name: str, detail: dict):
+        self.name = name
+        self.detail = detail
+        self.commits = sorted(detail["commits"], key=lambda commit: commit["committedDate"])
+        self.dates = [commit["committedDate"] for commit in self.commits]
+
+    def node(self) -> dict:
+        """Get the `repositories` node of the repository, without its history."""
+        return {
+            "name": self.name,
+            "stargazerCount": self.detail["stargazerCount"],
+            "forkCount": self.detail["forkCount"],
+            "isPrivate": self.detail["isPrivate"],
+            "isFork": self.detail["isFork"],
+            "createdAt": self.detail["createdAt"],
+            "pushedAt": self.detail["pushedAt"],
+        }
+
+    def history(self, since: str, until: str, after: str, fields: list) -> dict:
+        """
+        Get the page of the commit history from `since` to `until` after the cursor `after`,
+        with the given fields of each commit.
+        """
+        # Newest first, like GitHub; the cursor is the offset in the filtered history
+        low = bisect_left(self.dates, since)
+        high = bisect_right(self.dates, until)
+        start = int(after or 0)
+        end = min(start + 100, high - low)
+        page = [self.commits[high - 1 - i] for i in range(start, end)]
+        return {
+            "nodes": [_commit_node(commit, fields) for commit in page],
+            "pageInfo": {
+                "hasNextPage": end < high - low,
+                "startCursor": str(start),
+                "endCursor": str(end),
+            },
+        }
+
+
+def _commit_node(commit: dict, fields: list) -> dict:
+    node = {}
+    for field in fields:
+        if field in ("message", "messageHeadline"):
+            node[field] = commit["messageHeadline"]
+        elif field == "messageBody":
+            node[field] = ""
+        elif field in ("committedDate", "authoredDate"):
+            node[field] = commit["committedDate"]
+        elif field == "oid":
+            node[field] = hashlib.sha1(commit["committedDate"].encode("utf-8")).hexdigest()
+        else:
+            node[field] = 1
+    return node
+
+
+class FakeGitHubServer:  # pylint: disable=too-many-instance-attributes
+    """
+    A threaded HTTP server answering GraphQL queries about one account.
+
+    Use it as a context manager: `Config.GITHUB_GRAPHQL_URL` points to the server inside it.
+
+    Args:
+        data (dict): The GitHub information of the account, see `benchmarks.synthetic`.
+        latency (float): Seconds to wait before answering each query.
+    """
+
+    def __init__(self, data: dict, latency: float = 0):
+        self.data = data
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._repos = [_Repository(name, detail) for name, detail in data["repo"].items()]
+        self._repos.sort(key=lambda repo: repo.detail["pushedAt"], reverse=True)
+        self._by_name = {repo.name: repo for repo in self._repos}
+        self._server = None
+        self._previous_url = None
+
+    def __enter__(self) -> "FakeGitHubServer":
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Answer GraphQL queries with `FakeGitHubServer.answer`."""
+
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately, which Nagle would delay on keep-alive
+            disable_nagle_algorithm = True
+
+            def do_POST(self):  # pylint: disable=invalid-name
+                """Answer a GraphQL query with the GitHub rate limit headers."""
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                content = json.dumps(
+                    {"data": server.answer(body["query"], body.get("variables") or {})}
+                ).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.send_header("X-RateLimit-Limit", "5000")
+                self.send_header("X-RateLimit-Remaining", "4999")
+                self.send_header("X-RateLimit-Reset", str(int(time.time()) + 3600))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *_args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self._previous_url = Config.GITHUB_GRAPHQL_URL
+        Config.GITHUB_GRAPHQL_URL = f"http://127.0.0.1:{self._server.server_port}/graphql"
+        return self
+
+    def __exit__(self, *_exc):
+        Config.GITHUB_GRAPHQL_URL = self._previous_url
+        self._server.shutdown()
+        self._server.server_close()
+
+    def answer(self, query: str, variables: dict) -> dict:
+        """
+        Answer a GraphQL query.
+
+        Args:
+            query (str): The query, one of those of `utils.fetch_data`.
+            variables (dict): The query variables.
+
+        Returns:
+            dict: The `data` of the response.
+        """
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        data = {"rateLimit": dict(_RATE_LIMIT)} if "rateLimit" in query else {}
+        if "contributionsCollection" in query:
+            data["user"] = {"contributionsCollection": self._contributions()}
+        elif "followers" in query:
+            data["viewer"] = {"id": self.data["basic"]["id"]}
+            data["user"] = self._basic()
+        elif "repositories(" in query:
+            data["user"] = {"repositories": self._repositories(query, variables)}
+        else:
+            data["user"] = self._batch(query, variables)
+        return data
+
+    def _basic(self) -> dict:
+        basic = self.data["basic"]
+        return {
+            "id": basic["id"],
+            "name": basic["name"],
+            "avatarUrl": basic["avatar_url"],
+            "followers": {"totalCount": basic["follower"]},
+            "following": {"totalCount": basic["following"]},
+            "createdAt": basic["created_time"],
+        }
+
+    def _contributions(self) -> dict:
+        contribution = self.data["contribution"]
+        days = contribution["contribution"]
+        return {
+            "totalPullRequestContributions": contribution["pr_num"],
+            "totalIssueContributions": contribution["issue_num"],
+            "totalCommitContributions": contribution["commit_num"],
+            "contributionCalendar": {
+                "totalContributions": contribution["contribution_num"],
+                "weeks": [
+                    {"contributionDays": [{"contributionCount": n} for n in days[i : i + 7]]}
+                    for i in range(0, len(days), 7)
+                ],
+            },
+        }
+
+    def _repositories(self, query: str, variables: dict) -> dict:
+        first = int(_PAGE_SIZE.search(query).group(1))
+        start = int(variables.get("after") or 0)
+        page = self._repos[start : start + first]
+        fields = _commit_fields(query)
+        nodes = []
+        for repo in page:
+            node = repo.node()
+            if "history(" in query:
+                history = repo.history(variables["since"], variables["until"], None, fields)
+                node["defaultBranchRef"] = {"target": {"history": history}}
+            else:
+                node["defaultBranchRef"] = {"name": "main"}
+            nodes.append(node)
+        return {
+            "nodes": nodes,
+            "pageInfo": {
+                "hasNextPage": start + first < len(self._repos),
+                "startCursor": str(start),
+                "endCursor": str(start + len(page)),
+            },
+        }
+
+    def _batch(self, query: str, variables: dict) -> dict:
+        fields = _commit_fields(query)
+        user = {}
+        for alias, index in _ALIAS.findall(query):
+            repo = self._by_name.get(variables[f"name{index}"])
+            if repo is None:
+                user[f"r{alias}"] = None
+            elif "languages(" in query:
+                user[f"r{alias}"] = {
+                    "languages": {"nodes": [{"name": name} for name in repo.detail["languages"]]}
+                }
+            else:
+                history = repo.history(
+                    variables[f"since{index}"],
+                    variables["until"],
+                    variables[f"after{index}"],
+                    fields,
+                )
+                user[f"r{alias}"] = {"defaultBranchRef": {"target": {"history": history}}}
+        return user
+
+
+def _commit_fields(query: str) -> list:
+    return [field for field in COMMIT_FIELDS if re.search(rf"\b{field}\b", query)]
@@ -0,0 +1,231 @@
+"""
+Concurrency stress test of the report database under each SQLite profile.
+
+Run from the project root:
+
+    python -m benchmarks.sqlite_stress [--profiles default,tuned] [--writers 32] [--jobs 10]
+
+For every profile, an app is created on a fresh database file, and `--writers` threads each
+run `--jobs` report jobs through `DatabaseService` the way background jobs do: take the job
+lease, save checkpoints and renew the lease, save the facts and the context, and release
+the lease. Meanwhile `--readers` threads read contexts like the wait and display pages, every
+`--read-interval` seconds.
+
+Every call that fails, like on "database is locked" or a pool timeout, is counted. The
+commit latencies and throughput of each profile are printed, and the exit status is 1 if
+the tuned profile had a failure.
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+
+from config.config import Config
+from models.models import db
+
+_TIME_ZONES = ["UTC", "Asia/Shanghai", "America/New_York", "Europe/Berlin"]
+
+
+class _Stats:
+    """Latencies and failures of the calls of all threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.failures = 0
+        self.reads = 0
+
+    def call(self, fn, *args):
+        """Call `fn`, recording its latency, and a failure if it raises or returns False."""
+        start = time.perf_counter()
+        try:
+            ok = fn(*args) is not False
+        except Exception:  # pylint: disable=broad-except
+            ok = False
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.latencies.append(elapsed)
+            if not ok:
+                self.failures += 1
+
+
+def _writer(app, stats: _Stats, index: int, jobs: int, checkpoints: int, facts_size: int):
+    # pylint: disable=import-outside-toplevel
+    from services.database_service import DatabaseService
+
+    rng = random.Random(index)
+    state = {"fetch": {"cursor": "x" * 64}, "aggregate": {"commit_time_num": [0] * 24}}
+    context = json.dumps({"commits_per_day": [rng.randrange(20) for _ in range(365)]})
+    facts = os.urandom(facts_size)
+    with app.app_context():
+        for job in range(jobs):
+            username, year, owner = f"user-{index}-{job}", 2023, f"owner-{index}"
+            stats.call(DatabaseService.add_requested_user, username, year)
+            stats.call(DatabaseService.acquire_job_lease, username, year, owner, 60)
+            for _ in range(checkpoints):
+                stats.call(DatabaseService.save_job_checkpoint, username, year, state)
+                stats.call(DatabaseService.renew_job_leases, username, [year], owner, 60)
+            stats.call(DatabaseService.save_user_facts, username, year, facts)
+            stats.call(
+                DatabaseService.add_user_context,
+                username,
+                year,
+                rng.choice(_TIME_ZONES),
+                context,
+            )
+            stats.call(DatabaseService.delete_job_checkpoint, username, year)
+            stats.call(DatabaseService.release_job_leases, username, [year], owner)
+            db.session.remove()
+
+
+def _reader(
+    app, stats: _Stats, index: int, writers: int, interval: float, done: threading.Event
+):
+    # pylint: disable=import-outside-toplevel
+    from services.database_service import DatabaseService
+
+    rng = random.Random(-index - 1)
+    with app.app_context():
+        while not done.is_set():
+            username = f"user-{rng.randrange(writers)}-0"
+            try:
+                DatabaseService.get_user_context(username, 2023, rng.choice(_TIME_ZONES))
+                DatabaseService.get_requested_user(username, 2023)
+                with stats.lock:
+                    stats.reads += 1
+            except Exception:  # pylint: disable=broad-except
+                with stats.lock:
+                    stats.failures += 1
+            db.session.remove()
+            done.wait(interval)
+
+
+def run(
+    profile: str,
+    writers: int,
+    readers: int,
+    jobs: int,
+    checkpoints: int,
+    facts_size: int,
+    read_interval: float,
+) -> dict:
+    """
+    Run the stress test on a fresh database with a SQLite profile.
+
+    Args:
+        profile (str): The SQLite profile, "default" or "tuned".
+        writers (int): The number of threads running report jobs.
+        readers (int): The number of threads reading contexts.
+        jobs (int): The number of jobs of each writer.
+        checkpoints (int): The number of checkpoints saved by each job.
+        facts_size (int): The size of the facts saved by each job, in bytes.
+        read_interval (float): The seconds each reader waits between two reads.
+
+    Returns:
+        dict: The results.
+    """
+    # pylint: disable=import-outside-toplevel
+    import app as app_module
+
+    directory = tempfile.mkdtemp(prefix="sqlite-stress-")
+    Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(directory, 'stress.db')}"
+    Config.SQLITE_PROFILE = profile
+    app = app_module.create_app("production")
+
+    stats = _Stats()
+    done = threading.Event()
+    threads = [
+        threading.Thread(target=_writer, args=(app, stats, i, jobs, checkpoints, facts_size))
+        for i in range(writers)
+    ]
+    reader_threads = [
+        threading.Thread(
+            target=_reader, args=(app, stats, i, writers, read_interval, done)
+        )
+        for i in range(readers)
+    ]
+    start = time.perf_counter()
+    for thread in threads + reader_threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    done.set()
+    for thread in reader_threads:
+        thread.join()
+
+    with app.app_context():
+        journal_mode = db.session.execute(db.text("PRAGMA journal_mode")).scalar()
+        db.session.remove()
+        db.engine.dispose()
+
+    latencies = sorted(stats.latencies)
+    return {
+        "profile": profile,
+        "journal_mode": journal_mode,
+        "writes": len(latencies),
+        "failures": stats.failures,
+        "reads": stats.reads,
+        "seconds": seconds,
+        "writes_per_second": len(latencies) / seconds,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+
+def main() -> None:
+    """
+    Run the stress test with each profile and print the results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--profiles", default="default,tuned")
+    parser.add_argument("--writers", type=int, default=32)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--jobs", type=int, default=10)
+    parser.add_argument("--checkpoints", type=int, default=5)
+    parser.add_argument("--facts-size", type=int, default=256 * 1024)
+    parser.add_argument("--read-interval", type=float, default=0.01,
+                        help="seconds between two reads of a reader")
+    parser.add_argument("--output", help="file to write the JSON results to")
+    args = parser.parse_args()
+
+    # Failed calls are counted here; their errors only go to the log file
+    logging.getLogger().setLevel(logging.CRITICAL)
+
+    results = []
+    for profile in [profile.strip() for profile in args.profiles.split(",") if profile.strip()]:
+        result = run(
+            profile,
+            args.writers,
+            args.readers,
+            args.jobs,
+            args.checkpoints,
+            args.facts_size,
+            args.read_interval,
+        )
+        results.append(result)
+        print(
+            f"{result['profile']:>8} ({result['journal_mode']}): "
+            f"{result['writes']} writes in {result['seconds']:.2f} s "
+            f"({result['writes_per_second']:.0f}/s), "
+            f"p50 {result['p50_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms, "
+            f"max {result['max_ms']:.0f} ms, {result['reads']} reads, "
+            f"{result['failures']} failures",
+            flush=True,
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if any(result["failures"] for result in results if result["profile"] == "tuned"):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
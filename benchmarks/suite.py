@@ -0,0 +1,295 @@
+"""
+Benchmark suite of the context and fetch pipeline on synthetic accounts.
+
+Run from the project root:
+
+    python -m benchmarks.suite [--sizes tiny,small,medium,large] [--output results.json]
+    python -m benchmarks.suite --compare before.json after.json [--threshold 1.2]
+
+For every size, a synthetic account is generated (see `benchmarks.synthetic`) and:
+
+- each stage of `build_context` is timed: commit classification, hour bucketing, calendar
+  statistics, the fold of all repositories into a `ContextAggregator`, the summary, and
+  `build_context` end to end, then the serialization of the raw facts and `render_context`
+  from them;
+- accounts up to `--fetch-max-commits` commits are also crawled from `FakeGitHubServer` with
+  `get_github_info`, `get_context` end to end, and `get_github_info_async` if aiohttp is
+  installed, counting the GraphQL calls.
+
+Every stage is timed `--repeat` times, keeping the fastest, and run once more under
+tracemalloc for its peak memory unless `--no-memory` is given. Results are JSON: the commit,
+Python version and backends of the run, and one record per size and stage, so runs of two
+commits can be compared with `--compare`, which exits with status 1 when a stage taking 5ms
+or more got slower than `--threshold`.
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from benchmarks.fake_github import FakeGitHubServer
+from benchmarks.synthetic import make_github_info
+from config.config import Config
+from utils import calendar_stats, transport
+from utils.commit_type import classify_many
+from utils.context import (
+    COMMIT_FIELDS, _aggregate, build_context, get_context, render_context
+)
+from utils.fetch_data import get_github_info
+from utils.time_buckets import TimezoneBuckets
+
+# Repositories and commits of each size
+SIZES = {
+    "tiny": (10, 100),
+    "small": (50, 1000),
+    "medium": (200, 10000),
+    "large": (500, 100000),
+    "xlarge": (2000, 1000000),
+}
+
+USERNAME = "synthetic"
+TOKEN = "benchmark"
+
+
+def _measure(fn, repeat: int, memory: bool) -> dict:
+    seconds = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        seconds = min(seconds, time.perf_counter() - start)
+    record = {"seconds": seconds, "peak_bytes": None}
+
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            record["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return record
+
+
+def _context_stages(data: dict, year: int, time_zone: str) -> dict:
+    commits = [commit for detail in data["repo"].values() for commit in detail["commits"]]
+    headlines = [commit["messageHeadline"] for commit in commits]
+    dates = [commit["committedDate"] for commit in commits]
+    hours = calendar_stats.hour_histogram(TimezoneBuckets(time_zone, year).hours(dates))
+    aggregator = _aggregate(data, USERNAME, year, time_zone)
+    facts = aggregator.facts()
+
+    return {
+        "classify": lambda: classify_many(headlines),
+        "bucket_hours": lambda: TimezoneBuckets(time_zone, year).hours(dates),
+        "calendar": lambda: calendar_stats.calendar_stats(
+            data["contribution"]["contribution"], hours, year
+        ),
+        "fold": lambda: _aggregate(data, USERNAME, year, time_zone),
+        "summarize": aggregator.result,
+        "build_context": lambda: build_context(data, USERNAME, year, time_zone),
+        "facts": aggregator.facts,
+        "render": lambda: render_context(facts, USERNAME, year, time_zone),
+    }
+
+
+def _fetch_stages(year: int, time_zone: str) -> dict:
+    stages = {
+        "fetch": lambda: get_github_info(USERNAME, TOKEN, year, COMMIT_FIELDS),
+        "get_context": lambda: get_context(USERNAME, TOKEN, year, time_zone),
+    }
+    try:
+        # pylint: disable=import-outside-toplevel
+        from utils.fetch_data_async import close_session, get_github_info_async
+    except ImportError:
+        return stages
+
+    async def fetch_async():
+        try:
+            return await get_github_info_async(USERNAME, TOKEN, year, COMMIT_FIELDS)
+        finally:
+            await close_session()
+
+    stages["fetch_async"] = lambda: asyncio.run(fetch_async())
+    return stages
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(
+    sizes: list,
+    year: int,
+    time_zone: str,
+    fetch_max_commits: int,
+    repeat: int = 3,
+    memory: bool = True,
+) -> dict:
+    """
+    Run the benchmarks.
+
+    Args:
+        sizes (list): The names of the sizes to run, see `SIZES`.
+        year (int): The year of the synthetic accounts.
+        time_zone (str): The timezone of the contexts.
+        fetch_max_commits (int): The largest account to crawl from the fake server.
+        repeat (int): The number of timed runs of every stage, of which the fastest counts.
+        memory (bool): Whether to trace the peak memory of every stage.
+
+    Returns:
+        dict: The metadata of the run and its results.
+    """
+    # Every crawl has to reach the fake server
+    Config.GRAPHQL_CACHE_ENABLED = False
+    Config.CASSETTE_MODE = ""
+
+    results = []
+    for size in sizes:
+        repos, commits = SIZES[size]
+        data = make_github_info(repos, commits, year)
+
+        stages = _context_stages(data, year, time_zone)
+        for stage, fn in stages.items():
+            record = _measure(fn, repeat, memory)
+            results.append(
+                {"size": size, "repos": repos, "commits": commits, "stage": stage, **record}
+            )
+            _print_record(results[-1])
+
+        if commits > fetch_max_commits:
+            continue
+        with FakeGitHubServer(data) as server:
+            for stage, fn in _fetch_stages(year, time_zone).items():
+                transport.reset_stats()
+                server.calls = 0
+                record = _measure(fn, repeat, memory)
+                # Every run makes the same calls
+                runs = repeat + (1 if memory else 0)
+                record["calls"] = server.calls // runs
+                record["bytes_received"] = transport.get_stats()["bytes_received"] // runs
+                results.append(
+                    {"size": size, "repos": repos, "commits": commits, "stage": stage, **record}
+                )
+                _print_record(results[-1])
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "date": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "aggregation_backend": "numpy" if calendar_stats.use_numpy() else "python",
+            "commit_fetch_workers": Config.COMMIT_FETCH_WORKERS,
+            "year": year,
+            "time_zone": time_zone,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def _print_record(record: dict) -> None:
+    peak = record["peak_bytes"]
+    print(
+        f"{record['size']:>7} {record['stage']:>14} {record['seconds']:10.4f} s"
+        + (f" {peak / 2 ** 20:10.2f} MiB" if peak is not None else "")
+        + (f" {record['calls']:7d} calls" if "calls" in record else ""),
+        flush=True,
+    )
+
+
+def compare(before: dict, after: dict, threshold: float, min_seconds: float = 0.005) -> bool:
+    """
+    Print the ratio of the time and peak memory of every stage of two runs.
+
+    Args:
+        before (dict): The results of the earlier run.
+        after (dict): The results of the later run.
+        threshold (float): The time ratio above which a stage counts as a regression.
+        min_seconds (float): The time below which a stage is too fast to count as one.
+
+    Returns:
+        bool: True if no stage got slower than the threshold.
+    """
+    earlier = {(r["size"], r["stage"]): r for r in before["results"]}
+    print(f"{before['meta']['commit']} -> {after['meta']['commit']}")
+    ok = True
+    for record in after["results"]:
+        previous = earlier.get((record["size"], record["stage"]))
+        if previous is None:
+            continue
+        ratio = record["seconds"] / previous["seconds"] if previous["seconds"] else 1
+        line = f"{record['size']:>7} {record['stage']:>14} time {ratio:6.2f}x"
+        if record["peak_bytes"] and previous["peak_bytes"]:
+            line += f"  memory {record['peak_bytes'] / previous['peak_bytes']:6.2f}x"
+        if ratio > threshold and record["seconds"] >= min_seconds:
+            line += "  REGRESSION"
+            ok = False
+        print(line)
+    return ok
+
+
+def main() -> None:
+    """
+    Run the benchmarks, or compare two result files.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="tiny,small,medium,large",
+                        help=f"comma separated, out of {', '.join(SIZES)}")
+    parser.add_argument("--year", type=int, default=2023)
+    parser.add_argument("--time-zone", default="America/New_York")
+    parser.add_argument("--fetch-max-commits", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true")
+    parser.add_argument("--output", help="file to write the JSON results to")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    parser.add_argument("--threshold", type=float, default=1.2)
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as f:
+            before = json.load(f)
+        with open(args.compare[1], encoding="utf-8") as f:
+            after = json.load(f)
+        sys.exit(0 if compare(before, after, args.threshold) else 1)
+
+    sizes = [size.strip() for size in args.sizes.split(",") if size.strip()]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"unknown sizes: {', '.join(unknown)}")
+
+    # The fetch layer logs every page; only problems matter here
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = run(
+        sizes,
+        args.year,
+        args.time_zone,
+        args.fetch_max_commits,
+        max(args.repeat, 1),
+        not args.no_memory,
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
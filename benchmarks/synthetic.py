@@ -0,0 +1,114 @@
+"""
+Synthetic GitHub accounts for the benchmarks.
+
+The data has the shape of `get_github_info` with `utils.context.COMMIT_FIELDS`, so it can be
+passed to `build_context` directly. Accounts are deterministic for a given seed.
+
+Functions:
+    make_github_info(repos: int, commits: int, year: int, seed: int) -> dict:
+        Generate the GitHub information of a synthetic account.
+"""
+
+import calendar
+import random
+import time
+
+from benchmarks.commit_types import make_messages
+
+_LANGUAGES = [
+    "Python", "JavaScript", "TypeScript", "Go", "Rust", "C", "C++", "Java", "Shell", "HTML",
+    "CSS", "Dockerfile", "Makefile", "Ruby", "Kotlin", "Swift",
+]
+
+
+def _timestamp(epoch: int) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(epoch))
+
+
+def make_github_info(repos: int, commits: int, year: int = 2023, seed: int = 0) -> dict:
+    """
+    Generate the GitHub information of a synthetic account.
+
+    Commits are spread over the repositories with a long tail, like real accounts, and over
+    the year with more commits on working days and hours.
+
+    Args:
+        repos (int): The number of repositories.
+        commits (int): The total number of commits in the year.
+        year (int): The year of the commits.
+        seed (int): The random seed.
+
+    Returns:
+        dict: The GitHub information, in the shape of `get_github_info`.
+    """
+    rng = random.Random(seed)
+    year_start = calendar.timegm((year, 1, 1, 0, 0, 0))
+    days_in_year = 366 if calendar.isleap(year) else 365
+
+    # Long tail: the weight of the n-th repository falls with n
+    weights = [1 / (n + 1) for n in range(repos)]
+    counts = [0] * repos
+    for index in rng.choices(range(repos), weights=weights, k=commits):
+        counts[index] += 1
+
+    # Weekends and nights are quieter
+    first_weekday = calendar.weekday(year, 1, 1)
+    day_weights = [
+        0.4 if (first_weekday + day) % 7 >= 5 else 1.0 for day in range(days_in_year)
+    ]
+    hour_weights = [0.2 if hour < 8 else 1.0 for hour in range(24)]
+
+    messages = make_messages(min(commits, 50000), seed)
+    contribution = [0] * days_in_year
+    repo_info = {}
+    for n, count in enumerate(counts):
+        days = rng.choices(range(days_in_year), weights=day_weights, k=count)
+        hours = rng.choices(range(24), weights=hour_weights, k=count)
+        repo_commits = []
+        for day, hour in zip(days, hours):
+            contribution[day] += 1
+            repo_commits.append(
+                {
+                    "messageHeadline": messages[rng.randrange(len(messages))],
+                    "committedDate": _timestamp(
+                        year_start + day * 86400 + hour * 3600 + rng.randrange(3600)
+                    ),
+                }
+            )
+        repo_commits.sort(key=lambda commit: commit["committedDate"], reverse=True)
+
+        created = year_start + rng.randint(-5 * 365, days_in_year - 1) * 86400
+        repo_info[f"repo-{n:05d}"] = {
+            "stargazerCount": int(rng.paretovariate(1.5)) - 1,
+            "forkCount": int(rng.paretovariate(2)) - 1,
+            "isPrivate": rng.random() < 0.2,
+            "isFork": rng.random() < 0.1,
+            "createdAt": _timestamp(created),
+            "pushedAt": _timestamp(year_start + rng.randrange(days_in_year) * 86400),
+            "languages": rng.sample(_LANGUAGES, rng.randint(1, 4)),
+            "commits": repo_commits,
+        }
+
+    # Listed like GitHub lists them for a crawl, most recently pushed first
+    repo_info = dict(
+        sorted(repo_info.items(), key=lambda item: item[1]["pushedAt"], reverse=True)
+    )
+
+    return {
+        "basic": {
+            "id": "U_synthetic",
+            "name": "Synthetic User",
+            "avatar_url": "https://avatars.githubusercontent.com/u/1?v=4",
+            "follower": rng.randint(0, 1000),
+            "following": rng.randint(0, 100),
+            "created_time": "2015-03-01T12:00:00Z",
+        },
+        "repo": repo_info,
+        "contribution": {
+            "pr_num": rng.randint(0, 200),
+            "issue_num": rng.randint(0, 200),
+            "commit_num": commits,
+            "contribution_num": sum(contribution),
+            "contribution": contribution,
+        },
+    }
@@ -21,6 +21,18 @@ class Config:
     CLIENT_SECRET = os.getenv("CLIENT_SECRET")
     SQLALCHEMY_DATABASE_URI = f"sqlite:///my-github-{PROJECT_YEAR}.db"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # SQLite profile of the database: "tuned" (WAL journal, synchronous=NORMAL, busy timeout,
+    # memory map, page cache and a connection pool for threaded writers) or "default"
+    SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "tuned")
+    # Tuned profile: milliseconds a writer waits for the lock, bytes memory mapped, KiB of
+    # page cache per connection, and connections pooled, plus those opened under load; few
+    # connections queue threads in the pool instead of polling for the write lock
+    SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "30000"))
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "65536"))
+    SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+    SQLITE_MAX_OVERFLOW = int(os.getenv("SQLITE_MAX_OVERFLOW", "8"))
     
     # GitHub API URLs
     GITHUB_AUTHORIZE_URL = "https://github.com/login/oauth/authorize"
@@ -34,6 +46,71 @@ class Config:
     # Request timeout
     REQUEST_TIMEOUT = 10
 
+    # Shared GitHub connection pool (per worker process)
+    GITHUB_POOL_CONNECTIONS = int(os.getenv("GITHUB_POOL_CONNECTIONS", "4"))
+    GITHUB_POOL_SIZE = int(os.getenv("GITHUB_POOL_SIZE", "16"))
+
+    # Number of commit batches that are paged at the same time (1 = serial)
+    COMMIT_FETCH_WORKERS = int(os.getenv("COMMIT_FETCH_WORKERS", "4"))
+
+    # Number of repositories whose next commit page is requested in one aliased query
+    COMMIT_BATCH_SIZE = int(os.getenv("COMMIT_BATCH_SIZE", "20"))
+
+    # Number of new repositories whose languages are requested in one aliased query
+    LANGUAGE_BATCH_SIZE = int(os.getenv("LANGUAGE_BATCH_SIZE", "50"))
+
+    # Adaptive repository page size: starting size for new users, upper bound, and the
+    # page latencies (seconds) below which it grows and above which it shrinks
+    REPO_PAGE_SIZE = int(os.getenv("REPO_PAGE_SIZE", "10"))
+    REPO_PAGE_SIZE_MAX = int(os.getenv("REPO_PAGE_SIZE_MAX", "50"))
+    REPO_PAGE_FAST_SECONDS = float(os.getenv("REPO_PAGE_FAST_SECONDS", "2"))
+    REPO_PAGE_SLOW_SECONDS = float(os.getenv("REPO_PAGE_SLOW_SECONDS", "6"))
+
+    # Rate limit scheduling: points kept in reserve, budget below which calls are paced
+    # until the reset, and longest wait (seconds) before a call gives up
+    RATE_LIMIT_RESERVE = int(os.getenv("RATE_LIMIT_RESERVE", "50"))
+    RATE_LIMIT_PACE_BELOW = int(os.getenv("RATE_LIMIT_PACE_BELOW", "500"))
+    RATE_LIMIT_MAX_WAIT = int(os.getenv("RATE_LIMIT_MAX_WAIT", "900"))
+
+    # GraphQL response cache: entries kept in memory, TTL (seconds) of responses about
+    # finished years and about the current year, and optional directory of a disk tier
+    GRAPHQL_CACHE_ENABLED = os.getenv("GRAPHQL_CACHE_ENABLED", "true").lower() == "true"
+    GRAPHQL_CACHE_SIZE = int(os.getenv("GRAPHQL_CACHE_SIZE", "2048"))
+    GRAPHQL_CACHE_TTL_PAST = int(os.getenv("GRAPHQL_CACHE_TTL_PAST", str(7 * 24 * 3600)))
+    GRAPHQL_CACHE_TTL_CURRENT = int(os.getenv("GRAPHQL_CACHE_TTL_CURRENT", "600"))
+    GRAPHQL_CACHE_DIR = os.getenv("GRAPHQL_CACHE_DIR", "")
+
+    # Fetch engine for background reports: "thread" (one thread per report) or "async"
+    # (all reports of a worker share one asyncio event loop, requires aiohttp)
+    FETCH_ENGINE = os.getenv("FETCH_ENGINE", "thread")
+
+    # Aggregation backend of the calendar statistics: "numpy" (arrays, falls back to "python"
+    # when NumPy is not installed) or "python"
+    AGGREGATION_BACKEND = os.getenv("AGGREGATION_BACKEND", "numpy")
+
+    # Seconds between saved checkpoints of a report being fetched; a job that stopped is
+    # resumed from its last checkpoint by the next request that takes its lease
+    CHECKPOINT_INTERVAL = int(os.getenv("CHECKPOINT_INTERVAL", "30"))
+
+    # Seconds a worker holds the lease of a report job without renewing it; jobs renew
+    # their leases every third of it, so a job of a dead worker can be restarted after it
+    JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+    # Failed attempts after which a job is no longer resumed from its checkpoint, and seconds
+    # to wait before resuming a failed job, doubled after every further failure
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+    JOB_RETRY_BACKOFF = int(os.getenv("JOB_RETRY_BACKOFF", "60"))
+
+    # Seconds after which a report of the current year is refreshed with the new commits
+    CONTEXT_REFRESH_INTERVAL = int(os.getenv("CONTEXT_REFRESH_INTERVAL", "3600"))
+
+    # Cassette of GitHub API exchanges for offline benchmarks: mode ("" = off, "record" or
+    # "replay"), file, and latency (seconds) and error rate (0-1) injected on replay
+    CASSETTE_MODE = os.getenv("CASSETTE_MODE", "")
+    CASSETTE_PATH = os.getenv("CASSETTE_PATH", "cassette.jsonl.gz")
+    CASSETTE_LATENCY = float(os.getenv("CASSETTE_LATENCY", "0"))
+    CASSETTE_ERROR_RATE = float(os.getenv("CASSETTE_ERROR_RATE", "0"))
+
 
 class DevelopmentConfig(Config):
     """Development configuration."""
@@ -23,14 +23,75 @@ class RequestedUser(db.Model):
 
 class UserContext(db.Model):
     """
-    Model for storing user context data.
+    Model for storing user context data, one per timezone it was generated for.
     """
     __tablename__ = 'user_contexts'
     
     username = db.Column(db.String(80), primary_key=True, nullable=False)
     year = db.Column(db.Integer, primary_key=True, nullable=False)
+    time_zone = db.Column(db.String(64), primary_key=True, nullable=False, default='')
     context = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
 
     def __repr__(self):
-        return f'<UserContext {self.username}:{self.year}>'
+        return f'<UserContext {self.username}:{self.year} {self.time_zone}>'
+
+
+class UserFacts(db.Model):
+    """
+    Model for storing the raw facts of a user context, to generate it for other timezones.
+    """
+    __tablename__ = 'user_facts'
+    
+    username = db.Column(db.String(80), primary_key=True, nullable=False)
+    year = db.Column(db.Integer, primary_key=True, nullable=False)
+    facts = db.Column(db.LargeBinary, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<UserFacts {self.username}:{self.year}>'
+
+
+class UserAggregate(db.Model):
+    """
+    Model for storing the aggregates a user context was generated from, to refresh it.
+    """
+    __tablename__ = 'user_aggregates'
+    
+    username = db.Column(db.String(80), primary_key=True, nullable=False)
+    year = db.Column(db.Integer, primary_key=True, nullable=False)
+    state = db.Column(db.Text, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<UserAggregate {self.username}:{self.year}>'
+
+
+class JobCheckpoint(db.Model):
+    """
+    Model for storing the last checkpoint of a user context being fetched.
+    """
+    __tablename__ = 'job_checkpoints'
+    
+    username = db.Column(db.String(80), primary_key=True, nullable=False)
+    year = db.Column(db.Integer, primary_key=True, nullable=False)
+    state = db.Column(db.Text, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<JobCheckpoint {self.username}:{self.year}>'
+
+
+class JobLease(db.Model):
+    """
+    Model for the lease of the job fetching a user context, held by one worker at a time.
+    """
+    __tablename__ = 'job_leases'
+    
+    username = db.Column(db.String(80), primary_key=True, nullable=False)
+    year = db.Column(db.Integer, primary_key=True, nullable=False)
+    owner = db.Column(db.String(64), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<JobLease {self.username}:{self.year} {self.owner}>'
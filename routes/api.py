@@ -3,7 +3,9 @@ API routes for status and health checks.
 """
 
 from datetime import datetime
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, session
+
+from services.github_service import GitHubService
 
 api_bp = Blueprint('api', __name__)
 
@@ -20,6 +22,15 @@ def health_check():
     return jsonify({"status": "healthy", "timestamp": datetime.now().isoformat()})
 
 
+@api_bp.route("/rate_limit", methods=["GET"])
+def rate_limit():
+    """Endpoint to show the known GitHub rate limit budget of the current user."""
+    access_token = session.get("access_token")
+    if not access_token:
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(GitHubService.get_rate_limit(access_token))
+
+
 @api_bp.route("/debug/routes", methods=["GET"])
 def debug_routes():
     """Debug endpoint to show all routes."""
@@ -49,10 +49,14 @@ def load():
     username = str(data.get("username"))
     timezone = str(data.get("timezone"))
     year = int(data.get("year"))
+    # Optional last year of a multi-year job, which generates all years with one crawl
+    last_year = int(data.get("last_year") or year)
 
     # Validate request data
     if not DataService.validate_request_data(access_token, username, timezone, year):
         return jsonify({"redirect_url": url_for("auth.index")})
+    if last_year < year or not DataService.validate_year(last_year):
+        return jsonify({"redirect_url": url_for("auth.index")})
 
     # Update session
     session["access_token"] = access_token
@@ -60,24 +64,46 @@ def load():
     session["timezone"] = timezone
     session["year"] = year
 
-    # Check if context already exists
-    if DatabaseService.get_user_context(username, year):
-        return jsonify({"redirect_url": url_for("main.display", year=year)})
+    if last_year > year:
+        return _load_years(username, access_token, year, last_year, timezone)
 
-    # Check if request is already in progress
-    if DatabaseService.get_requested_user(username, year):
-        return jsonify({"redirect_url": url_for("main.wait", year=year)})
+    # Check if context already exists or can be generated from the facts of another
+    # timezone, refreshing it in background when outdated
+    if DataService.get_user_context(username, year, timezone):
+        if DataService.needs_refresh(username, year):
+            DataService.refresh_user_data(username, access_token, year)
+        return jsonify({"redirect_url": url_for("main.display", year=year)})
 
     # Add to requested users
     if not DatabaseService.add_requested_user(username, year):
         return jsonify({"redirect_url": url_for("auth.index")})
 
-    # Start data processing in background
+    # Start data processing in background, unless a job of this request is already in flight
     DataService.process_user_data(username, access_token, year, timezone)
 
     return jsonify({"redirect_url": url_for("main.wait", year=year)})
 
 
+def _load_years(username: str, access_token: str, year: int, last_year: int, timezone: str):
+    """Start a multi-year job for the years without a context or a job in flight."""
+    missing_years = [
+        y for y in range(year, last_year + 1)
+        if not DataService.get_user_context(username, y, timezone)
+    ]
+    # Add to requested users
+    missing_years = [
+        y for y in missing_years if DatabaseService.add_requested_user(username, y)
+    ]
+
+    # Start data processing of all missing years in background
+    if missing_years:
+        DataService.process_user_years(username, access_token, missing_years, timezone)
+
+    if DataService.get_user_context(username, year, timezone):
+        return jsonify({"redirect_url": url_for("main.display", year=year)})
+    return jsonify({"redirect_url": url_for("main.wait", year=year)})
+
+
 @main_bp.route("/wait/<path:year>", methods=["GET"])
 def wait(year):
     """Endpoint for the wait page."""
@@ -86,12 +112,13 @@ def wait(year):
 
     username = session.get("username")
 
-    # Check if processing is complete
-    if DatabaseService.get_user_context(username, int(year)):
+    # Check if processing is complete, for this or another timezone
+    if DataService.get_user_context(username, int(year), session.get("timezone")):
         return redirect(url_for("main.display", year=year))
 
-    # Check if request exists
+    # Check if request exists, resuming its job if it stopped after a checkpoint
     if DatabaseService.get_requested_user(username, int(year)):
+        DataService.resume_user_data(username, session.get("access_token"), int(year))
         return render_template("wait.html", year=year, project_year=current_app.config['PROJECT_YEAR'])
 
     return redirect(url_for("main.dashboard"))
@@ -104,7 +131,7 @@ def display(year):
         return redirect(url_for("auth.index"))
 
     username = session.get("username")
-    user_context = DatabaseService.get_user_context(username, int(year))
+    user_context = DataService.get_user_context(username, int(year), session.get("timezone"))
 
     logging.info("Display user context: %s", username)
 
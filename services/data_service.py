@@ -2,13 +2,22 @@
 Data processing service for handling GitHub data fetching and processing.
 """
 
+import asyncio
 import json
 import logging
+import os
 import threading
-from datetime import datetime
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from flask import current_app
 
-from utils.context import get_context
+from config.config import Config
+from models.models import UserContext
+from utils.context import (
+    get_context_and_state, get_context_async, get_contexts, refresh_context, render_context
+)
+from utils.fetch_data import is_permanent_error
 from services.database_service import DatabaseService
 from services.github_service import GitHubService
 
@@ -16,26 +25,296 @@ from services.github_service import GitHubService
 class DataService:
     """Service for data processing operations."""
     
+    _event_loop = None
+    _event_loop_lock = threading.Lock()
+    
+    @staticmethod
+    def get_user_context(username: str, year: int, timezone: str) -> UserContext:
+        """
+        Get the user context of a timezone, generating it from the raw facts saved with the
+        context of another timezone if needed, without fetching again.
+        
+        Contexts saved before they were kept per timezone have no facts to generate others
+        from, so any context of the user and year is returned as is instead.
+        """
+        user_context = DatabaseService.get_user_context(username, year, timezone)
+        if user_context:
+            return user_context
+        
+        user_facts = DatabaseService.get_user_facts(username, year)
+        if not user_facts:
+            return DatabaseService.get_any_user_context(username, year)
+        try:
+            context = render_context(user_facts.facts, username, year, timezone)
+        except Exception as e:
+            logging.error("Error rendering context: %s", e)
+            return DatabaseService.get_any_user_context(username, year)
+        logging.info("Rendered context of %s in %s", username, timezone)
+        DatabaseService.add_user_context(username, year, timezone, json.dumps(context))
+        return DatabaseService.get_user_context(username, year, timezone)
+    
+    @staticmethod
+    def process_user_data(username: str, access_token: str, year: int, timezone: str) -> bool:
+        """
+        Process user data in the background with the configured fetch engine.
+        
+        Nothing is started if a job of the same user and year is in flight on any worker,
+        the request then waits for the context of that job instead. A job that stopped after
+        a checkpoint, like on a crash or a deploy, goes on from there.
+        """
+        owner, years = DataService._acquire_leases(username, [year])
+        if not years:
+            logging.info("Job of %s in %d is already in flight", username, year)
+            return False
+        
+        DataService._start_job(username, access_token, year, timezone, owner)
+        return True
+    
+    @staticmethod
+    def _start_job(username: str, access_token: str, year: int, timezone: str, owner: str):
+        """Start a job whose lease is held, from its last checkpoint if there is one."""
+        job_checkpoint = DatabaseService.get_job_checkpoint(username, year)
+        if job_checkpoint:
+            logging.info("Resuming job of %s in %d", username, year)
+            checkpoint = json.loads(job_checkpoint.state)
+            # Only the thread engine saves checkpoints, so it goes on with them
+            DataService._process_user_data_thread(
+                username,
+                access_token,
+                year,
+                checkpoint["aggregate"]["time_zone"],
+                owner,
+                checkpoint,
+            )
+        elif Config.FETCH_ENGINE == "async":
+            DataService._process_user_data_async(username, access_token, year, timezone, owner)
+        else:
+            DataService._process_user_data_thread(username, access_token, year, timezone, owner)
+    
+    @staticmethod
+    def _acquire_leases(username: str, years: list) -> tuple:
+        """Take the job leases of the given years that no other job holds."""
+        owner = f"{os.getpid()}-{uuid.uuid4().hex}"
+        years = [
+            year for year in years
+            if DatabaseService.acquire_job_lease(username, year, owner, Config.JOB_LEASE_SECONDS)
+        ]
+        return owner, years
+    
+    @staticmethod
+    @contextmanager
+    def _holding_leases(app, username: str, years: list, owner: str):
+        """Renew the job leases in background while the block runs, then release them."""
+        done = threading.Event()
+        
+        def heartbeat():
+            with app.app_context():
+                while not done.wait(Config.JOB_LEASE_SECONDS / 3):
+                    DatabaseService.renew_job_leases(
+                        username, years, owner, Config.JOB_LEASE_SECONDS
+                    )
+                DatabaseService.release_job_leases(username, years, owner)
+        
+        threading.Thread(target=heartbeat, name="job-lease", daemon=True).start()
+        try:
+            yield
+        finally:
+            done.set()
+    
     @staticmethod
-    def process_user_data(username: str, access_token: str, year: int, timezone: str):
-        """Process user data in a background thread."""
+    def _process_user_data_thread(
+        username: str,
+        access_token: str,
+        year: int,
+        timezone: str,
+        owner: str,
+        checkpoint: dict = None,
+    ):
+        """Process user data in a background thread, from a checkpoint if given."""
         # Get the current app instance before starting the thread
         app = current_app._get_current_object()
         
+        # The failed attempts of the job are kept in all of its checkpoints, see `_fail_job`
+        failures = {
+            key: checkpoint[key] for key in ("attempts", "last_error") if key in (checkpoint or {})
+        }
+        
+        def save_checkpoint(state: dict):
+            DatabaseService.save_job_checkpoint(username, year, dict(state, **failures))
+        
         def fetch_data():
             with app.app_context():
-                try:
-                    # Fetch GitHub context data
-                    context = get_context(username, access_token, year, timezone)
-                    logging.info("Context of %s: %s", username, json.dumps(context))
-                    
-                    # Save context to database
-                    DatabaseService.add_user_context(
-                        username, year, json.dumps(context)
-                    )
-                    
-                except Exception as e:
-                    logging.error("Error fetching data: %s", e)
+                with DataService._holding_leases(app, username, [year], owner):
+                    try:
+                        # Fetch GitHub context data
+                        context, state, facts = get_context_and_state(
+                            username, access_token, year, timezone, checkpoint, save_checkpoint
+                        )
+                        logging.info("Context of %s: %s", username, json.dumps(context))
+                        
+                        # Save facts, context and aggregates to database
+                        DataService._save_context(
+                            username, year, timezone, context, state, facts
+                        )
+                        DatabaseService.delete_job_checkpoint(username, year)
+                        
+                    except Exception as e:
+                        logging.error("Error fetching data: %s", e)
+                        DataService._fail_job(username, year, e)
+                
+                # Star the repository
+                GitHubService.star_repository(access_token)
+        
+        fetch_thread = threading.Thread(target=fetch_data)
+        fetch_thread.start()
+    
+    @staticmethod
+    def _fail_job(username: str, year: int, error: Exception):
+        """
+        Count a failed attempt of a job on its checkpoint, with its error. The checkpoint is
+        deleted after `Config.JOB_MAX_ATTEMPTS` attempts, or when the error would come back
+        on every attempt, so that the job is not resumed anymore.
+        """
+        job_checkpoint = DatabaseService.get_job_checkpoint(username, year)
+        if not job_checkpoint:
+            return
+        
+        state = json.loads(job_checkpoint.state)
+        state["attempts"] = state.get("attempts", 0) + 1
+        state["last_error"] = str(error)
+        if is_permanent_error(error) or state["attempts"] >= Config.JOB_MAX_ATTEMPTS:
+            logging.error(
+                "Giving up job of %s in %d after %d attempts: %s",
+                username, year, state["attempts"], error
+            )
+            DatabaseService.delete_job_checkpoint(username, year)
+        else:
+            DatabaseService.save_job_checkpoint(username, year, state)
+    
+    @staticmethod
+    def _save_context(
+        username: str, year: int, timezone: str, context: dict, state: dict, facts: bytes
+    ):
+        """Save a new context with its facts, and the aggregates of the current year."""
+        if facts:
+            DatabaseService.save_user_facts(username, year, facts)
+        DatabaseService.add_user_context(username, year, timezone, json.dumps(context))
+        
+        # Keep the aggregates of the current year to refresh it later
+        if year == datetime.now().year:
+            DatabaseService.save_user_aggregate(username, year, state)
+    
+    @staticmethod
+    def resume_user_data(username: str, access_token: str, year: int) -> bool:
+        """
+        Resume a job from its last checkpoint if no worker holds its lease anymore.
+        
+        The lease of a running job is renewed while it runs, so a job whose lease could be
+        taken is not running on any worker. A job that failed is only resumed after
+        `Config.JOB_RETRY_BACKOFF` seconds, doubled after every further failure.
+        """
+        job_checkpoint = DatabaseService.get_job_checkpoint(username, year)
+        if not job_checkpoint:
+            return False
+        
+        state = json.loads(job_checkpoint.state)
+        attempts = state.get("attempts", 0)
+        if attempts:
+            backoff = timedelta(seconds=Config.JOB_RETRY_BACKOFF * 2 ** (attempts - 1))
+            if datetime.now() < job_checkpoint.updated_at + backoff:
+                return False
+        
+        owner, years = DataService._acquire_leases(username, [year])
+        if not years:
+            return False
+        
+        DataService._start_job(username, access_token, year, state["aggregate"]["time_zone"], owner)
+        return True
+    
+    @staticmethod
+    def needs_refresh(username: str, year: int) -> bool:
+        """Check if the context of the current year is older than the refresh interval."""
+        if year != datetime.now().year:
+            return False
+        user_aggregate = DatabaseService.get_user_aggregate(username, year)
+        return bool(user_aggregate) and (
+            datetime.now() - user_aggregate.updated_at
+            > timedelta(seconds=Config.CONTEXT_REFRESH_INTERVAL)
+        )
+    
+    @staticmethod
+    def refresh_user_data(username: str, access_token: str, year: int):
+        """Refresh the context with the new commits in a background thread."""
+        app = current_app._get_current_object()
+        
+        owner, years = DataService._acquire_leases(username, [year])
+        if not years:
+            return
+        
+        def fetch_data():
+            with app.app_context():
+                with DataService._holding_leases(app, username, [year], owner):
+                    try:
+                        user_aggregate = DatabaseService.get_user_aggregate(username, year)
+                        user_facts = DatabaseService.get_user_facts(username, year)
+                        state = json.loads(user_aggregate.state)
+                        facts = user_facts.facts if user_facts else None
+                        # Hold no connection, nor the snapshot of the WAL, while fetching
+                        DatabaseService.close_session()
+                        
+                        context, state, facts = refresh_context(
+                            username, access_token, year, state, facts
+                        )
+                        logging.info(
+                            "Refreshed context of %s: %s", username, json.dumps(context)
+                        )
+                        
+                        # Save facts, context and aggregates to database; the contexts of
+                        # other timezones are dropped, to be generated again from the facts
+                        if facts:
+                            DatabaseService.save_user_facts(username, year, facts)
+                        DatabaseService.update_user_context(
+                            username, year, state["time_zone"], json.dumps(context)
+                        )
+                        DatabaseService.save_user_aggregate(username, year, state)
+                        
+                    except Exception as e:
+                        logging.error("Error refreshing data: %s", e)
+        
+        fetch_thread = threading.Thread(target=fetch_data)
+        fetch_thread.start()
+    
+    @staticmethod
+    def process_user_years(username: str, access_token: str, years: list, timezone: str):
+        """
+        Process the data of several years from a single crawl in a background thread.
+        
+        Years whose job is already in flight on any worker are left to that job.
+        """
+        app = current_app._get_current_object()
+        
+        owner, years = DataService._acquire_leases(username, years)
+        if not years:
+            return
+        
+        def fetch_data():
+            with app.app_context():
+                with DataService._holding_leases(app, username, years, owner):
+                    try:
+                        # Fetch GitHub context data of all years at once
+                        contexts = get_contexts(username, access_token, years, timezone)
+                        
+                        # Save the facts, aggregates and one context per year to database
+                        for year, (context, state, facts) in contexts.items():
+                            logging.info(
+                                "Context of %s in %d: %s", username, year, json.dumps(context)
+                            )
+                            DataService._save_context(
+                                username, year, timezone, context, state, facts
+                            )
+                        
+                    except Exception as e:
+                        logging.error("Error fetching data: %s", e)
                 
                 # Star the repository
                 GitHubService.star_repository(access_token)
@@ -43,6 +322,48 @@ class DataService:
         fetch_thread = threading.Thread(target=fetch_data)
         fetch_thread.start()
     
+    @staticmethod
+    def _process_user_data_async(
+        username: str, access_token: str, year: int, timezone: str, owner: str
+    ):
+        """Process user data as a task on the shared event loop."""
+        app = current_app._get_current_object()
+        
+        def save_data(context: dict, state: dict, facts: bytes):
+            with app.app_context():
+                logging.info("Context of %s: %s", username, json.dumps(context))
+                
+                # Save facts, context and aggregates to database
+                DataService._save_context(username, year, timezone, context, state, facts)
+        
+        async def fetch_data():
+            with DataService._holding_leases(app, username, [year], owner):
+                try:
+                    # Fetch GitHub context data
+                    context, state, facts = await get_context_async(
+                        username, access_token, year, timezone
+                    )
+                    await asyncio.to_thread(save_data, context, state, facts)
+                except Exception as e:
+                    logging.error("Error fetching data: %s", e)
+            
+            # Star the repository
+            await asyncio.to_thread(GitHubService.star_repository, access_token)
+        
+        asyncio.run_coroutine_threadsafe(fetch_data(), DataService._get_event_loop())
+    
+    @staticmethod
+    def _get_event_loop() -> asyncio.AbstractEventLoop:
+        """Get the event loop shared by all async fetches, starting it on first use."""
+        with DataService._event_loop_lock:
+            if DataService._event_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="fetch-event-loop", daemon=True
+                ).start()
+                DataService._event_loop = loop
+        return DataService._event_loop
+    
     @staticmethod
     def validate_year(year: int) -> bool:
         """Validate if the year is within acceptable range."""
@@ -2,9 +2,15 @@
 Database service for handling database operations.
 """
 
+import json
 import logging
-from sqlalchemy import and_
-from models.models import db, RequestedUser, UserContext
+from datetime import datetime, timedelta
+from sqlalchemy import and_, inspect, or_, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from models.models import (
+    db, JobCheckpoint, JobLease, RequestedUser, UserAggregate, UserContext, UserFacts
+)
 
 
 class DatabaseService:
@@ -13,12 +19,56 @@ class DatabaseService:
     @staticmethod
     def init_db():
         """Initialize the database."""
+        DatabaseService._migrate_user_contexts()
         db.create_all()
         DatabaseService._cleanup_orphaned_users()
     
+    @staticmethod
+    def _migrate_user_contexts():
+        """Key the user contexts of databases created before timezones were by timezone."""
+        if not inspect(db.engine).has_table(UserContext.__tablename__):
+            return
+        columns = {
+            column["name"]
+            for column in inspect(db.engine).get_columns(UserContext.__tablename__)
+        }
+        if "time_zone" in columns:
+            return
+        
+        logging.info("Migrating user contexts to be keyed by timezone")
+        with db.engine.begin() as connection:
+            connection.execute(text("ALTER TABLE user_contexts RENAME TO user_contexts_old"))
+            UserContext.__table__.create(connection)
+            # The timezone of old contexts is only known for those kept to be refreshed
+            connection.execute(text(
+                "INSERT INTO user_contexts (username, year, time_zone, context, created_at) "
+                "SELECT username, year, '', context, created_at FROM user_contexts_old"
+            ))
+            connection.execute(text("DROP TABLE user_contexts_old"))
+            if inspect(connection).has_table(UserAggregate.__tablename__):
+                aggregates = connection.execute(
+                    text("SELECT username, year, state FROM user_aggregates")
+                ).all()
+                for username, year, state in aggregates:
+                    connection.execute(
+                        text(
+                            "UPDATE user_contexts SET time_zone = :time_zone "
+                            "WHERE username = :username AND year = :year"
+                        ),
+                        {
+                            "time_zone": json.loads(state)["time_zone"],
+                            "username": username,
+                            "year": year,
+                        },
+                    )
+    
     @staticmethod
     def _cleanup_orphaned_users():
-        """Clean up users without context data."""
+        """
+        Clean up users without context data, unless their job can be resumed or is in
+        flight on a worker that holds its lease.
+        """
+        now = datetime.now()
         missing_users = (
             db.session.query(RequestedUser)
             .outerjoin(
@@ -26,7 +76,20 @@ class DatabaseService:
                 (RequestedUser.username == UserContext.username)
                 & (RequestedUser.year == UserContext.year),
             )
+            .outerjoin(
+                JobCheckpoint,
+                (RequestedUser.username == JobCheckpoint.username)
+                & (RequestedUser.year == JobCheckpoint.year),
+            )
+            .outerjoin(
+                JobLease,
+                (RequestedUser.username == JobLease.username)
+                & (RequestedUser.year == JobLease.year)
+                & (JobLease.expires_at >= now),
+            )
             .filter(UserContext.username.is_(None))
+            .filter(JobCheckpoint.username.is_(None))
+            .filter(JobLease.username.is_(None))
             .all()
         )
         for user in missing_users:
@@ -37,12 +100,35 @@ class DatabaseService:
         db.session.commit()
     
     @staticmethod
-    def get_user_context(username: str, year: int) -> UserContext:
-        """Get user context from database."""
+    def close_session():
+        """End the transaction of the session, returning its connection to the pool."""
+        db.session.close()
+    
+    @staticmethod
+    def get_user_context(username: str, year: int, time_zone: str) -> UserContext:
+        """Get the user context of a timezone from database."""
         return UserContext.query.filter(
-            and_(UserContext.username == username, UserContext.year == year)
+            and_(
+                UserContext.username == username,
+                UserContext.year == year,
+                UserContext.time_zone == time_zone,
+            )
         ).first()
     
+    @staticmethod
+    def get_any_user_context(username: str, year: int) -> UserContext:
+        """
+        Get a user context of any timezone from database, preferring the one of unknown
+        timezone migrated from before contexts were kept per timezone.
+        """
+        return (
+            UserContext.query.filter(
+                and_(UserContext.username == username, UserContext.year == year)
+            )
+            .order_by(UserContext.time_zone != "")
+            .first()
+        )
+    
     @staticmethod
     def get_requested_user(username: str, year: int) -> RequestedUser:
         """Get requested user from database."""
@@ -52,23 +138,27 @@ class DatabaseService:
     
     @staticmethod
     def add_requested_user(username: str, year: int):
-        """Add a new requested user."""
+        """Add a new requested user, unless it is already requested."""
         try:
             requested_user = RequestedUser(username=username, year=year)
             db.session.add(requested_user)
             db.session.commit()
             return True
+        except IntegrityError:
+            # Added by a concurrent request
+            db.session.rollback()
+            return DatabaseService.get_requested_user(username, year) is not None
         except Exception as e:
             logging.error("Error saving requested user: %s", e)
             db.session.rollback()
             return False
     
     @staticmethod
-    def add_user_context(username: str, year: int, context: str):
+    def add_user_context(username: str, year: int, time_zone: str, context: str):
         """Add user context to database."""
         try:
             user_context = UserContext(
-                username=username, context=context, year=year
+                username=username, context=context, year=year, time_zone=time_zone
             )
             db.session.add(user_context)
             db.session.commit()
@@ -77,3 +167,173 @@ class DatabaseService:
             logging.error("Error saving user context: %s", e)
             db.session.rollback()
             return False
+    
+    @staticmethod
+    def update_user_context(username: str, year: int, time_zone: str, context: str):
+        """Replace the user context of a timezone, and drop those of other timezones."""
+        try:
+            UserContext.query.filter(
+                UserContext.username == username,
+                UserContext.year == year,
+                UserContext.time_zone != time_zone,
+            ).delete(synchronize_session=False)
+            user_context = DatabaseService.get_user_context(username, year, time_zone)
+            if user_context:
+                user_context.context = context
+            else:
+                db.session.add(
+                    UserContext(
+                        username=username, context=context, year=year, time_zone=time_zone
+                    )
+                )
+            db.session.commit()
+            return True
+        except Exception as e:
+            logging.error("Error updating user context: %s", e)
+            db.session.rollback()
+            return False
+    
+    @staticmethod
+    def get_user_facts(username: str, year: int) -> UserFacts:
+        """Get the raw facts of a user context from database."""
+        return UserFacts.query.filter(
+            and_(UserFacts.username == username, UserFacts.year == year)
+        ).first()
+    
+    @staticmethod
+    def save_user_facts(username: str, year: int, facts: bytes):
+        """Add or replace the raw facts of a user context in database, as a blob."""
+        try:
+            user_facts = DatabaseService.get_user_facts(username, year)
+            if not user_facts:
+                user_facts = UserFacts(username=username, year=year)
+                db.session.add(user_facts)
+            user_facts.facts = facts
+            user_facts.updated_at = datetime.now()
+            db.session.commit()
+            return True
+        except Exception as e:
+            logging.error("Error saving user facts: %s", e)
+            db.session.rollback()
+            return False
+    
+    @staticmethod
+    def acquire_job_lease(username: str, year: int, owner: str, seconds: int) -> bool:
+        """Take the lease of a job, unless another owner holds it and it has not expired."""
+        now = datetime.now()
+        expires_at = now + timedelta(seconds=seconds)
+        try:
+            # One atomic upsert: the lease is added, or taken over only if it expired or is
+            # already held by the owner, so only one of concurrent owners can succeed
+            statement = sqlite_insert(JobLease).values(
+                username=username, year=year, owner=owner, expires_at=expires_at
+            )
+            statement = statement.on_conflict_do_update(
+                index_elements=[JobLease.username, JobLease.year],
+                set_={"owner": owner, "expires_at": expires_at},
+                where=or_(JobLease.expires_at < now, JobLease.owner == owner),
+            )
+            taken = db.session.execute(statement).rowcount
+            db.session.commit()
+            return taken > 0
+        except Exception as e:
+            logging.error("Error acquiring job lease: %s", e)
+            db.session.rollback()
+            return False
+    
+    @staticmethod
+    def renew_job_leases(username: str, years: list, owner: str, seconds: int):
+        """Extend the leases of an owner on the jobs of the given years."""
+        try:
+            JobLease.query.filter(
+                JobLease.username == username,
+                JobLease.year.in_(years),
+                JobLease.owner == owner,
+            ).update(
+                {"expires_at": datetime.now() + timedelta(seconds=seconds)},
+                synchronize_session=False,
+            )
+            db.session.commit()
+            return True
+        except Exception as e:
+            logging.error("Error renewing job lease: %s", e)
+            db.session.rollback()
+            return False
+    
+    @staticmethod
+    def release_job_leases(username: str, years: list, owner: str):
+        """Give up the leases of an owner on the jobs of the given years."""
+        try:
+            JobLease.query.filter(
+                JobLease.username == username,
+                JobLease.year.in_(years),
+                JobLease.owner == owner,
+            ).delete(synchronize_session=False)
+            db.session.commit()
+            return True
+        except Exception as e:
+            logging.error("Error releasing job lease: %s", e)
+            db.session.rollback()
+            return False
+    
+    @staticmethod
+    def get_job_checkpoint(username: str, year: int) -> JobCheckpoint:
+        """Get the last checkpoint of a job from database."""
+        return JobCheckpoint.query.filter(
+            and_(JobCheckpoint.username == username, JobCheckpoint.year == year)
+        ).first()
+    
+    @staticmethod
+    def save_job_checkpoint(username: str, year: int, state: dict):
+        """Add or replace the checkpoint of a job in database."""
+        try:
+            job_checkpoint = DatabaseService.get_job_checkpoint(username, year)
+            if not job_checkpoint:
+                job_checkpoint = JobCheckpoint(username=username, year=year)
+                db.session.add(job_checkpoint)
+            job_checkpoint.state = json.dumps(state)
+            job_checkpoint.updated_at = datetime.now()
+            db.session.commit()
+            return True
+        except Exception as e:
+            logging.error("Error saving job checkpoint: %s", e)
+            db.session.rollback()
+            return False
+    
+    @staticmethod
+    def delete_job_checkpoint(username: str, year: int):
+        """Remove the checkpoint of a finished job from database."""
+        try:
+            JobCheckpoint.query.filter(
+                and_(JobCheckpoint.username == username, JobCheckpoint.year == year)
+            ).delete()
+            db.session.commit()
+            return True
+        except Exception as e:
+            logging.error("Error deleting job checkpoint: %s", e)
+            db.session.rollback()
+            return False
+    
+    @staticmethod
+    def get_user_aggregate(username: str, year: int) -> UserAggregate:
+        """Get the aggregates of a user context from database."""
+        return UserAggregate.query.filter(
+            and_(UserAggregate.username == username, UserAggregate.year == year)
+        ).first()
+    
+    @staticmethod
+    def save_user_aggregate(username: str, year: int, state: dict):
+        """Add or replace the aggregates of a user context in database."""
+        try:
+            user_aggregate = DatabaseService.get_user_aggregate(username, year)
+            if not user_aggregate:
+                user_aggregate = UserAggregate(username=username, year=year)
+                db.session.add(user_aggregate)
+            user_aggregate.state = json.dumps(state)
+            user_aggregate.updated_at = datetime.now()
+            db.session.commit()
+            return True
+        except Exception as e:
+            logging.error("Error saving user aggregate: %s", e)
+            db.session.rollback()
+            return False
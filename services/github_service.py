@@ -5,6 +5,7 @@ GitHub service for handling GitHub API operations.
 import logging
 import requests
 from config.config import Config
+from utils import rate_limit, transport
 
 
 class GitHubService:
@@ -14,7 +15,7 @@ class GitHubService:
     def get_access_token(code: str) -> str:
         """Exchange authorization code for access token."""
         try:
-            token_response = requests.post(
+            token_response = transport.post(
                 Config.GITHUB_TOKEN_URL,
                 headers={"Accept": "application/json"},
                 data={
@@ -34,22 +35,30 @@ class GitHubService:
     def get_user_info(access_token: str) -> dict:
         """Get user information from GitHub API."""
         try:
+            rate_limit.acquire(access_token, "core")
             headers = {"Authorization": f"bearer {access_token}"}
-            user_response = requests.get(
+            user_response = transport.get(
                 f"{Config.GITHUB_API_BASE_URL}/user", 
                 headers=headers, 
                 timeout=Config.REQUEST_TIMEOUT
             )
+            rate_limit.observe(access_token, user_response.headers, resource="core")
             return user_response.json()
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, rate_limit.RateLimitExceeded) as e:
             logging.error("Error getting user info: %s", e)
             return {}
     
+    @staticmethod
+    def get_rate_limit(access_token: str) -> dict:
+        """Get the known rate limit budget of the access token."""
+        return rate_limit.get_budget(access_token)
+    
     @staticmethod
     def star_repository(access_token: str) -> bool:
         """Star the repository."""
         try:
-            star_response = requests.put(
+            rate_limit.acquire(access_token, "core")
+            star_response = transport.put(
                 f"{Config.GITHUB_API_BASE_URL}/user/starred/{Config.STAR_REPO}",
                 headers={
                     "Authorization": f"token {access_token}",
@@ -57,6 +66,7 @@ class GitHubService:
                 },
                 timeout=Config.REQUEST_TIMEOUT,
             )
+            rate_limit.observe(access_token, star_response.headers, resource="core")
             if star_response.status_code == 204:
                 logging.info("Successfully starred %s", Config.STAR_REPO)
                 return True
@@ -65,6 +75,6 @@ class GitHubService:
                     "Failed to star %s: %s", Config.STAR_REPO, star_response.json()
                 )
                 return False
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, rate_limit.RateLimitExceeded) as e:
             logging.error("Error starring repository: %s", e)
             return False
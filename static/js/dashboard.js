@@ -4,6 +4,11 @@ document.getElementById('inputForm').addEventListener('submit', function (event)
   var username = document.getElementById('username').value;
   var timezone = document.getElementById('timezone').value;
   var year = document.getElementById('year').value;
+  var lastYear = document.getElementById('lastYear').value;
+  // The years up to the last one are generated from a single crawl
+  if (!lastYear || parseInt(lastYear) <= parseInt(year)) {
+    lastYear = null;
+  }
 
   // Hide the form
   document.getElementById('inputForm').style.display = 'none';
@@ -17,7 +22,8 @@ document.getElementById('inputForm').addEventListener('submit', function (event)
       access_token: accessToken,
       username: username,
       timezone: timezone,
-      year: year
+      year: year,
+      last_year: lastYear
     }),
   })
     .then(response => {
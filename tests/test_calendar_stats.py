@@ -0,0 +1,90 @@
+"""
+Tests of the NumPy backend of the calendar statistics against the pure Python one.
+"""
+
+import calendar
+import random
+import unittest
+
+from utils.calendar_stats import _calendar_stats_numpy, _calendar_stats_python, np
+
+# Common and leap years, including the century rules
+YEARS = (2023, 2024, 2000, 2100)
+
+
+def _day(year: int, month: int, day: int) -> int:
+    """Get the index in the calendar of a day of the year."""
+    return sum(calendar.monthrange(year, m)[1] for m in range(1, month)) + day - 1
+
+
+def _calendars(year: int) -> dict:
+    """Get edge-case and random calendars of a year, with the hours of its commits."""
+    days_in_year = 366 if calendar.isleap(year) else 365
+    hours = [0] * 24
+    calendars = {"empty": ([0] * days_in_year, hours)}
+
+    for name, index in (
+        ("first day", 0),
+        ("last day", days_in_year - 1),
+        ("end of February", _day(year, 2, calendar.monthrange(year, 2)[1])),
+    ):
+        days = [0] * days_in_year
+        days[index] = 3
+        hour_counts = list(hours)
+        hour_counts[index % 24] = 3
+        calendars[f"single active day, {name}"] = (days, hour_counts)
+
+    # Streaks over the end of every month, and a break over the turn of February
+    days = [0] * days_in_year
+    for month in range(1, 12):
+        end = _day(year, month, calendar.monthrange(year, month)[1])
+        for index in range(end - 2, end + 3):
+            days[index] = month
+    for index in range(_day(year, 2, 20), _day(year, 3, 10)):
+        days[index] = 0
+    calendars["streaks across month ends"] = (days, [1] * 24)
+
+    calendars["all active"] = ([1] * days_in_year, [5] * 24)
+
+    rng = random.Random(year)
+    for seed in range(20):
+        density = rng.random()
+        days = [rng.randint(1, 40) if rng.random() < density else 0 for _ in range(days_in_year)]
+        hour_counts = [rng.randint(0, 100) for _ in range(24)]
+        calendars[f"random {seed}"] = (days, hour_counts)
+
+    # GitHub pads the calendar to whole weeks, so it may run into the next year
+    days, hour_counts = calendars["random 0"]
+    calendars["padded to whole weeks"] = (days + [0, 2, 0, 0, 7, 1], hour_counts)
+    return calendars
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class CalendarStatsTest(unittest.TestCase):
+    """Both backends give the same statistics for every calendar."""
+
+    def test_backends_match(self):
+        for year in YEARS:
+            for name, (days, hours) in _calendars(year).items():
+                with self.subTest(year=year, calendar=name):
+                    self.assertEqual(
+                        _calendar_stats_numpy(days, hours, year),
+                        _calendar_stats_python(days, hours, year),
+                    )
+
+    def test_streaks_across_month_ends(self):
+        year = 2024
+        days = [0] * 366
+        # From January 30th to March 2nd, over the leap day
+        for index in range(_day(year, 1, 30), _day(year, 3, 2) + 1):
+            days[index] = 1
+
+        for backend in (_calendar_stats_numpy, _calendar_stats_python):
+            with self.subTest(backend=backend.__name__):
+                stats = backend(days, [0] * 24, year)
+                self.assertEqual(stats["longest_commit_streak"], 33)
+                self.assertEqual(stats["commits_per_month"][:3], [2, 29, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+Tests of serializing the raw facts of a user context to a blob and back.
+"""
+
+import unittest
+
+from utils.commit_store import CommitStore
+from utils.time_buckets import INVALID_EPOCH, TimezoneBuckets
+
+META = {
+    "basic": {"id": "U_1", "name": "Octo Cät", "follower": 3},
+    "contribution": {"contribution": [0, 2, 5], "commit_num": 7},
+    "stars_num": 12,
+}
+
+
+def _store(commits: dict) -> CommitStore:
+    """Get a store with a fixed set of repositories and the given commits of each."""
+    store = CommitStore()
+    store.set_repo("alpha", 1672531200, ["Python", "C"])
+    store.set_repo("βeta", None, ["Python"])
+    store.set_repo("gamma", 1700000000)
+    store.set_languages("gamma", ["Rust", "日本語"])
+    for name, (epochs, types) in commits.items():
+        store.add_commits(name, epochs, types)
+    return store
+
+
+def _columns(store: CommitStore) -> tuple:
+    return (
+        list(store.epochs),
+        list(store.types),
+        list(store.repo_ids),
+        store.repos(),
+        list(store.repo_created),
+        [store.languages(repo) for repo in range(len(store.repo_names))],
+    )
+
+
+class CommitStoreTest(unittest.TestCase):
+    """A store loaded from its blob has the columns, meta and listing it was saved with."""
+
+    def test_empty_store(self):
+        blob = CommitStore().to_bytes({}, {})
+        store = CommitStore.from_bytes(blob)
+
+        self.assertEqual(len(store), 0)
+        self.assertEqual(store.repos(), [])
+        self.assertEqual(store.meta, {})
+        self.assertEqual(store.listing, {})
+        self.assertEqual(store.to_bytes(store.meta, store.listing), blob)
+
+    def test_round_trip(self):
+        original = _store(
+            {
+                "alpha": ([1672531200, 1672534800, 1672538400], [0, 1, 11]),
+                "gamma": ([1700000000], [3]),
+            }
+        )
+        # Listed in another order than added, without the deleted `βeta`
+        listing = {"gamma": 1, "alpha": 3}
+        blob = original.to_bytes(META, listing)
+        store = CommitStore.from_bytes(blob)
+
+        self.assertIsInstance(store.epochs, memoryview)
+        self.assertEqual(_columns(store), _columns(original))
+        self.assertEqual(store.meta, META)
+        self.assertEqual(store.listing, listing)
+        self.assertEqual(list(store.listing), ["gamma", "alpha"])
+        self.assertEqual(store.to_bytes(store.meta, store.listing), blob)
+
+    def test_invalid_epochs(self):
+        original = _store({"alpha": ([None, 1672531200, None], [11, 0, 2])})
+        store = CommitStore.from_bytes(original.to_bytes(META, {"alpha": 3}))
+
+        self.assertEqual(list(store.epochs), [INVALID_EPOCH, 1672531200, INVALID_EPOCH])
+        self.assertEqual(store.repo_created[1], INVALID_EPOCH)
+        # Unparsable commits count as midnight, local time, like the `datetime` path
+        buckets = TimezoneBuckets("Asia/Shanghai", 2023)
+        self.assertEqual(
+            buckets.hour_counts(store.epochs), buckets.hour_counts([None, 1672531200, None])
+        )
+        self.assertEqual(buckets.hour_counts(store.epochs)[0], 2)
+
+    def test_append_after_loading(self):
+        blob = _store({"alpha": ([1672531200], [0])}).to_bytes(META, {"alpha": 1})
+        store = CommitStore.from_bytes(blob)
+        store.add_commits("alpha", [1672534800, None], [1, 2])
+        store.set_repo("delta", 1690000000, ["Go"])
+        store.add_commits("delta", [1690000000], [4])
+
+        expected = _store({"alpha": ([1672531200, 1672534800, None], [0, 1, 2])})
+        expected.set_repo("delta", 1690000000, ["Go"])
+        expected.add_commits("delta", [1690000000], [4])
+        listing = {"delta": 1, "alpha": 3}
+        self.assertEqual(_columns(store), _columns(expected))
+        self.assertEqual(store.to_bytes(META, listing), expected.to_bytes(META, listing))
+        # The blob the store was loaded from is left as it was
+        self.assertEqual(len(CommitStore.from_bytes(blob)), 1)
+
+    def test_invalid_blob(self):
+        blob = _store({"alpha": ([1672531200], [0])}).to_bytes(META, {"alpha": 1})
+
+        for invalid in (b"", blob[:10], blob[: len(blob) // 2], b"XXXX" + blob[4:]):
+            with self.subTest(size=len(invalid)):
+                with self.assertRaises(ValueError):
+                    CommitStore.from_bytes(invalid)
+
+
+if __name__ == "__main__":
+    unittest.main()
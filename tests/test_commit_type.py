@@ -0,0 +1,58 @@
+"""
+Tests of the commit classifier against the implementation it replaced.
+"""
+
+import unittest
+
+from benchmarks.commit_types import legacy_commit_type, make_messages
+from utils.commit_type import CONVENTIONAL_TYPES, classify, classify_many
+
+# Messages on the edges of the prefix rule and of the alias scan
+EDGE_MESSAGES = [
+    "",
+    " ",
+    ":",
+    "feat",
+    "FEAT: shout",
+    "Fix!: breaking",
+    "docs(readme): typo",
+    "refactor/parser",
+    "feat\nbody with fix",
+    "\tfix: leading tab",
+    "featured article",
+    "prefix-fix: not a prefix",
+    "Merge branch 'main' into dev",
+    "Revert \"feat: thing\"",
+    "update the cd pipeline",
+    "abcd",
+    "tests then docs",
+    "docs then tests",
+    "performance of the build",
+    "Ünïcödé fix",
+    "İstanbul",
+    "chores, chore, CHORE",
+]
+
+
+class ClassifyTest(unittest.TestCase):
+    """`classify` gives the labels of the legacy classifier."""
+
+    def test_synthetic_messages(self):
+        messages = make_messages(20000, seed=3)
+        self.assertEqual(classify_many(messages), [legacy_commit_type(m) for m in messages])
+
+    def test_edge_messages(self):
+        for message in EDGE_MESSAGES:
+            with self.subTest(message=message):
+                self.assertEqual(classify(message), legacy_commit_type(message))
+
+    def test_every_alias(self):
+        for aliases in CONVENTIONAL_TYPES.values():
+            for alias in aliases:
+                for message in (alias, f"{alias}: x", f"{alias.title()}(x)!: x", f"x {alias} x"):
+                    with self.subTest(message=message):
+                        self.assertEqual(classify(message), legacy_commit_type(message))
+
+
+if __name__ == "__main__":
+    unittest.main()
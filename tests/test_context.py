@@ -0,0 +1,146 @@
+"""
+Tests of folding GitHub information into context data piece by piece.
+"""
+
+import unittest
+
+from benchmarks.synthetic import make_github_info
+from utils.context import ContextAggregator, build_context, render_context
+
+YEAR = 2023
+# Commits before this time were fetched first, the others by a refresh
+CUTOFF = f"{YEAR}-07-01T00:00:00Z"
+TIME_ZONES = ("UTC", "Asia/Shanghai", "America/Los_Angeles", "Pacific/Kiritimati")
+
+
+def _events(data: dict) -> list:
+    """Get the events `iter_github_info` yields for the given GitHub information."""
+    events = [("basic", data["basic"])]
+    languages = []
+    for repo, detail in data["repo"].items():
+        commits = detail["commits"]
+        # Languages and further commit pages arrive after the repository
+        events.append(("repo", repo, dict(detail, languages=[], commits=commits[:100])))
+        events.extend(
+            ("commits", repo, commits[start : start + 100])
+            for start in range(100, len(commits), 100)
+        )
+        languages.append(("languages", repo, detail["languages"]))
+    events.extend(languages)
+    events.append(("contribution", data["contribution"], YEAR))
+    return events
+
+
+def _without_fetched_at(state: dict) -> dict:
+    return {key: value for key, value in state.items() if key != "fetched_at"}
+
+
+class FoldTest(unittest.TestCase):
+    """An interrupted and resumed fold ends with the aggregates of an uninterrupted one."""
+
+    def setUp(self):
+        self.data = make_github_info(40, 3000, YEAR, seed=7)
+        self.events = _events(self.data)
+
+    def _fold(self, events: list) -> ContextAggregator:
+        aggregator = ContextAggregator("octocat", YEAR, "Asia/Shanghai")
+        for event in events:
+            aggregator.add(event)
+        return aggregator
+
+    def test_resume_from_state(self):
+        single = self._fold(self.events)
+
+        # Split between the pages of a repository, so that one repository spans both halves
+        middle = next(
+            index
+            for index, event in enumerate(self.events)
+            if index > len(self.events) // 2 and event[0] == "commits"
+        )
+        first = self._fold(self.events[:middle])
+        resumed = ContextAggregator.from_state(
+            "octocat", YEAR, first.to_state(), resume=True, facts=first.facts()
+        )
+        # A resumed crawl yields the basic info again before the remaining repositories
+        for event in [self.events[0]] + self.events[middle:]:
+            resumed.add(event)
+
+        self.assertEqual(resumed.result(), single.result())
+        self.assertEqual(
+            _without_fetched_at(resumed.to_state()), _without_fetched_at(single.to_state())
+        )
+        self.assertEqual(resumed.facts(), single.facts())
+
+    def test_fold_matches_build_context(self):
+        self.assertEqual(
+            self._fold(self.events).result(),
+            build_context(self.data, "octocat", YEAR, "Asia/Shanghai"),
+        )
+
+
+class RefreshTest(unittest.TestCase):
+    """A refresh that folds only the new commits ends with the context of a full rebuild."""
+
+    def setUp(self):
+        self.data = make_github_info(40, 3000, YEAR, seed=11)
+        # The account before the cutoff: repositories created later did not exist yet
+        self.earlier = dict(
+            self.data,
+            repo={
+                repo: dict(
+                    detail,
+                    commits=[c for c in detail["commits"] if c["committedDate"] < CUTOFF],
+                )
+                for repo, detail in self.data["repo"].items()
+                if detail["createdAt"] < CUTOFF
+            },
+        )
+
+    def _refresh(self, time_zone: str) -> ContextAggregator:
+        earlier = ContextAggregator("octocat", YEAR, time_zone)
+        for event in _events(self.earlier):
+            earlier.add(event)
+
+        aggregator = ContextAggregator.from_state(
+            "octocat", YEAR, earlier.to_state(), facts=earlier.facts()
+        )
+        # The events of `iter_github_updates`: every repository without commits, then the
+        # commits after the last seen ones, and the languages of unseen repositories
+        aggregator.add(("basic", self.data["basic"]))
+        for repo, detail in self.data["repo"].items():
+            aggregator.add(("repo", repo, dict(detail, languages=[], commits=[])))
+        for repo, detail in self.data["repo"].items():
+            last_seen = earlier.last_commit_at.get(repo) or ""
+            commits = [c for c in detail["commits"] if c["committedDate"] > last_seen]
+            if commits:
+                aggregator.add(("commits", repo, commits))
+            if repo not in earlier.last_commit_at:
+                aggregator.add(("languages", repo, detail["languages"]))
+        aggregator.add(("contribution", self.data["contribution"], YEAR))
+        return aggregator
+
+    def test_refresh_matches_rebuild(self):
+        self.assertGreater(len(self.earlier["repo"]), 0)
+        self.assertLess(len(self.earlier["repo"]), len(self.data["repo"]))
+
+        for time_zone in TIME_ZONES:
+            with self.subTest(time_zone=time_zone):
+                refreshed = self._refresh(time_zone)
+                rebuilt = ContextAggregator("octocat", YEAR, time_zone)
+                for event in _events(self.data):
+                    rebuilt.add(event)
+
+                self.assertEqual(refreshed.result(), rebuilt.result())
+                self.assertEqual(
+                    _without_fetched_at(refreshed.to_state()),
+                    _without_fetched_at(rebuilt.to_state()),
+                )
+                # The facts hold the commits in another order, but render the same
+                self.assertEqual(
+                    render_context(refreshed.facts(), "octocat", YEAR, time_zone),
+                    rebuilt.result(),
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Tests of the job leases that keep a report from being fetched by several workers at once.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+
+from config.config import Config
+from models.models import db, JobLease, RequestedUser
+
+# Concurrent workers racing for the same lease
+WORKERS = 16
+
+
+class JobLeaseTest(unittest.TestCase):
+    """Only one of concurrent owners takes a lease, and leased jobs are not cleaned up."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.uri = Config.SQLALCHEMY_DATABASE_URI
+        Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(self.directory, 'jobs.db')}"
+        # pylint: disable=import-outside-toplevel
+        from app import create_app
+
+        self.app = create_app("default")
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        Config.SQLALCHEMY_DATABASE_URI = self.uri
+        shutil.rmtree(self.directory)
+
+    def test_one_owner_wins(self):
+        # pylint: disable=import-outside-toplevel
+        from services.database_service import DatabaseService
+
+        barrier = threading.Barrier(WORKERS)
+        taken = {}
+
+        def acquire(owner: str):
+            with self.app.app_context():
+                barrier.wait()
+                taken[owner] = DatabaseService.acquire_job_lease("octocat", 2023, owner, 60)
+                db.session.remove()
+
+        threads = [
+            threading.Thread(target=acquire, args=(f"worker-{n}",)) for n in range(WORKERS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        winners = [owner for owner, won in taken.items() if won]
+        self.assertEqual(len(taken), WORKERS)
+        self.assertEqual(len(winners), 1)
+        with self.app.app_context():
+            lease = JobLease.query.filter_by(username="octocat", year=2023).one()
+            self.assertEqual(lease.owner, winners[0])
+
+    def test_cleanup_keeps_leased_jobs(self):
+        # pylint: disable=import-outside-toplevel
+        from services.database_service import DatabaseService
+
+        with self.app.app_context():
+            for year in (2022, 2023):
+                DatabaseService.add_requested_user("octocat", year)
+            DatabaseService.acquire_job_lease("octocat", 2023, "worker", 60)
+            # The job of 2022 died without a checkpoint and its lease expired
+            db.session.add(
+                JobLease(
+                    username="octocat",
+                    year=2022,
+                    owner="dead-worker",
+                    expires_at=datetime.now() - timedelta(seconds=1),
+                )
+            )
+            db.session.commit()
+
+            DatabaseService._cleanup_orphaned_users()  # pylint: disable=protected-access
+
+            years = [user.year for user in RequestedUser.query.filter_by(username="octocat")]
+            self.assertEqual(years, [2023])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+Tests of the migration of databases created before contexts were kept per timezone.
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from benchmarks.synthetic import make_github_info
+from config.config import Config
+from models.models import db
+from utils.context import build_context
+
+# Schema of the tables of the first release
+LEGACY_SCHEMA = """
+    CREATE TABLE requested_users (
+        username VARCHAR(80) NOT NULL,
+        year INTEGER NOT NULL,
+        created_at DATETIME,
+        PRIMARY KEY (username, year)
+    );
+    CREATE TABLE user_contexts (
+        username VARCHAR(80) NOT NULL,
+        year INTEGER NOT NULL,
+        context TEXT NOT NULL,
+        created_at DATETIME,
+        PRIMARY KEY (username, year)
+    );
+"""
+
+
+class LegacyDatabaseTest(unittest.TestCase):
+    """Reports saved by the first release are still displayed after the migration."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        path = os.path.join(self.directory, "legacy.db")
+        self.context = build_context(make_github_info(5, 50, 2023), "octocat", 2023, "UTC")
+
+        connection = sqlite3.connect(path)
+        connection.executescript(LEGACY_SCHEMA)
+        connection.execute(
+            "INSERT INTO requested_users (username, year) VALUES (?, ?)", ("octocat", 2023)
+        )
+        connection.execute(
+            "INSERT INTO user_contexts (username, year, context) VALUES (?, ?, ?)",
+            ("octocat", 2023, json.dumps(self.context)),
+        )
+        connection.commit()
+        connection.close()
+
+        self.uri = Config.SQLALCHEMY_DATABASE_URI
+        Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        # pylint: disable=import-outside-toplevel
+        from app import create_app
+
+        self.app = create_app("default")
+        self.app.config["TESTING"] = True
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        Config.SQLALCHEMY_DATABASE_URI = self.uri
+        shutil.rmtree(self.directory)
+
+    def test_display_legacy_context(self):
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session["access_token"] = "token"
+            session["username"] = "octocat"
+            session["timezone"] = "Asia/Shanghai"
+
+        response = client.get("/display/2023")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(self.context["name"].encode("utf-8"), response.data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+Tests of the tuned SQLite profile under concurrent writers.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from sqlalchemy import text
+
+from config.config import Config
+from models.models import db
+
+WRITERS = 16
+JOBS = 5
+CHECKPOINTS = 5
+
+
+class TunedProfileTest(unittest.TestCase):
+    """Writers of every thread commit without "database is locked" errors in WAL mode."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.config = (Config.SQLALCHEMY_DATABASE_URI, Config.SQLITE_PROFILE)
+        Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(self.directory, 'stress.db')}"
+        Config.SQLITE_PROFILE = "tuned"
+        # pylint: disable=import-outside-toplevel
+        from app import create_app
+
+        # Engine options and pragmas of the profile are set up by the app
+        self.app = create_app("default")
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        Config.SQLALCHEMY_DATABASE_URI, Config.SQLITE_PROFILE = self.config
+        shutil.rmtree(self.directory)
+
+    def _write(self, index: int, barrier: threading.Barrier, results: list):
+        """Run the writes of the jobs of one worker, like `DataService` does."""
+        # pylint: disable=import-outside-toplevel
+        from services.database_service import DatabaseService
+
+        state = {"fetch": {"cursor": "x" * 64}, "aggregate": {"commit_time_num": [0] * 24}}
+        context = json.dumps({"commits_per_day": [index] * 365})
+        with self.app.app_context():
+            barrier.wait()
+            for job in range(JOBS):
+                username, year, owner = f"user-{index}-{job}", 2023, f"owner-{index}"
+                calls = [
+                    (DatabaseService.add_requested_user, username, year),
+                    (DatabaseService.acquire_job_lease, username, year, owner, 60),
+                ]
+                for _ in range(CHECKPOINTS):
+                    calls.append((DatabaseService.save_job_checkpoint, username, year, state))
+                    calls.append((DatabaseService.renew_job_leases, username, [year], owner, 60))
+                calls.extend(
+                    [
+                        (DatabaseService.save_user_facts, username, year, os.urandom(4096)),
+                        (DatabaseService.add_user_context, username, year, "UTC", context),
+                        (DatabaseService.delete_job_checkpoint, username, year),
+                        (DatabaseService.release_job_leases, username, [year], owner),
+                    ]
+                )
+                for fn, *args in calls:
+                    results.append((fn.__name__, fn(*args)))
+                db.session.remove()
+
+    def test_concurrent_writers(self):
+        barrier = threading.Barrier(WRITERS)
+        results = []
+        threads = [
+            threading.Thread(target=self._write, args=(index, barrier, results))
+            for index in range(WRITERS)
+        ]
+        # Writes log their errors, like "database is locked", and return False
+        with self.assertNoLogs(level="ERROR"):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(results), WRITERS * JOBS * (2 * CHECKPOINTS + 6))
+        self.assertEqual([name for name, ok in results if ok is False], [])
+        with self.app.app_context():
+            self.assertEqual(db.session.execute(text("PRAGMA journal_mode")).scalar(), "wal")
+            self.assertEqual(
+                db.session.execute(text("SELECT COUNT(*) FROM user_contexts")).scalar(),
+                WRITERS * JOBS,
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
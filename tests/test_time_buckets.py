@@ -0,0 +1,127 @@
+"""
+Tests of the timezone buckets against parsing every commit time with `datetime`, as the
+report did before `utils.time_buckets`.
+"""
+
+import calendar
+import random
+import time
+import unittest
+from array import array
+from datetime import datetime
+
+import pytz
+
+from utils.time_buckets import TimezoneBuckets
+
+# Whole, half and quarter hour offsets, northern and southern DST, and the date line
+TIME_ZONES = (
+    "UTC",
+    "America/New_York",
+    "America/Los_Angeles",
+    "America/St_Johns",
+    "America/Sao_Paulo",
+    "Europe/London",
+    "Europe/Berlin",
+    "Asia/Kolkata",
+    "Asia/Kathmandu",
+    "Asia/Shanghai",
+    "Australia/Sydney",
+    "Australia/Lord_Howe",
+    "Pacific/Chatham",
+    "Pacific/Kiritimati",
+)
+YEARS = (2023, 2024)
+INVALID_DATES = ("not a date", "2023-02-30T12:00:00Z", "2023-01-01 12:00:00", "")
+
+
+def _format(epoch: int) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(epoch))
+
+
+def _legacy_local(date: str, time_zone: str) -> datetime:
+    """Parse a UTC timestamp to the timezone like the report used to, for every commit."""
+    try:
+        return (
+            datetime.strptime(date, "%Y-%m-%dT%H:%M:%SZ")
+            .replace(tzinfo=pytz.UTC)
+            .astimezone(pytz.timezone(time_zone))
+        )
+    except ValueError:
+        return datetime(2000, 1, 1)
+
+
+def _dates(time_zone: str, year: int) -> list:
+    """Get timestamps around the DST transitions and year boundaries, and random ones."""
+    tz = pytz.timezone(time_zone)
+    epochs = []
+
+    # The seconds around every offset change near the year
+    year_start = calendar.timegm((year, 1, 1, 0, 0, 0))
+    for transition in getattr(tz, "_utc_transition_times", []):
+        epoch = calendar.timegm(transition.timetuple())
+        if year_start - 3 * 86400 <= epoch <= year_start + 370 * 86400:
+            epochs.extend(epoch + delta for delta in (-3601, -1, 0, 1, 3599, 3600))
+
+    # The seconds around local and UTC midnight of the first and last day of the year
+    for boundary_year in (year, year + 1):
+        local_midnight = tz.localize(datetime(boundary_year, 1, 1))
+        utc_midnight = calendar.timegm((boundary_year, 1, 1, 0, 0, 0))
+        for epoch in (calendar.timegm(local_midnight.utctimetuple()), utc_midnight):
+            epochs.extend(epoch + delta for delta in (-86400, -3600, -1, 0, 1, 3600))
+
+    rng = random.Random(f"{time_zone}-{year}")
+    epochs.extend(
+        year_start + rng.randrange(-5 * 86400, 371 * 86400) for _ in range(500)
+    )
+    # Years away from the one bucketed, whose offsets are not in the table
+    epochs.extend(
+        calendar.timegm((rng.choice((2008, 2015, 2031)), 1, 1, 0, 0, 0))
+        + rng.randrange(366 * 86400)
+        for _ in range(50)
+    )
+    return [_format(epoch) for epoch in epochs] + list(INVALID_DATES)
+
+
+class TimezoneBucketsTest(unittest.TestCase):
+    """Buckets give the local hours and days of parsing every timestamp with `datetime`."""
+
+    def test_matches_datetime(self):
+        for time_zone in TIME_ZONES:
+            for year in YEARS:
+                with self.subTest(time_zone=time_zone, year=year):
+                    buckets = TimezoneBuckets(time_zone, year)
+                    dates = _dates(time_zone, year)
+                    expected = [_legacy_local(date, time_zone) for date in dates]
+
+                    self.assertEqual(buckets.hours(dates), [local.hour for local in expected])
+                    self.assertEqual(
+                        [buckets.in_year(date) for date in dates],
+                        [local.year == year for local in expected],
+                    )
+                    self.assertEqual(
+                        [day for day in buckets.days(dates) if 0 <= day < buckets.days_in_year],
+                        [
+                            local.timetuple().tm_yday - 1
+                            for local in expected
+                            if local.year == year
+                        ],
+                    )
+
+    def test_hour_counts_of_columns(self):
+        for time_zone in TIME_ZONES:
+            with self.subTest(time_zone=time_zone):
+                buckets = TimezoneBuckets(time_zone, 2024)
+                dates = _dates(time_zone, 2024)[: -len(INVALID_DATES)]
+                expected = [0] * 24
+                for date in dates:
+                    expected[_legacy_local(date, time_zone).hour] += 1
+
+                epochs = buckets.epochs(dates)
+                self.assertEqual(buckets.hour_counts(epochs), expected)
+                # Int64 columns, like those of a `CommitStore`, are read in place
+                self.assertEqual(buckets.hour_counts(array("q", epochs)), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,460 @@
+"""
+This module provides the aliased GitHub GraphQL queries that page many repositories in one
+call, and the follow-ups that run them alongside the repository crawl of `utils.fetch_data`.
+
+Functions:
+    build_commit_batch_query(count: int, commit_fields: tuple) -> str:
+        Build a query for the next commit page of `count` repositories at once.
+    commit_batch_size() -> int:
+        Get the number of repositories to put in one commit batch.
+    commit_batch_variables(user_name: str, user_id: str, year: int, names: list,
+                           cursors: dict, last_year: int, since: dict) -> dict:
+        Get the variables of `build_commit_batch_query` for the given repositories.
+    build_language_batch_query(count: int) -> str:
+        Build a query for the languages of `count` repositories at once.
+    language_batch_size() -> int:
+        Get the number of repositories to put in one language batch.
+    language_batch_variables(user_name: str, names: list) -> dict:
+        Get the variables of `build_language_batch_query` for the given repositories.
+    parse_language_batch(result: dict, names: list) -> dict:
+        Convert the result of a language batch to the languages of each repository.
+    parse_commit_history(repository: dict) -> dict:
+        Convert a `repository` field of a commit batch to the commit history page.
+    merge_commit_batch(result: dict, names: list, cursors: dict, tries: dict,
+                       commits: dict) -> None:
+        Add the pages of a commit batch to `commits` and move `cursors` to the next pages.
+    fail_commit_batch(names: list, cursors: dict, tries: dict) -> None:
+        Count a failed try of the current page of the given repositories.
+
+Classes:
+    FollowUps:
+        Page commit batches and fetch language batches on an executor.
+"""
+
+import functools
+import logging
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterator
+
+from config.config import Config
+from utils.query_fields import (
+    DEFAULT_COMMIT_FIELDS,
+    RATE_LIMIT_FIELD,
+    commit_field_selection,
+    year_range,
+)
+
+# One aliased `repository` field of a commit batch, see `build_commit_batch_query`
+COMMIT_BATCH_FIELD = """
+            r%(index)d: repository(name: $name%(index)d) {
+                defaultBranchRef {
+                    target {
+                        ... on Commit {
+                            history(first: 100, since: $since%(index)d, until: $until, author: {id: $id}, after: $after%(index)d) {
+                                nodes {%(commit_fields)s
+                                }
+                                pageInfo{
+                                    hasNextPage
+                                    startCursor
+                                    endCursor
+                                }
+                            }
+                        }
+                    }
+                }
+            }"""
+
+# One aliased `repository` field of a language batch, see `build_language_batch_query`
+LANGUAGE_BATCH_FIELD = """
+            r%(index)d: repository(name: $name%(index)d) {
+                languages(first: 100) {
+                    nodes {
+                        name
+                    }
+                }
+            }"""
+
+# GitHub rejects queries that may return more than 500,000 nodes; every repository in a
+# batch asks for a page of 100 commits or languages
+MAX_QUERY_NODES = 500000
+COMMIT_PAGE_SIZE = 100
+LANGUAGE_PAGE_SIZE = 100
+
+
+@functools.lru_cache(maxsize=None)
+def build_commit_batch_query(count: int, commit_fields: tuple = DEFAULT_COMMIT_FIELDS) -> str:
+    """
+    Build a query for the next commit page of `count` repositories at once, with only the
+    given fields of each commit.
+
+    Repository `i` is queried as the alias `r{i}` with the variables `$name{i}`,
+    `$since{i}` and `$after{i}`, see `commit_batch_variables`.
+    """
+    selection = commit_field_selection(commit_fields, 36)
+    params = "".join(
+        f", $name{i}: String!, $since{i}: GitTimestamp!, $after{i}: String" for i in range(count)
+    )
+    fields = "".join(
+        COMMIT_BATCH_FIELD % {"index": i, "commit_fields": selection} for i in range(count)
+    )
+    return """
+    query($username: String!, $id: ID!, $until: GitTimestamp!%s) {%s
+        user(login: $username) {%s
+        }
+    }
+    """ % (
+        params,
+        RATE_LIMIT_FIELD,
+        fields,
+    )
+
+
+def commit_batch_size() -> int:
+    """Get the number of repositories to put in one commit batch."""
+    return max(1, min(Config.COMMIT_BATCH_SIZE, MAX_QUERY_NODES // COMMIT_PAGE_SIZE))
+
+
+def commit_batch_variables(
+    user_name: str,
+    user_id: str,
+    year: int,
+    names: list,
+    cursors: dict,
+    last_year: int = None,
+    since: dict = None,
+) -> dict:
+    """Get the variables of `build_commit_batch_query` for the given repositories, with the
+    commits from `year` to `last_year`, or from the time in `since` of a repository."""
+    start_time, end_time = year_range(year, last_year)
+    since = since or {}
+
+    variables = {
+        "username": user_name,
+        "id": user_id,
+        "until": end_time,
+    }
+    for i, name in enumerate(names):
+        variables[f"name{i}"] = name
+        variables[f"since{i}"] = since.get(name) or start_time
+        variables[f"after{i}"] = cursors[name]
+    return variables
+
+
+@functools.lru_cache(maxsize=None)
+def build_language_batch_query(count: int) -> str:
+    """
+    Build a query for the languages of `count` repositories at once.
+
+    Repository `i` is queried as the alias `r{i}` with the variable `$name{i}`.
+    """
+    params = "".join(f", $name{i}: String!" for i in range(count))
+    fields = "".join(LANGUAGE_BATCH_FIELD % {"index": i} for i in range(count))
+    return """
+    query($username: String!%s) {%s
+        user(login: $username) {%s
+        }
+    }
+    """ % (
+        params,
+        RATE_LIMIT_FIELD,
+        fields,
+    )
+
+
+def language_batch_size() -> int:
+    """Get the number of repositories to put in one language batch."""
+    return max(1, min(Config.LANGUAGE_BATCH_SIZE, MAX_QUERY_NODES // LANGUAGE_PAGE_SIZE))
+
+
+def language_batch_variables(user_name: str, names: list) -> dict:
+    """Get the variables of `build_language_batch_query` for the given repositories."""
+    variables = {
+        "username": user_name,
+    }
+    for i, name in enumerate(names):
+        variables[f"name{i}"] = name
+    return variables
+
+
+def parse_language_batch(result: dict, names: list) -> dict:
+    """
+    Convert the result of a language batch to the languages of each repository.
+    Repositories that no longer exist are left out.
+    """
+    user = result.get("user") if result else None
+    if not user:
+        raise ValueError("`user` not in language_result")
+
+    languages = {}
+    for i, name in enumerate(names):
+        repository = user.get(f"r{i}")
+        if not repository:
+            continue
+        try:
+            languages[name] = [
+                lang["name"] for lang in repository["languages"]["nodes"] or []
+            ]
+        except Exception as e:  # pylint: disable=broad-except
+            logging.error(
+                "Unexpected error: Failed to get languages info: %s.",
+                e,
+            )
+    return languages
+
+
+def parse_commit_history(repository: dict) -> dict:
+    """
+    Convert a `repository` field of a commit batch to the commit history page.
+
+    Returns:
+        dict: The history page, or None when the repository no longer exists.
+    """
+    if not repository:
+        logging.error("`repository` not in commit_user")
+        return None
+
+    default_branch_ref = repository.get("defaultBranchRef")
+    if not default_branch_ref:
+        raise ValueError("`defaultBranchRef` not in repository")
+
+    history = default_branch_ref["target"]["history"]
+    if not history:
+        raise ValueError("`history` not in repository['defaultBranchRef']['target']")
+    return history
+
+
+def merge_commit_batch(
+    result: dict, names: list, cursors: dict, tries: dict, commits: dict
+) -> None:
+    """
+    Add the pages of a commit batch to `commits` and move `cursors` to the next pages.
+
+    Repositories without more commits, or that no longer exist, are removed from `cursors`.
+    A repository whose page could not be read counts a failed try, see `fail_commit_batch`.
+    """
+    commit_user = result.get("user") if result else None
+    if not commit_user:
+        raise ValueError("`user` not in commit_result")
+
+    for i, name in enumerate(names):
+        try:
+            history = parse_commit_history(commit_user.get(f"r{i}"))
+        except Exception as e:  # pylint: disable=broad-except
+            logging.error(
+                "Unexpected error: Failed to get commit info: %s.",
+                e,
+            )
+            fail_commit_batch([name], cursors, tries)
+            continue
+
+        if not history:
+            cursors.pop(name)
+            continue
+
+        if history["nodes"]:
+            commits[name].extend(history["nodes"])
+        tries.pop(name, None)
+
+        if history["pageInfo"]["hasNextPage"]:
+            cursors[name] = history["pageInfo"]["endCursor"]
+        else:
+            cursors.pop(name)
+
+
+def fail_commit_batch(names: list, cursors: dict, tries: dict) -> None:
+    """
+    Count a failed try of the current page of the given repositories. After 3 failed tries
+    of the same page, the repository keeps the commits collected so far and stops paging.
+    """
+    for name in names:
+        tries[name] = tries.get(name, 0) + 1
+        if tries[name] >= 3:
+            cursors.pop(name)
+
+
+def _submit(executor: ThreadPoolExecutor, fn, *args) -> Future:
+    """Run `fn` on the executor, or right away when running serially."""
+    if executor:
+        return executor.submit(fn, *args)
+
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:  # pylint: disable=broad-except
+        future.set_exception(e)
+    return future
+
+
+class FollowUps:
+    """
+    Page commit batches and fetch language batches on the executor, and hand out their
+    results in submission order. Every batch is sent with `query(text, variables, token)`,
+    which returns the `data` of the response.
+
+    A commit batch is sent one page at a time and is queued again after each page, so only
+    one page per batch is held in memory. At most twice as many commit batches as there are
+    workers are paged at the same time; the others wait with just their cursors.
+    """
+
+    def __init__(
+        self,
+        executor: ThreadPoolExecutor,
+        query: Callable,
+        user_name: str,
+        user_id: str,
+        token: str,
+        year: int,
+        commit_fields: tuple,
+        last_year: int,
+    ):
+        self._executor = executor
+        self._query = query
+        self._args = (user_name, user_id, token, year, commit_fields, last_year)
+        self._limit = max(Config.COMMIT_FETCH_WORKERS, 1) * 2
+        self._active = 0
+        self._waiting = deque()
+        self._in_flight = deque()
+
+    def add_commits(self, cursors: dict, since: dict = None) -> None:
+        """Queue a batch of repositories whose commits continue after `cursors`, or start at
+        the time in `since` of a repository."""
+        self._waiting.append({"cursors": dict(cursors), "since": since, "tries": {}})
+        self._start()
+
+    def add_languages(self, names: list) -> None:
+        """Queue a batch of repositories whose languages are needed."""
+        user_name, _, token = self._args[:3]
+        names = list(names)
+        future = _submit(self._executor, _get_languages, self._query, user_name, token, names)
+        self._in_flight.append((future, "languages", names))
+
+    def pending(self) -> bool:
+        """Check whether any batch is not finished."""
+        return bool(self._in_flight)
+
+    def drain(self, block: bool, count: int = None) -> Iterator[tuple]:
+        """
+        Yield the results of finished batches in submission order. With `block`, wait until
+        every batch, or `count` batches, are finished.
+        """
+        while self._in_flight and (block or self._in_flight[0][0].done()):
+            if count is not None:
+                if count <= 0:
+                    break
+                count -= 1
+
+            future, kind, batch = self._in_flight.popleft()
+            if kind == "languages":
+                for repo_name, languages in future.result().items():
+                    yield "languages", repo_name, languages
+                continue
+
+            self._active -= 1
+            for repo_name, commits in future.result().items():
+                if commits:
+                    yield "commits", repo_name, commits
+            if batch["cursors"]:
+                # Batches that are already running go before the waiting ones
+                self._waiting.appendleft(batch)
+            self._start()
+
+    def checkpoint(self) -> dict:
+        """
+        Get the batches that are not finished, as they were before the page that is being
+        fetched, so that they can be added again to resume.
+
+        Returns:
+            dict: The `commits` batches, with their `cursors` and `since`, and the
+                  `languages` batches.
+        """
+        commits = [
+            {"cursors": batch["started"], "since": batch["since"]}
+            for _, kind, batch in self._in_flight
+            if kind == "commits"
+        ]
+        commits.extend(
+            {"cursors": dict(batch["cursors"]), "since": batch["since"]}
+            for batch in self._waiting
+        )
+        languages = [batch for _, kind, batch in self._in_flight if kind == "languages"]
+        return {"commits": commits, "languages": languages}
+
+    def _start(self) -> None:
+        while self._waiting and self._active < self._limit:
+            batch = self._waiting.popleft()
+            # The page moves the cursors on in the worker; a checkpoint needs them as before
+            batch["started"] = dict(batch["cursors"])
+            future = _submit(
+                self._executor,
+                _get_commit_page,
+                self._query,
+                batch["cursors"],
+                batch["tries"],
+                batch["since"],
+                *self._args,
+            )
+            self._in_flight.append((future, "commits", batch))
+            self._active += 1
+
+
+def _get_commit_page(
+    query: Callable,
+    cursors: dict,
+    tries: dict,
+    since: dict,
+    user_name: str,
+    user_id: str,
+    token: str,
+    year: int,
+    commit_fields: tuple,
+    last_year: int,
+) -> dict:
+    """
+    Get the next commit page of a batch of repositories, starting after their cursors.
+
+    All repositories of the batch that still have commits are paged together in one aliased
+    query. `cursors` and `tries` are moved on to the following page.
+
+    Returns:
+        dict: The commits of the page of each repository.
+    """
+    names = list(cursors)
+    commits = {name: [] for name in names}
+    try:
+        result = query(
+            build_commit_batch_query(len(names), commit_fields),
+            commit_batch_variables(
+                user_name, user_id, year, names, cursors, last_year, since
+            ),
+            token,
+        )
+        merge_commit_batch(result, names, cursors, tries, commits)
+    except Exception as e:  # pylint: disable=broad-except
+        logging.error(
+            "Unexpected error: Failed to get commit info: %s.",
+            e,
+        )
+        fail_commit_batch(names, cursors, tries)
+
+    return commits
+
+
+def _get_languages(query: Callable, user_name: str, token: str, names: list) -> dict:
+    """
+    Get the languages of a batch of repositories. A failed batch is logged and leaves the
+    languages of its repositories empty.
+    """
+    try:
+        result = query(
+            build_language_batch_query(len(names)),
+            language_batch_variables(user_name, names),
+            token,
+        )
+        return parse_language_batch(result, names)
+    except Exception as e:  # pylint: disable=broad-except
+        logging.error(
+            "Unexpected error: Failed to get languages info: %s.",
+            e,
+        )
+        return {}
@@ -0,0 +1,164 @@
+"""
+This module computes the calendar statistics of the context data from the contribution
+calendar and the commits per local hour.
+
+There are two backends with identical results: "python", and "numpy", which works on whole
+arrays at once. `Config.AGGREGATION_BACKEND` selects one; "numpy" falls back to "python" when
+NumPy is not installed.
+
+Functions:
+    use_numpy() -> bool:
+        Check whether the NumPy backend is used.
+    hour_histogram(hours: list) -> list:
+        Count the commits in each hour of the day.
+    calendar_stats(commits_per_day: list, commits_per_hour: list, year: int) -> dict:
+        Get the activity per month and weekday, the streaks and the maxima of a year.
+"""
+
+import calendar
+import logging
+from datetime import datetime, timedelta
+from itertools import groupby
+
+from config.config import Config
+from utils.logging_config import setup_logging
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+setup_logging()
+
+_warned = False
+
+
+def use_numpy() -> bool:
+    """
+    Check whether the NumPy backend is used.
+
+    Returns:
+        bool: True if `Config.AGGREGATION_BACKEND` is "numpy" and NumPy is installed.
+    """
+    global _warned  # pylint: disable=global-statement
+
+    if Config.AGGREGATION_BACKEND != "numpy":
+        return False
+    if np is None:
+        if not _warned:
+            logging.warning("NumPy is not installed, using the Python aggregation backend")
+            _warned = True
+        return False
+    return True
+
+
+def hour_histogram(hours: list) -> list:
+    """
+    Count the commits in each hour of the day.
+
+    Args:
+        hours (list): The local hour of each commit.
+
+    Returns:
+        list: The number of commits in each of the 24 hours.
+    """
+    if use_numpy():
+        return np.bincount(np.asarray(hours, dtype=np.int64), minlength=24).tolist()
+
+    histogram = [0] * 24
+    for hour in hours:
+        histogram[hour] += 1
+    return histogram
+
+
+def calendar_stats(commits_per_day: list, commits_per_hour: list, year: int) -> dict:
+    """
+    Get the activity per month and weekday, the streaks and the maxima of a year.
+
+    Args:
+        commits_per_day (list): The number of activities in each day of the year.
+        commits_per_hour (list): The number of commits in each local hour.
+        year (int): The year of the calendar.
+
+    Returns:
+        dict: The number of active days, the longest active and inactive streaks, the
+              maximum number of activities in a day, the activities in each month and
+              weekday, and the indexes of the most active month, weekday and hour.
+    """
+    days_in_year = 366 if calendar.isleap(year) else 365
+    if use_numpy() and len(commits_per_day) >= days_in_year:
+        return _calendar_stats_numpy(commits_per_day, commits_per_hour, year)
+    return _calendar_stats_python(commits_per_day, commits_per_hour, year)
+
+
+def _calendar_stats_python(commits_per_day: list, commits_per_hour: list, year: int) -> dict:
+    # Longest runs of active and of inactive days
+    longest_commit_streak = max(
+        (len(list(g)) for k, g in groupby(commits_per_day, key=lambda x: x > 0) if k),
+        default=0,
+    )
+    longest_commit_break = max(
+        (len(list(g)) for k, g in groupby(commits_per_day, key=lambda x: x == 0) if k),
+        default=0,
+    )
+
+    days_in_month = [calendar.monthrange(year, month)[1] for month in range(1, 13)]
+    commits_per_month = [
+        sum(commits_per_day[sum(days_in_month[:i]) : sum(days_in_month[: i + 1])])
+        for i in range(12)
+    ]
+
+    days_in_year = 366 if calendar.isleap(year) else 365
+    commits_per_weekday = [0] * 7
+    for i in range(days_in_year):
+        commits_per_weekday[
+            (datetime(year, 1, 1) + timedelta(days=i)).weekday()
+        ] += commits_per_day[i]
+
+    return {
+        "commits_days_num": len([x for x in commits_per_day if x > 0]),
+        "longest_commit_streak": longest_commit_streak,
+        "longest_commit_break": longest_commit_break,
+        "max_commits_per_day": max(commits_per_day),
+        "commits_per_month": commits_per_month,
+        "commits_per_weekday": commits_per_weekday,
+        "most_active_month": commits_per_month.index(max(commits_per_month)),
+        "most_active_weekday": commits_per_weekday.index(max(commits_per_weekday)),
+        "most_active_hour": commits_per_hour.index(max(commits_per_hour)),
+    }
+
+
+def _longest_run(mask) -> int:
+    # Runs start where the padded mask rises and end where it falls
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    lengths = np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+    return int(lengths.max()) if lengths.size else 0
+
+
+def _calendar_stats_numpy(commits_per_day: list, commits_per_hour: list, year: int) -> dict:
+    days = np.asarray(commits_per_day, dtype=np.int64)
+    hours = np.asarray(commits_per_hour, dtype=np.int64)
+    days_in_year = 366 if calendar.isleap(year) else 365
+    in_year = days[:days_in_year]
+
+    # Activities summed between the first days of consecutive months
+    days_in_month = [calendar.monthrange(year, month)[1] for month in range(1, 13)]
+    month_starts = np.concatenate(([0], np.cumsum(days_in_month)[:-1]))
+    commits_per_month = np.add.reduceat(in_year, month_starts)
+
+    # Weekday of every day of the year, starting from the weekday of January 1st
+    weekdays = (np.arange(days_in_year) + calendar.weekday(year, 1, 1)) % 7
+    commits_per_weekday = np.bincount(weekdays, weights=in_year, minlength=7).astype(np.int64)
+
+    active = days > 0
+    return {
+        "commits_days_num": int(np.count_nonzero(active)),
+        "longest_commit_streak": _longest_run(active),
+        "longest_commit_break": _longest_run(days == 0),
+        "max_commits_per_day": int(days.max()),
+        "commits_per_month": commits_per_month.tolist(),
+        "commits_per_weekday": commits_per_weekday.tolist(),
+        "most_active_month": int(commits_per_month.argmax()),
+        "most_active_weekday": int(commits_per_weekday.argmax()),
+        "most_active_hour": int(hours.argmax()),
+    }
@@ -0,0 +1,184 @@
+"""
+This module records GitHub API exchanges to a cassette file and replays them offline.
+
+With `Config.CASSETTE_MODE = "record"`, every GraphQL and REST exchange is appended to the
+gzipped JSON lines file `Config.CASSETTE_PATH`. With `"replay"`, the same requests are
+answered from that file without any network access, optionally with `Config.CASSETTE_LATENCY`
+seconds of extra latency and a `Config.CASSETTE_ERROR_RATE` share of injected 502 errors,
+so slow real-world accounts can be reproduced and measured repeatably.
+
+Exchanges are matched by method, URL path and request body, not by access token or page
+size, so a cassette can be replayed with any token. The OAuth token exchange is never recorded.
+Cassettes contain the fetched data, including private repository names and commit messages.
+
+Classes:
+    CassetteMiss:
+        Raised when a replayed request is not in the cassette.
+
+Functions:
+    is_recording() -> bool:
+        Check whether exchanges are being recorded.
+    is_replaying() -> bool:
+        Check whether requests are answered from the cassette.
+    record(method: str, url: str, payload, status: int, headers: dict, content: bytes) -> None:
+        Append an exchange to the cassette.
+    replay(method: str, url: str, payload) -> tuple:
+        Answer a request from the cassette.
+    replay_async(method: str, url: str, payload) -> tuple:
+        Answer a request from the cassette, without blocking the event loop.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+from requests.structures import CaseInsensitiveDict
+
+from config.config import Config
+
+# Only the headers the fetch layer reads are kept
+_RECORDED_HEADERS = (
+    "Content-Type",
+    "Retry-After",
+    "X-RateLimit-Limit",
+    "X-RateLimit-Remaining",
+    "X-RateLimit-Reset",
+    "X-RateLimit-Resource",
+)
+
+_PAGE_SIZE = re.compile(r"first: \d+")
+
+_lock = threading.Lock()
+_entries = None
+_positions = {}
+
+
+class CassetteMiss(Exception):
+    """
+    Raised when a replayed request is not in the cassette.
+    """
+
+
+def is_recording() -> bool:
+    """Check whether exchanges are being recorded."""
+    return Config.CASSETTE_MODE == "record"
+
+
+def is_replaying() -> bool:
+    """Check whether requests are answered from the cassette."""
+    return Config.CASSETTE_MODE == "replay"
+
+
+def _key(method: str, url: str, payload) -> str:
+    parts = urlsplit(url)
+    if isinstance(payload, dict) and isinstance(payload.get("query"), str):
+        # The adaptive page size depends on timing; the recorded cursors are followed anyway
+        payload = dict(payload, query=_PAGE_SIZE.sub("first: N", payload["query"]))
+    digest = hashlib.sha256()
+    digest.update(f"{method.upper()} {parts.path}?{parts.query}".encode("utf-8"))
+    digest.update(json.dumps(payload, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def record(method: str, url: str, payload, status: int, headers: dict, content: bytes) -> None:
+    """
+    Append an exchange to the cassette.
+
+    Args:
+        method (str): The HTTP method.
+        url (str): The request URL.
+        payload: The JSON body or query parameters of the request.
+        status (int): The response status code.
+        headers (dict): The response headers.
+        content (bytes): The response body.
+    """
+    if url.startswith(Config.GITHUB_TOKEN_URL):
+        return
+
+    entry = {
+        "key": _key(method, url, payload),
+        "status": status,
+        "headers": {h: headers[h] for h in _RECORDED_HEADERS if headers.get(h) is not None},
+        "body": content.decode("utf-8"),
+    }
+    line = json.dumps(entry, separators=(",", ":")) + "\n"
+    with _lock:
+        # Every append is a separate gzip member, which gzip reads back as one stream
+        with gzip.open(Config.CASSETTE_PATH, "at", encoding="utf-8") as f:
+            f.write(line)
+
+
+def _load() -> dict:
+    global _entries  # pylint: disable=global-statement
+
+    if _entries is None:
+        entries = {}
+        try:
+            with gzip.open(Config.CASSETTE_PATH, "rt", encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    entries.setdefault(entry["key"], []).append(entry)
+        except FileNotFoundError:
+            logging.error("Cassette not found: %s", Config.CASSETTE_PATH)
+        logging.info(
+            "Loaded cassette %s: %d requests", Config.CASSETTE_PATH, len(entries)
+        )
+        _entries = entries
+    return _entries
+
+
+def _next_entry(method: str, url: str, payload) -> tuple:
+    key = _key(method, url, payload)
+    with _lock:
+        entries = _load().get(key)
+        if not entries:
+            raise CassetteMiss(f"{method} {url} is not in the cassette")
+
+        # Repeated requests get the recorded responses in order, then the last one again
+        position = _positions.get(key, 0)
+        _positions[key] = position + 1
+        entry = entries[min(position, len(entries) - 1)]
+
+    if random.random() < Config.CASSETTE_ERROR_RATE:
+        return 502, CaseInsensitiveDict(), b'{"message": "Injected error"}'
+    return (
+        entry["status"],
+        CaseInsensitiveDict(entry["headers"]),
+        entry["body"].encode("utf-8"),
+    )
+
+
+def replay(method: str, url: str, payload) -> tuple:
+    """
+    Answer a request from the cassette.
+
+    Args:
+        method (str): The HTTP method.
+        url (str): The request URL.
+        payload: The JSON body or query parameters of the request.
+
+    Returns:
+        tuple: The status code, headers and body of the recorded response.
+
+    Raises:
+        CassetteMiss: If the request is not in the cassette.
+    """
+    if Config.CASSETTE_LATENCY > 0:
+        time.sleep(Config.CASSETTE_LATENCY)
+    return _next_entry(method, url, payload)
+
+
+async def replay_async(method: str, url: str, payload) -> tuple:
+    """
+    Answer a request from the cassette, without blocking the event loop. See `replay`.
+    """
+    if Config.CASSETTE_LATENCY > 0:
+        await asyncio.sleep(Config.CASSETTE_LATENCY)
+    return _next_entry(method, url, payload)
@@ -0,0 +1,281 @@
+"""
+This module keeps the raw facts of a user context in compact columns.
+
+Every commit takes one slot in three parallel columns: its UTC epoch (int64), its type code
+(uint8, an index in `COMMIT_TYPES`) and the index of its repository (uint32). Repositories
+have columns of their name and creation epoch, and a list of languages; names and languages
+are interned in one string table.
+
+A store is serialized to a single blob: a header with the length of every column, then the
+columns, each aligned to 8 bytes, and a small JSON document with the basic info and the
+contributions. `CommitStore.from_bytes` maps the commit columns onto the blob through
+`memoryview` without copying or parsing them.
+
+Classes:
+    CommitStore:
+        Columns of the commits and repositories of a user context.
+"""
+
+import json
+import struct
+import sys
+from array import array
+
+from utils.time_buckets import INVALID_EPOCH
+
+_MAGIC = b"MGCS"
+_VERSION = 1
+
+# Columns of the blob, in order, with their array type codes
+_COLUMNS = (
+    ("epochs", "q"),
+    ("types", "B"),
+    ("repo_ids", "I"),
+    ("repo_names", "I"),
+    ("repo_created", "q"),
+    ("language_offsets", "I"),
+    ("language_ids", "I"),
+    ("listed_repos", "I"),
+    ("listed_commits", "q"),
+    ("string_offsets", "I"),
+    ("string_data", "B"),
+    ("meta", "B"),
+)
+_HEADER = struct.Struct("<4sHH" + "I" * len(_COLUMNS))
+
+
+def _padding(size: int) -> int:
+    return -size % 8
+
+
+class CommitStore:
+    """
+    Columns of the commits and repositories of a user context.
+
+    Commits are appended with `add_commits`; a store loaded with `from_bytes` views the blob
+    until a commit is added to it.
+    """
+
+    def __init__(self):
+        self.epochs = array("q")
+        self.types = array("B")
+        self.repo_ids = array("I")
+        self.repo_names = array("I")
+        self.repo_created = array("q")
+        self.repo_languages = []
+        self.strings = []
+        self.meta = {}
+        self.listing = {}
+        self._string_ids = {}
+        self._repo_ids = {}
+
+    def __len__(self) -> int:
+        return len(self.epochs)
+
+    def intern(self, string: str) -> int:
+        """
+        Get the index of a string in the string table, adding it if needed.
+
+        Args:
+            string (str): The string.
+
+        Returns:
+            int: The index.
+        """
+        index = self._string_ids.get(string)
+        if index is None:
+            index = self._string_ids[string] = len(self.strings)
+            self.strings.append(string)
+        return index
+
+    def repos(self) -> list:
+        """
+        Get the names of the repositories, in the order they were added.
+
+        Returns:
+            list: The names.
+        """
+        return [self.strings[name] for name in self.repo_names]
+
+    def languages(self, repo: int) -> list:
+        """
+        Get the languages of a repository.
+
+        Args:
+            repo (int): The index of the repository.
+
+        Returns:
+            list: The languages.
+        """
+        return [self.strings[language] for language in self.repo_languages[repo]]
+
+    def set_repo(self, name: str, created_at: int, languages: list = None) -> int:
+        """
+        Add a repository, or update its creation time and languages.
+
+        Args:
+            name (str): The name of the repository.
+            created_at (int): The epoch of its creation, None if unknown.
+            languages (list): Its languages, None to keep those already known.
+
+        Returns:
+            int: The index of the repository.
+        """
+        repo = self._repo_ids.get(name)
+        if repo is None:
+            repo = self._repo_ids[name] = len(self.repo_names)
+            self.repo_names.append(self.intern(name))
+            self.repo_created.append(INVALID_EPOCH)
+            self.repo_languages.append(())
+        self.repo_created[repo] = INVALID_EPOCH if created_at is None else created_at
+        if languages is not None:
+            self.set_languages(name, languages)
+        return repo
+
+    def set_languages(self, name: str, languages: list) -> None:
+        """
+        Set the languages of a repository, if it was added.
+
+        Args:
+            name (str): The name of the repository.
+            languages (list): Its languages.
+        """
+        repo = self._repo_ids.get(name)
+        if repo is not None:
+            self.repo_languages[repo] = tuple(self.intern(language) for language in languages)
+
+    def add_commits(self, name: str, epochs: list, types: list) -> None:
+        """
+        Append the commits of a repository.
+
+        Args:
+            name (str): The name of the repository, which must have been added.
+            epochs (list): The UTC epoch of each commit, None if unparsable.
+            types (list): The type code of each commit.
+        """
+        if not isinstance(self.epochs, array):
+            # Loaded from a blob, whose views cannot grow
+            self.epochs = array("q", self.epochs)
+            self.types = array("B", self.types)
+            self.repo_ids = array("I", self.repo_ids)
+        self.epochs.extend(INVALID_EPOCH if epoch is None else epoch for epoch in epochs)
+        self.types.extend(types)
+        self.repo_ids.extend([self._repo_ids[name]] * len(epochs))
+
+    def to_bytes(self, meta: dict, listing: dict) -> bytes:
+        """
+        Serialize the store to a blob.
+
+        Args:
+            meta (dict): JSON serializable data of the context, like the basic info.
+            listing (dict): The number of commits of each listed repository, in listing
+                            order, which may leave out repositories that were deleted.
+
+        Returns:
+            bytes: The blob, see `from_bytes`.
+        """
+        language_offsets = array("I", [0])
+        language_ids = array("I")
+        for languages in self.repo_languages:
+            language_ids.extend(languages)
+            language_offsets.append(len(language_ids))
+
+        listed_repos = array("I", [self._repo_ids[name] for name in listing])
+        listed_commits = array("q", listing.values())
+
+        string_offsets = array("I", [0])
+        string_data = bytearray()
+        for string in self.strings:
+            string_data += string.encode("utf-8")
+            string_offsets.append(len(string_data))
+
+        columns = {
+            "epochs": self.epochs,
+            "types": self.types,
+            "repo_ids": self.repo_ids,
+            "repo_names": self.repo_names,
+            "repo_created": self.repo_created,
+            "language_offsets": language_offsets,
+            "language_ids": language_ids,
+            "listed_repos": listed_repos,
+            "listed_commits": listed_commits,
+            "string_offsets": string_offsets,
+            "string_data": string_data,
+            "meta": json.dumps(meta).encode("utf-8"),
+        }
+        parts = [
+            _HEADER.pack(
+                _MAGIC, _VERSION, 0, *(len(columns[name]) for name, _ in _COLUMNS)
+            )
+        ]
+        size = _HEADER.size
+        for name, typecode in _COLUMNS:
+            data = columns[name]
+            if sys.byteorder != "little" and typecode != "B":
+                data = array(typecode, data)
+                data.byteswap()
+            data = memoryview(data).cast("B")
+            parts.append(b"\0" * _padding(size))
+            size += _padding(size)
+            parts.append(data)
+            size += len(data)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "CommitStore":
+        """
+        Load a store from a blob written by `to_bytes`.
+
+        The commit columns are `memoryview`s of the blob, which must not change while the
+        store is used.
+
+        Args:
+            blob (bytes): The blob.
+
+        Returns:
+            CommitStore: The store, with `meta` and `listing` as they were serialized.
+        """
+        if len(blob) < _HEADER.size:
+            raise ValueError("Truncated commit store")
+        magic, version, _, *lengths = _HEADER.unpack_from(blob)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("Not a commit store of version %d" % _VERSION)
+
+        view = memoryview(blob)
+        columns = {}
+        offset = _HEADER.size
+        for (name, typecode), length in zip(_COLUMNS, lengths):
+            offset += _padding(offset)
+            size = length * array(typecode).itemsize
+            if offset + size > len(blob):
+                raise ValueError("Truncated commit store")
+            column = view[offset : offset + size].cast(typecode)
+            if sys.byteorder != "little" and typecode != "B":
+                column = array(typecode, column)
+                column.byteswap()
+            columns[name] = column
+            offset += size
+
+        store = cls()
+        store.epochs = columns["epochs"]
+        store.types = columns["types"]
+        store.repo_ids = columns["repo_ids"]
+        # The repository and string columns are short, and copied to be updated
+        store.repo_names = array("I", columns["repo_names"])
+        store.repo_created = array("q", columns["repo_created"])
+        offsets, ids = columns["language_offsets"], columns["language_ids"]
+        store.repo_languages = [
+            tuple(ids[offsets[i] : offsets[i + 1]]) for i in range(len(store.repo_names))
+        ]
+        offsets, data = columns["string_offsets"], columns["string_data"]
+        store.strings = [
+            str(data[offsets[i] : offsets[i + 1]], "utf-8") for i in range(len(offsets) - 1)
+        ]
+        store._string_ids = {string: i for i, string in enumerate(store.strings)}
+        store._repo_ids = {store.strings[name]: i for i, name in enumerate(store.repo_names)}
+        store.meta = json.loads(str(columns["meta"], "utf-8"))
+        store.listing = {
+            store.strings[store.repo_names[repo]]: commits
+            for repo, commits in zip(columns["listed_repos"], columns["listed_commits"])
+        }
+        return store
@@ -0,0 +1,119 @@
+"""
+This module classifies commit messages by conventional commit type.
+
+The alias table is compiled once at import: the prefix of a message is looked up in a dict,
+and messages without a known prefix are scanned once by a single regex, a trie of all aliases.
+
+Functions:
+    classify(message: str) -> str:
+        Get the type of a commit message.
+    classify_many(messages: list) -> list:
+        Get the type of each of the commit messages.
+"""
+
+import re
+
+# Conventional commit types and their aliases, in the order they are tried
+CONVENTIONAL_TYPES = {
+    "feat": ["feature", "feat", "features", "feats"],
+    "fix": ["fix"],
+    "docs": ["docs", "doc", "documentation"],
+    "style": ["style", "styles"],
+    "refactor": ["refactor", "refactors", "refact"],
+    "test": ["test", "tests"],
+    "chore": ["chore", "chores"],
+    "perf": ["perf", "performance"],
+    "build": ["build", "builds"],
+    "revert": ["revert"],
+    "ci": ["ci", "cicd", "pipeline", "pipelines", "cd"],
+}
+
+# Every type `classify` returns; stored commit types are indices in this tuple
+COMMIT_TYPES = (*CONVENTIONAL_TYPES, "others")
+
+# Type of each alias, for messages whose prefix is an alias
+_PREFIX_TYPES = {
+    alias: commit_type
+    for commit_type, aliases in CONVENTIONAL_TYPES.items()
+    for alias in aliases
+}
+
+# The part of a message before the first ":", "(", "!", "/" or whitespace
+_PREFIX = re.compile(r"[^:(!/\s]*")
+
+# Aliases that contain no other alias of their type, as a substring of the message is enough
+_TYPE_ALIASES = [
+    (
+        commit_type,
+        tuple(
+            alias for alias in aliases
+            if not any(other != alias and other in alias for other in aliases)
+        ),
+    )
+    for commit_type, aliases in CONVENTIONAL_TYPES.items()
+]
+
+
+def _trie_pattern(words: set) -> str:
+    """Get a regex of the words, with common prefixes factored out so it branches less."""
+    optional = "" in words
+    branches = []
+    for first in sorted({word[0] for word in words if word}):
+        rest = {word[1:] for word in words if word and word[0] == first}
+        branches.append(re.escape(first) + _trie_pattern(rest))
+    if not branches:
+        return ""
+    pattern = "|".join(branches)
+    if optional:
+        return f"(?:{pattern})?"
+    return pattern if len(branches) == 1 else f"(?:{pattern})"
+
+
+_ANY_ALIAS = re.compile(
+    _trie_pattern({alias for _, aliases in _TYPE_ALIASES for alias in aliases})
+)
+_TYPE_INDEX = {commit_type: i for i, (commit_type, _) in enumerate(_TYPE_ALIASES)}
+
+
+def classify(message: str) -> str:
+    """
+    Get the type of a commit message.
+
+    A message is of the type whose alias is its prefix, case-insensitively. Otherwise it is
+    of the first type, in the order of `CONVENTIONAL_TYPES`, with an alias anywhere in it.
+
+    Args:
+        message (str): The commit message.
+
+    Returns:
+        str: The type of the commit message, including "feat", "fix", "docs", "style",
+             "refactor", "test", "chore", "perf", "build", "revert", "ci", and "others".
+    """
+    commit_type = _PREFIX_TYPES.get(_PREFIX.match(message).group().lower())
+    if commit_type:
+        return commit_type
+
+    match = _ANY_ALIAS.search(message)
+    if not match:
+        return "others"
+
+    # The leftmost alias may belong to a later type than another alias in the message
+    found = _PREFIX_TYPES[match.group()]
+    for commit_type, aliases in _TYPE_ALIASES[: _TYPE_INDEX[found]]:
+        for alias in aliases:
+            if alias in message:
+                return commit_type
+    return found
+
+
+def classify_many(messages: list) -> list:
+    """
+    Get the type of each of the commit messages.
+
+    Args:
+        messages (list): The commit messages.
+
+    Returns:
+        list: The type of each message, see `classify`.
+    """
+    return [classify(message) for message in messages]
@@ -1,93 +1,438 @@
 """
 Module for generating context data for GitHub statistics.
 
+Classes:
+    ContextAggregator:
+        Fold fetched GitHub information into running aggregates of the context data.
+
 Functions:
     get_context(username: str, token: str, year: int, time_zone: str) -> dict:
         Generate context data for the given year from the provided data.
+    get_context_and_state(username: str, token: str, year: int, time_zone: str,
+                          checkpoint: dict, on_checkpoint: callable) -> tuple:
+        Generate context data for the given year, with the aggregates and the raw facts it
+        was generated from.
+    refresh_context(username: str, token: str, year: int, state: dict, facts: bytes) -> tuple:
+        Update context data with only the commits made since it was generated.
+    get_contexts(username: str, token: str, years: list, time_zone: str) -> dict:
+        Generate context data for several years from a single crawl.
+    get_context_async(username: str, token: str, year: int, time_zone: str) -> tuple:
+        Generate context data for the given year, fetching with the asyncio engine.
+    build_context(data: dict, username: str, year: int, time_zone: str) -> dict:
+        Generate context data for the given year from fetched GitHub information.
+    render_context(facts: bytes, username: str, year: int, time_zone: str) -> dict:
+        Generate context data for the given year in any timezone from its raw facts.
 """
 
-import calendar
-import logging
+import asyncio
+import base64
 import re
-from datetime import datetime, timedelta
-from itertools import groupby
-
-import pytz
+import time
+from collections import Counter
+from datetime import datetime
 
+from config.config import Config
 from utils.logging_config import setup_logging
-from utils.fetch_data import get_github_info
+from utils.calendar_stats import calendar_stats, hour_histogram
+from utils.commit_store import CommitStore
+from utils.commit_type import COMMIT_TYPES, classify_many
+from utils.time_buckets import TimezoneBuckets
+from utils.fetch_data import DEFAULT_COMMIT_FIELDS, iter_github_info, iter_github_updates
 
 setup_logging()
 
+# The only fields of a commit the report reads, so nothing else is fetched; the fetch layer
+# defaults to the same fields
+COMMIT_FIELDS = DEFAULT_COMMIT_FIELDS
+
+_TYPE_CODES = {commit_type: code for code, commit_type in enumerate(COMMIT_TYPES)}
+
+
+class ContextAggregator:
+    """
+    Fold the events of `iter_github_info` into running aggregates and generate the context
+    data from them, keeping no more of a commit than its UTC time and type code.
+
+    The aggregates can be saved with `to_state` and restored with `from_state`, to add the
+    events of `iter_github_updates` to them later. Repositories are listed again on every
+    update; the commits of a deleted repository stay in the commit types and hours.
+
+    Alongside the aggregates, the raw facts the timezone applies to are kept in a
+    `CommitStore`: the UTC time and type code of every commit, and the creation time and
+    languages of every repository. The context data of another timezone is generated from
+    them by `render_context`, without fetching again.
+    """
+
+    def __init__(self, username: str, year: int, time_zone: str):
+        self.username = username
+        self.year = year
+        self.time_zone = time_zone
+        self.buckets = TimezoneBuckets(time_zone, year)
+        self.fetched_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        self.basic = None
+        self.contribution = None
+        self.commit_type_num = Counter()
+        self.commit_time_num = [0] * 24
+        self.language_in_new_repos_count = Counter()
+        self.stars_num = 0
+        self.repo_commits_num = {}
+        self.new_repos = set()
+        self.last_commit_at = {}
+        self._previous_commits_num = {}
+        # Raw facts, None when restored from aggregates saved without them
+        self.store = CommitStore()
+
+    def to_state(self) -> dict:
+        """
+        Get a snapshot of the aggregates as JSON serializable data.
+
+        Returns:
+            dict: The state, see `from_state`.
+        """
+        return {
+            "time_zone": self.time_zone,
+            "fetched_at": self.fetched_at,
+            "commit_type_num": dict(self.commit_type_num),
+            "commit_time_num": list(self.commit_time_num),
+            "language_in_new_repos_count": dict(self.language_in_new_repos_count),
+            "repo_commits_num": dict(self.repo_commits_num),
+            "stars_num": self.stars_num,
+            "new_repos": sorted(self.new_repos),
+            "last_commit_at": dict(self.last_commit_at),
+        }
+
+    def facts(self) -> bytes:
+        """
+        Get the raw facts of the context data as a `CommitStore` blob.
+
+        Returns:
+            bytes: The facts, see `render_context`, or None if they were not kept.
+        """
+        if self.store is None:
+            return None
+        meta = {
+            "basic": self.basic,
+            "contribution": self.contribution,
+            "stars_num": self.stars_num,
+        }
+        return self.store.to_bytes(meta, self.repo_commits_num)
+
+    @classmethod
+    def from_state(
+        cls,
+        username: str,
+        year: int,
+        state: dict,
+        resume: bool = False,
+        facts: bytes = None,
+    ) -> "ContextAggregator":
+        """
+        Restore the aggregates saved with `to_state`, to add an update to them.
+
+        Args:
+            username (str): The GitHub username.
+            year (int): The year of the context data.
+            state (dict): The state.
+            resume (bool): Whether the state is a checkpoint of an unfinished crawl, which
+                           goes on with the repositories that were not listed yet.
+            facts (bytes): The raw facts saved with the state, without which no facts are
+                           kept from then on.
+
+        Returns:
+            ContextAggregator: The aggregator.
+        """
+        aggregator = cls(username, year, state["time_zone"])
+        aggregator.store = CommitStore.from_bytes(facts) if facts else None
+        if resume:
+            aggregator.fetched_at = state["fetched_at"]
+            aggregator.repo_commits_num = dict(state["repo_commits_num"])
+            aggregator.stars_num = state["stars_num"]
+        aggregator.commit_type_num.update(state["commit_type_num"])
+        aggregator.commit_time_num = list(state["commit_time_num"])
+        aggregator.language_in_new_repos_count.update(state["language_in_new_repos_count"])
+        aggregator.new_repos = set(state["new_repos"])
+        aggregator.last_commit_at = dict(state["last_commit_at"])
+        if not resume:
+            # Repositories and stars are counted again from the new listing
+            aggregator._previous_commits_num = dict(state["repo_commits_num"])
+        return aggregator
+
+    @classmethod
+    def from_facts(
+        cls, username: str, year: int, time_zone: str, facts: bytes
+    ) -> "ContextAggregator":
+        """
+        Generate the aggregates of a timezone from raw facts.
+
+        Args:
+            username (str): The GitHub username.
+            year (int): The year of the context data.
+            time_zone (str): The timezone.
+            facts (bytes): The facts returned by `facts`.
+
+        Returns:
+            ContextAggregator: The aggregator.
+        """
+        aggregator = cls(username, year, time_zone)
+        store = aggregator.store = CommitStore.from_bytes(facts)
+        aggregator.basic = store.meta["basic"]
+        aggregator.contribution = store.meta["contribution"]
+        aggregator.stars_num = store.meta["stars_num"]
+        aggregator.repo_commits_num = dict(store.listing)
+
+        # Counted by code in the order the types first occur, like commits are added
+        aggregator.commit_type_num.update(
+            {COMMIT_TYPES[code]: count for code, count in Counter(store.types).items()}
+        )
+        aggregator.commit_time_num = aggregator.buckets.hour_counts(store.epochs)
+        days = aggregator.buckets.days_of_epochs(store.repo_created)
+        for repo, (name, day) in enumerate(zip(store.repos(), days)):
+            if 0 <= day < aggregator.buckets.days_in_year:
+                aggregator.new_repos.add(name)
+                aggregator.language_in_new_repos_count.update(store.languages(repo))
+        return aggregator
+
+    def add(self, event: tuple) -> None:
+        """
+        Add an event of `iter_github_info` to the aggregates.
+
+        Args:
+            event (tuple): The event.
+        """
+        kind = event[0]
+        if kind == "repo":
+            _, repo, detail = event
+            self.stars_num += detail["stargazerCount"]
+            self.repo_commits_num[repo] = self._previous_commits_num.get(repo, 0)
+            self.last_commit_at.setdefault(repo, None)
+            if self.store is not None:
+                self.store.set_repo(
+                    repo,
+                    self.buckets.epochs([detail["createdAt"]])[0],
+                    detail["languages"] or None,
+                )
+            if repo not in self.new_repos and self.buckets.in_year(detail["createdAt"]):
+                self.new_repos.add(repo)
+                self.language_in_new_repos_count.update(detail["languages"])
+            self._add_commits(repo, detail["commits"])
+        elif kind == "commits":
+            self._add_commits(event[1], event[2])
+        elif kind == "languages":
+            # Fetched for the repositories that are new in some timezone
+            if self.store is not None:
+                self.store.set_languages(event[1], event[2])
+            if event[1] in self.new_repos:
+                self.language_in_new_repos_count.update(event[2])
+        elif kind == "basic":
+            self.basic = event[1]
+        elif kind == "contribution":
+            self.contribution = event[1]
+
+    def _add_commits(self, repo: str, commits: list) -> None:
+        self.repo_commits_num[repo] += len(commits)
+        commit_types = classify_many([commit["messageHeadline"] for commit in commits])
+        self.commit_type_num.update(commit_types)
+        dates = [commit["committedDate"] for commit in commits]
+        if dates and (self.last_commit_at[repo] or "") < max(dates):
+            self.last_commit_at[repo] = max(dates)
+        epochs = self.buckets.epochs(dates)
+        self.commit_time_num = [
+            a + b
+            for a, b in zip(
+                self.commit_time_num, hour_histogram(self.buckets.hours_of_epochs(epochs))
+            )
+        ]
+        if self.store is not None:
+            self.store.add_commits(
+                repo, epochs, [_TYPE_CODES[commit_type] for commit_type in commit_types]
+            )
+
+    def result(self) -> dict:
+        """
+        Generate the context data from the aggregates.
+
+        Returns:
+            dict: The context data.
+        """
+        # Built from sets, so that ties are listed in the order reports have always had
+        commit_type_num = {
+            k: self.commit_type_num[k] for k in set(self.commit_type_num) if k != "others"
+        }
+        language_in_new_repos_count = {
+            k: self.language_in_new_repos_count[k]
+            for k in set(self.language_in_new_repos_count)
+        }
+        return _summarize(
+            self.basic,
+            self.contribution,
+            self.username,
+            self.year,
+            commit_type_num,
+            self.commit_time_num,
+            language_in_new_repos_count,
+            self.stars_num,
+            self.repo_commits_num,
+        )
+
 
-def _parse_time(time_str: str, timezone: pytz.BaseTzInfo) -> str:
+def get_context(username: str, token: str, year: int, time_zone: str) -> dict:
     """
-    Parse the time string to the timezone.
+    Generate context data for the given year from the provided data.
+
+    The GitHub information is folded into a `ContextAggregator` page by page as it is
+    fetched, so the commits of the account are never held in memory at once.
 
     Args:
-        time_str (str): The time string.
-        timezone (pytz.BaseTzInfo): The timezone.
+        username (str): The GitHub username.
+        token (str): The GitHub access token.
+        year (int): The year to generate the context data.
+        time_zone (str): The timezone.
 
     Returns:
-        str: The time string in the timezone.
+        dict: The context data.
+    """
+    return get_context_and_state(username, token, year, time_zone)[0]
+
+
+def get_context_and_state(
+    username: str,
+    token: str,
+    year: int,
+    time_zone: str,
+    checkpoint: dict = None,
+    on_checkpoint=None,
+) -> tuple:
     """
-    result = None
-    try:
-        result = (
-            datetime.strptime(time_str, "%Y-%m-%dT%H:%M:%SZ")
-            .replace(tzinfo=pytz.UTC)
-            .astimezone(timezone)
-            .isoformat()
+    Generate context data for the given year, with the aggregates and the raw facts it was
+    generated from.
+
+    Every `Config.CHECKPOINT_INTERVAL` seconds, `on_checkpoint` is called with a checkpoint
+    of the crawl, of the aggregates and of the facts so far. Passing it back as `checkpoint`
+    resumes the crawl from there.
+
+    Args:
+        username (str): The GitHub username.
+        token (str): The GitHub access token.
+        year (int): The year to generate the context data.
+        time_zone (str): The timezone, ignored when resuming from a checkpoint.
+        checkpoint (dict): A checkpoint to resume from.
+        on_checkpoint (callable): Called with every checkpoint to save it.
+
+    Returns:
+        tuple: The context data, the state of its `ContextAggregator` to pass to
+               `refresh_context` later, and the facts to pass to `render_context`.
+    """
+    if checkpoint:
+        aggregator = ContextAggregator.from_state(
+            username,
+            year,
+            checkpoint["aggregate"],
+            resume=True,
+            facts=base64.b64decode(checkpoint["facts"]) if checkpoint.get("facts") else None,
         )
-    except ValueError as e:
-        logging.error("Failed to parse time: %s", e)
-        logging.error("Time: %s", time_str)
-        result = datetime(2000, 1, 1).isoformat()
-    except pytz.UnknownTimeZoneError as e:
-        logging.error("Unknown timezone: %s", e)
-        result = datetime(2000, 1, 1).isoformat()
+        resume = checkpoint["fetch"]
+    else:
+        aggregator = ContextAggregator(username, year, time_zone)
+        resume = None
+
+    saved_at = time.monotonic()
+    for event in iter_github_info(username, token, year, COMMIT_FIELDS, resume=resume):
+        if event[0] != "checkpoint":
+            aggregator.add(event)
+        elif on_checkpoint and time.monotonic() - saved_at >= Config.CHECKPOINT_INTERVAL:
+            facts = aggregator.facts()
+            on_checkpoint(
+                {
+                    "fetch": event[1],
+                    "aggregate": aggregator.to_state(),
+                    # Checkpoints are JSON, so the blob is encoded
+                    "facts": base64.b64encode(facts).decode("ascii") if facts else None,
+                }
+            )
+            saved_at = time.monotonic()
+    return aggregator.result(), aggregator.to_state(), aggregator.facts()
+
+
+def refresh_context(
+    username: str, token: str, year: int, state: dict, facts: bytes = None
+) -> tuple:
+    """
+    Update context data with only the commits made since it was generated.
 
-    return result
+    Args:
+        username (str): The GitHub username.
+        token (str): The GitHub access token.
+        year (int): The year of the context data.
+        state (dict): The state returned with the context data.
+        facts (bytes): The facts returned with the context data, if any.
+
+    Returns:
+        tuple: The updated context data, state and facts (None without `facts`).
+    """
+    aggregator = ContextAggregator.from_state(username, year, state, facts=facts)
+    events = iter_github_updates(
+        username, token, year, aggregator.last_commit_at, state["fetched_at"], COMMIT_FIELDS
+    )
+    for event in events:
+        aggregator.add(event)
+    return aggregator.result(), aggregator.to_state(), aggregator.facts()
 
 
-def _get_commit_type(message: str) -> str:
+def get_contexts(username: str, token: str, years: list, time_zone: str) -> dict:
     """
-    Get the type of the commit message based on the conventional commit types.
+    Generate context data for several years from a single crawl.
+
+    The repositories are crawled once for the commits from the first to the last year, and
+    every commit is counted in the year it was committed in (UTC, like the crawl window of a
+    single year).
 
     Args:
-        message (str): The commit message.
+        username (str): The GitHub username.
+        token (str): The GitHub access token.
+        years (list): The years to generate the context data.
+        time_zone (str): The timezone.
 
     Returns:
-        str: The type of the commit message, including "feat", "fix", "docs", "style", "refactor",
-             "test", "chore", "perf", "build", "revert", "ci", and "others".
+        dict: The context data of each year, with the state of its `ContextAggregator` to
+              pass to `refresh_context` later and the facts to pass to `render_context`.
     """
-    commit_type = re.split(r"[:(!/\s]", message)[0].lower()
-    conventional_types = {
-        "feat": ["feature", "feat", "features", "feats"],
-        "fix": ["fix"],
-        "docs": ["docs", "doc", "documentation"],
-        "style": ["style", "styles"],
-        "refactor": ["refactor", "refactors", "refact"],
-        "test": ["test", "tests"],
-        "chore": ["chore", "chores"],
-        "perf": ["perf", "performance"],
-        "build": ["build", "builds"],
-        "revert": ["revert"],
-        "ci": ["ci", "cicd", "pipeline", "pipelines", "cd"],
+    aggregators = {year: ContextAggregator(username, year, time_zone) for year in years}
+    events = iter_github_info(username, token, min(years), COMMIT_FIELDS, max(years))
+    for event in events:
+        kind = event[0]
+        if kind == "contribution":
+            if event[2] in aggregators:
+                aggregators[event[2]].add(event)
+        elif kind == "repo":
+            _, repo, detail = event
+            commits = _partition_by_year(detail["commits"])
+            for year, aggregator in aggregators.items():
+                aggregator.add((kind, repo, dict(detail, commits=commits.get(year, []))))
+        elif kind == "commits":
+            for year, year_commits in _partition_by_year(event[2]).items():
+                if year in aggregators:
+                    aggregators[year].add((kind, event[1], year_commits))
+        else:
+            for aggregator in aggregators.values():
+                aggregator.add(event)
+
+    return {
+        year: (aggregator.result(), aggregator.to_state(), aggregator.facts())
+        for year, aggregator in aggregators.items()
     }
-    for key, value in conventional_types.items():
-        if commit_type in value:
-            return key
-    for key, value in conventional_types.items():
-        for v in value:
-            if v in message:
-                return key
-    return "others"
 
 
-def get_context(username: str, token: str, year: int, time_zone: str) -> dict:
+def _partition_by_year(commits: list) -> dict:
+    """Group commits by the UTC year of their `committedDate`."""
+    result = {}
+    for commit in commits:
+        result.setdefault(int(commit["committedDate"][:4]), []).append(commit)
+    return result
+
+
+async def get_context_async(username: str, token: str, year: int, time_zone: str) -> tuple:
     """
-    Generate context data for the given year from the provided data.
+    Generate context data for the given year, fetching with the asyncio engine.
 
     Args:
         username (str): The GitHub username.
@@ -95,63 +440,120 @@ def get_context(username: str, token: str, year: int, time_zone: str) -> dict:
         year (int): The year to generate the context data.
         time_zone (str): The timezone.
 
+    Returns:
+        tuple: The context data, the state of its `ContextAggregator` to pass to
+               `refresh_context` later, and the facts to pass to `render_context`.
+    """
+    # Imported here so that aiohttp is only needed when the asyncio engine is used
+    from utils.fetch_data_async import get_github_info_async  # pylint: disable=import-outside-toplevel
+
+    data = await get_github_info_async(username, token, year, COMMIT_FIELDS)
+    # Folding is CPU bound, so it runs off the event loop shared by all fetches
+    return await asyncio.to_thread(_context_and_state, data, username, year, time_zone)
+
+
+def build_context(data: dict, username: str, year: int, time_zone: str) -> dict:
+    """
+    Generate context data for the given year from fetched GitHub information.
+
+    Args:
+        data (dict): The GitHub information, as returned by `get_github_info` with
+                     `COMMIT_FIELDS`.
+        username (str): The GitHub username.
+        year (int): The year to generate the context data.
+        time_zone (str): The timezone.
+
     Returns:
         dict: The context data.
     """
-    data = get_github_info(username, token, year)
+    return _aggregate(data, username, year, time_zone).result()
 
-    commit_type = [
-        _get_commit_type(commit["message"])
-        for _, detail in data["repo"].items()
-        for commit in detail["commits"]
-    ]
-    commit_type_num = {k: commit_type.count(k) for k in set(commit_type)}
-    if "others" in commit_type_num:
-        commit_type_num.pop("others", None)
-
-    commit_time = [
-        datetime.fromisoformat(
-            _parse_time(commit["committedDate"], pytz.timezone(time_zone))
-        ).hour
-        for _, detail in data["repo"].items()
-        for commit in detail["commits"]
-    ]
-    commit_time_num = [0] * 24
-    for hour in commit_time:
-        commit_time_num[hour] += 1
-
-    new_repos = [
-        detail
-        for _, detail in data["repo"].items()
-        if datetime.fromisoformat(
-            _parse_time(detail["createdAt"], pytz.timezone(time_zone))
-        ).year
-        == year
-    ]
-    language_in_new_repos = [
-        language for repo in new_repos for language in repo["languages"]
-    ]
-    language_in_new_repos_count = {
-        k: language_in_new_repos.count(k) for k in set(language_in_new_repos)
-    }
 
+def _aggregate(data: dict, username: str, year: int, time_zone: str) -> ContextAggregator:
+    """Fold fetched GitHub information into a `ContextAggregator`."""
+    # One pass over the repositories and their commits, like the fetched events
+    aggregator = ContextAggregator(username, year, time_zone)
+    aggregator.add(("basic", data["basic"]))
+    for repo, detail in data["repo"].items():
+        aggregator.add(("repo", repo, detail))
+    aggregator.add(("contribution", data["contribution"]))
+    return aggregator
+
+
+def _context_and_state(data: dict, username: str, year: int, time_zone: str) -> tuple:
+    """Generate context data with its aggregates and raw facts from fetched GitHub information."""
+    aggregator = _aggregate(data, username, year, time_zone)
+    return aggregator.result(), aggregator.to_state(), aggregator.facts()
+
+
+def render_context(facts: bytes, username: str, year: int, time_zone: str) -> dict:
+    """
+    Generate context data for the given year in any timezone from its raw facts.
+
+    Only the local hours of the commits and which repositories are new depend on the
+    timezone, and both are bucketed again from the UTC times in the facts, so a report for
+    another timezone takes no request to GitHub.
+
+    Args:
+        facts (bytes): The facts returned with context data of the year, a `CommitStore`
+                       blob whose columns are read in place.
+        username (str): The GitHub username.
+        year (int): The year of the context data.
+        time_zone (str): The timezone.
+
+    Returns:
+        dict: The context data.
+    """
+    return ContextAggregator.from_facts(username, year, time_zone, facts).result()
+
+
+def _summarize(
+    basic: dict,
+    contribution: dict,
+    username: str,
+    year: int,
+    commit_type_num: dict,
+    commit_time_num: list,
+    language_in_new_repos_count: dict,
+    stars_num: int,
+    repo_commits_num: dict,
+) -> dict:
+    """
+    Generate context data from the basic info, the contributions and the repository
+    aggregates of the year.
+
+    Args:
+        basic (dict): The basic info.
+        contribution (dict): The contribution info.
+        username (str): The GitHub username.
+        year (int): The year of the context data.
+        commit_type_num (dict): The number of commits of each conventional commit type.
+        commit_time_num (list): The number of commits in each local hour.
+        language_in_new_repos_count (dict): The number of new repositories using each
+                                            language.
+        stars_num (int): The number of stargazers of all repositories.
+        repo_commits_num (dict): The number of commits of each repository, in listing order.
+
+    Returns:
+        dict: The context data.
+    """
     pattern = (
         r"https://private-avatars\.githubusercontent\.com/u/(\d+)\?[^&]+&[^&]+&v=(\d+)"
     )
     replacement = r"https://avatars.githubusercontent.com/u/\1?v=\2"
 
     # Avatar URL
-    avatar = re.sub(pattern, replacement, data["basic"]["avatar_url"])
+    avatar = re.sub(pattern, replacement, basic["avatar_url"])
     # Username
     name = username
-    if data["basic"]["name"]:
-        name = data["basic"]["name"]
+    if basic["name"]:
+        name = basic["name"]
     # Days since account creation
     created_time = (
         (
             (
                 datetime.now()
-                - datetime.strptime(data["basic"]["created_time"], "%Y-%m-%dT%H:%M:%SZ")
+                - datetime.strptime(basic["created_time"], "%Y-%m-%dT%H:%M:%SZ")
             ).days
             + 99
         )
@@ -159,35 +561,26 @@ def get_context(username: str, token: str, year: int, time_zone: str) -> dict:
         * 100
     )
     # Number of followers
-    followers_num = data["basic"]["follower"]
+    followers_num = basic["follower"]
     # Number of following
-    following_num = data["basic"]["following"]
-    # Number of stargazers
-    stars_num = sum(detail["stargazerCount"] for _, detail in data["repo"].items())
-
+    following_num = basic["following"]
     # Number of activities in each day
-    commits_per_day = data["contribution"]["contribution"]
+    commits_per_day = contribution["contribution"]
+    # Number of activities in each hour
+    commits_per_hour = commit_time_num
+    # Histograms, streaks and maxima of the calendar, see `calendar_stats`
+    stats = calendar_stats(commits_per_day, commits_per_hour, year)
     # Number of days with activities
-    commits_days_num = len([x for x in commits_per_day if x > 0])
+    commits_days_num = stats["commits_days_num"]
     # Longest active streak
-    longest_commit_streak = max(
-        (len(list(g)) for k, g in groupby(commits_per_day, key=lambda x: x > 0) if k),
-        default=0,
-    )
+    longest_commit_streak = stats["longest_commit_streak"]
     # Longest inactive streak
-    longest_commit_break = max(
-        (len(list(g)) for k, g in groupby(commits_per_day, key=lambda x: x == 0) if k),
-        default=0,
-    )
+    longest_commit_break = stats["longest_commit_break"]
     # Maximum number of activities in a day
-    max_commits_per_day = max(commits_per_day)
+    max_commits_per_day = stats["max_commits_per_day"]
 
-    days_in_month = [calendar.monthrange(year, month)[1] for month in range(1, 13)]
     # Number of activities in each month
-    commits_per_month = [
-        sum(commits_per_day[sum(days_in_month[:i]) : sum(days_in_month[: i + 1])])
-        for i in range(12)
-    ]
+    commits_per_month = stats["commits_per_month"]
     # Most active month
     most_active_month = [
         "Jan",
@@ -202,48 +595,36 @@ def get_context(username: str, token: str, year: int, time_zone: str) -> dict:
         "Oct",
         "Nov",
         "Dec",
-    ][commits_per_month.index(max(commits_per_month))]
+    ][stats["most_active_month"]]
 
-    days_in_year = 366 if calendar.isleap(year) else 365
     # Number of activities in each weekday
-    commits_per_weekday = [0] * 7
-    for i in range(days_in_year):
-        commits_per_weekday[
-            (datetime(year, 1, 1) + timedelta(days=i)).weekday()
-        ] += commits_per_day[i]
+    commits_per_weekday = stats["commits_per_weekday"]
     # Most active weekday
     most_active_weekday = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"][
-        commits_per_weekday.index(max(commits_per_weekday))
+        stats["most_active_weekday"]
     ]
 
-    # Number of activities in each hour
-    commits_per_hour = commit_time_num
     # Most active hour
-    most_active_hour = [f"{i}:00" for i in range(24)][
-        commits_per_hour.index(max(commits_per_hour))
-    ]
+    most_active_hour = [f"{i}:00" for i in range(24)][stats["most_active_hour"]]
 
     # Number of commits
-    commits_num = data["contribution"]["commit_num"]
+    commits_num = contribution["commit_num"]
     # Number of issues
-    issues_num = data["contribution"]["issue_num"]
+    issues_num = contribution["issue_num"]
     # Number of pull requests
-    prs_num = data["contribution"]["pr_num"]
+    prs_num = contribution["pr_num"]
 
     # Number of repositories
-    repos_num = len(data["repo"])
+    repos_num = len(repo_commits_num)
     # Top 3 most committed repositories
     top_3_most_committed_repos = sorted(
-        [
-            {"name": repo, "num": len(detail["commits"])}
-            for repo, detail in data["repo"].items()
-        ],
+        [{"name": repo, "num": num} for repo, num in repo_commits_num.items()],
         key=lambda x: x["num"],
         reverse=True,
     )[: min(3, repos_num)]
 
     # Number of languages used in new repositories
-    languages_num = len(set(language_in_new_repos))
+    languages_num = len(language_in_new_repos_count)
     # Top 3 languages used in new repositories
     top_3_languages_used_in_new_repos = sorted(
         [{"name": k, "num": v} for k, v in language_in_new_repos_count.items()],
@@ -2,37 +2,50 @@
 This module provides functions to fetch GitHub data using the GitHub GraphQL API.
 
 Functions:
-    get_github_info(username: str, token: str, year: int) -> dict:
+    iter_github_info(username: str, token: str, year: int, commit_fields: tuple,
+                     last_year: int) -> Iterator[tuple]:
+        Yield the GitHub information for the given year, or years, as it arrives.
+    iter_github_updates(username: str, token: str, year: int, last_seen: dict,
+                        pushed_after: str, commit_fields: tuple) -> Iterator[tuple]:
+        Yield the GitHub information for the given year that changed since an earlier fetch.
+    get_github_info(username: str, token: str, year: int, commit_fields: tuple) -> dict:
         Get the GitHub information for the given year.
+
+Classes:
+    GraphQLError:
+        Raised when a GraphQL query returns errors and no data.
 """
 
+import asyncio
+import calendar
+import functools
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
 
 import requests
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import RetryError, retry, retry_if_exception, stop_after_attempt, wait_exponential
 
+from config.config import Config
+from utils import graphql_cache, rate_limit, transport
+from utils.batch_query import FollowUps, commit_batch_size, language_batch_size
 from utils.logging_config import setup_logging
+from utils.page_size import PageSizeController, initial_page_size, remember_page_size
+from utils.query_fields import (
+    DEFAULT_COMMIT_FIELDS,
+    RATE_LIMIT_FIELD,
+    commit_field_selection,
+    year_range,
+)
 
 setup_logging()
 
-
-@retry(stop=stop_after_attempt(5), wait=wait_exponential(multiplier=1, min=2, max=64))
-def _graphql_query(query: str, variables: dict, token: str) -> dict:
-    url = "https://api.github.com/graphql"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json",
-    }
-    response = requests.post(
-        url, json={"query": query, "variables": variables}, headers=headers, timeout=10
-    )
-    response.raise_for_status()
-    return response.json()["data"]
-
-
-def _get_basic(user_name: str, token: str) -> dict:
-    query = """
-    query($username: String!) {
+BASIC_QUERY = """
+    query($username: String!) {%s
+        viewer {
+            id
+        }
         user(login: $username) {
             id
             name
@@ -46,32 +59,15 @@ def _get_basic(user_name: str, token: str) -> dict:
             createdAt
         }
     }
-    """
-
-    variables = {
-        "username": user_name,
-    }
-
-    result = _graphql_query(query, variables, token)["user"]
-
-    return {
-        "id": result["id"],
-        "name": result["name"],
-        "avatar_url": result["avatarUrl"],
-        "follower": result["followers"]["totalCount"],
-        "following": result["following"]["totalCount"],
-        "created_time": result["createdAt"],
-    }
-
-
-def _get_repo(
-    user_name: str, user_id: str, token: str, year: int, interval: int
-) -> dict:
+    """ % (
+    RATE_LIMIT_FIELD
+)
 
-    query = """
-    query($username: String!, $id: ID!, $since: GitTimestamp!, $until: GitTimestamp!, $after: String) {
+# Template of `build_repo_query`, with the page size left as `%%d`
+REPO_QUERY = """
+    query($username: String!, $id: ID!, $since: GitTimestamp!, $until: GitTimestamp!, $after: String) {%(rate_limit)s
         user(login: $username) {
-            repositories(first: %d, after: $after) {
+            repositories(first: %%d, after: $after, orderBy: {field: PUSHED_AT, direction: DESC}) {
                 nodes {
                     name
                     stargazerCount
@@ -79,18 +75,12 @@ def _get_repo(
                     isPrivate
                     isFork
                     createdAt
-                    languages(first: 100) {
-                        nodes {
-                            name
-                        }
-                    }
+                    pushedAt
                     defaultBranchRef {
                         target {
                             ... on Commit {
                                 history(first: 100, since: $since, until: $until, author: {id: $id}) {
-                                    nodes {
-                                        message
-                                        committedDate
+                                    nodes {%(commit_fields)s
                                     }
                                     pageInfo{
                                         hasNextPage
@@ -110,225 +100,266 @@ def _get_repo(
             }
         }
     }
+    """
+
+# Repositories listed after the crawl reaches repositories not pushed to in the year, which
+# cannot have commits in it: only what the report counts, without commit history
+REPO_LIGHT_QUERY = """
+    query($username: String!, $after: String) {%s
+        user(login: $username) {
+            repositories(first: 100, after: $after, orderBy: {field: PUSHED_AT, direction: DESC}) {
+                nodes {
+                    name
+                    stargazerCount
+                    forkCount
+                    isPrivate
+                    isFork
+                    createdAt
+                    pushedAt
+                    defaultBranchRef {
+                        name
+                    }
+                }
+                pageInfo{
+                    hasNextPage
+                    startCursor
+                    endCursor
+                }
+            }
+        }
+    }
     """ % (
-        interval
-    )
+    RATE_LIMIT_FIELD
+)
 
-    start_time = f"{year}-01-01T00:00:00Z"
-    end_time = f"{year}-12-31T23:59:59Z"
+# Types of the GraphQL errors of queries too heavy for GitHub to answer
+PAGE_SIZE_ERROR_TYPES = ("RESOURCE_LIMITS_EXCEEDED", "MAX_NODE_LIMIT_EXCEEDED")
 
-    variables = {
-        "username": user_name,
-        "id": user_id,
-        "since": start_time,
-        "until": end_time,
-        "after": None,
+CONTRIBUTION_QUERY = """
+    query($username: String!, $from: DateTime!, $to: DateTime!) {%s
+        user(login: $username) {
+            contributionsCollection(from: $from, to: $to) {
+                totalPullRequestContributions
+                totalIssueContributions
+                totalCommitContributions
+                contributionCalendar {
+                    totalContributions
+                    weeks {
+                        contributionDays {
+                            contributionCount
+                        }
+                    }
+                }
+            }
+        }
     }
+    """ % (
+    RATE_LIMIT_FIELD
+)
+
+
+@retry(
+    retry=retry_if_exception(rate_limit.is_retryable),
+    stop=stop_after_attempt(5),
+    wait=rate_limit.wait_rate_limit(wait_exponential(multiplier=1, min=2, max=64)),
+    before_sleep=transport.record_retry,
+)
+def _graphql_query(
+    query: str, variables: dict, token: str, cache_query: str = None
+) -> dict:
+    """
+    Send a GraphQL query and return its `data`, serving it from the cache when possible.
 
-    all_repos = {}
-
-    while True:
-        result = _graphql_query(query, variables, token)
+    `cache_query` replaces the query in the cache key, for queries whose text varies
+    without changing what a page means, such as the page size of `build_repo_query`.
+    """
+    cache_key = graphql_cache.make_key(cache_query or query, variables, token)
+    data = graphql_cache.get(cache_key)
+    if data is not None:
+        return data
 
-        user = result.get("user")
-        if not user:
-            raise ValueError("`user` not in result")
+    rate_limit.acquire(token)
 
-        repositories = user.get("repositories")
-        if not repositories:
-            raise ValueError("`repositories` not in result")
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json",
+    }
+    response = transport.post(
+        Config.GITHUB_GRAPHQL_URL,
+        json={"query": query, "variables": variables},
+        headers=headers,
+        timeout=Config.REQUEST_TIMEOUT,
+    )
+    try:
+        body = response.json()
+    except ValueError:
+        body = None
 
-        nodes = repositories.get("nodes")
-        if not nodes:
-            nodes = []
+    rate_limit.observe(token, response.headers)
+    rate_limit.check_response(token, response.status_code, response.headers, body)
+    response.raise_for_status()
+    data = graphql_data(body, token)
 
-        if not nodes:
-            break
+    if data is not None and not body.get("errors"):
+        graphql_cache.put(cache_key, data, graphql_cache.ttl_for(variables))
+    return data
 
-        for repo in nodes:
-            repo_name = repo.get("name")
-            if not repo_name:
-                raise ValueError("`name` not in repo")
 
-            default_branch_ref = repo.get("defaultBranchRef")
-            if not default_branch_ref:
-                continue
+# Single attempt, for callers that react to failures themselves
+_graphql_query_once = _graphql_query.retry_with(stop=stop_after_attempt(1))
 
-            history = default_branch_ref.get("target").get("history")
-            if not history:
-                raise ValueError("`history` not in repo['defaultBranchRef']['target']")
 
-            nodes = history.get("nodes")
-            if not nodes:
-                nodes = []
+class GraphQLError(Exception):
+    """
+    Raised when a GraphQL query returns errors and no data.
+    """
 
-            commits = nodes
+    def __init__(self, errors: list):
+        super().__init__("; ".join(str(error.get("message")) for error in errors))
+        self.errors = errors
 
-            page_info = history.get("pageInfo")
 
-            has_next_page = page_info.get("hasNextPage")
-            if has_next_page:
-                end_cursor = page_info.get("endCursor")
-                if not end_cursor:
-                    raise ValueError(
-                        "`endCursor` not in repo['defaultBranchRef']['target']"
-                        "['history']['pageInfo']"
-                    )
+def graphql_data(body: dict, token: str) -> dict:
+    """Get the `data` of a GraphQL response body, recording its `rateLimit` field."""
+    data = body["data"]
+    if data is None and body.get("errors"):
+        raise GraphQLError(body["errors"])
+    if data and data.get("rateLimit"):
+        rate_limit.observe(token, rate_limit=data.pop("rateLimit"))
+    return data
 
-                commit_after = end_cursor
-
-                while True:
-                    tryTimes = 0
-                    commit_result = None
-                    while tryTimes < 3:
-                        try:
-                            commit_result = _get_commit(
-                                user_name, user_id, token, year, repo_name, commit_after
-                            )
-
-                            commit_user = commit_result.get("user")
-                            if not commit_user:
-                                raise ValueError("`user` not in commit_result")
-
-                            repository = commit_user.get("repository")
-                            if not repository:
-                                logging.error("`repository` not in commit_user")
-                                commit_result = None
-                                break
-
-                            default_branch_ref = repository.get("defaultBranchRef")
-                            if not default_branch_ref:
-                                raise ValueError("`defaultBranchRef` not in repository")
-
-                            if commit_result["user"]["repository"]["defaultBranchRef"][
-                                "target"
-                            ]["history"]:
-                                break
-                        except Exception as e:
-                            logging.error(
-                                "Unexpected error: Failed to get commit info: %s.",
-                                e,
-                            )
-                            tryTimes += 1
-
-                    if not commit_result:
-                        break
-
-                    commit_result = commit_result["user"]["repository"][
-                        "defaultBranchRef"
-                    ]["target"]["history"]
-
-                    if commit_result["nodes"]:
-                        commits.extend(commit_result["nodes"])
-
-                    if not commit_result["pageInfo"]["hasNextPage"]:
-                        break
-
-                    commit_after = commit_result["pageInfo"]["endCursor"]
-
-            languages = []
-            try:
-                if repo.get("languages").get("nodes"):
-                    languages = [lang["name"] for lang in repo["languages"]["nodes"]]
-            except Exception as e:
-                logging.error(
-                    "Unexpected error: Failed to get languages info: %s.",
-                    e,
-                )
 
-            all_repos[repo_name] = {
-                "stargazerCount": repo["stargazerCount"],
-                "forkCount": repo["forkCount"],
-                "isPrivate": repo["isPrivate"],
-                "isFork": repo["isFork"],
-                "createdAt": repo["createdAt"],
-                "languages": languages,
-                "commits": commits,
-            }
 
-        if not result["user"]["repositories"]["pageInfo"]["hasNextPage"]:
-            break
+def parse_basic(result: dict) -> dict:
+    """Convert the result of `BASIC_QUERY` to the basic info."""
+    result = result["user"]
 
-        variables["after"] = result["user"]["repositories"]["pageInfo"]["endCursor"]
+    return {
+        "id": result["id"],
+        "name": result["name"],
+        "avatar_url": result["avatarUrl"],
+        "follower": result["followers"]["totalCount"],
+        "following": result["following"]["totalCount"],
+        "created_time": result["createdAt"],
+    }
 
-    return all_repos
 
+def parse_repo_page(result: dict, with_history: bool = True) -> tuple:
+    """
+    Convert a page of `build_repo_query`, or of `REPO_LIGHT_QUERY` without history, to
+    repositories. Languages are left empty, see `is_new_repo` and `build_language_batch_query`.
 
-def _get_commit(
-    user_name: str, user_id: str, token: str, year: int, repo_name: str, after: str
-) -> dict:
-    query = """
-    query($username: String!, $id: ID!, $since: GitTimestamp!, $until: GitTimestamp!, $repo_name: String!, $after: String) {
-        user(login: $username) {
-            repository(name: $repo_name) {
-                defaultBranchRef {
-                    target {
-                        ... on Commit {
-                            history(first: 100, since: $since, until: $until, author: {id: $id}, after: $after) {
-                                nodes {
-                                    message
-                                    committedDate
-                                }
-                                pageInfo{
-                                    hasNextPage
-                                    startCursor
-                                    endCursor
-                                }
-                            }
-                        }
-                    }
-                }
-            }
-        }
-    }
+    Returns:
+        tuple: A list of `(name, detail, commit_cursor)` for every repository with a default
+               branch, where `commit_cursor` is set when the repository has more commits, and
+               the `pageInfo` of the page. An empty page has no next page.
     """
+    user = result.get("user")
+    if not user:
+        raise ValueError("`user` not in result")
 
-    start_time = f"{year}-01-01T00:00:00Z"
-    end_time = f"{year}-12-31T23:59:59Z"
+    repositories = user.get("repositories")
+    if not repositories:
+        raise ValueError("`repositories` not in result")
 
-    variables = {
-        "username": user_name,
-        "id": user_id,
-        "since": start_time,
-        "until": end_time,
-        "repo_name": repo_name,
-        "after": after,
-    }
+    nodes = repositories.get("nodes")
+    if not nodes:
+        return [], {"hasNextPage": False, "endCursor": None}
 
-    return _graphql_query(query, variables, token)
+    repos = []
+    for repo in nodes:
+        repo_name = repo.get("name")
+        if not repo_name:
+            raise ValueError("`name` not in repo")
 
+        default_branch_ref = repo.get("defaultBranchRef")
+        if not default_branch_ref:
+            continue
 
-def _get_contribution(user_name: str, token: str, year: int) -> dict:
-    query = """
-    query($username: String!, $from: DateTime!, $to: DateTime!) {
-        user(login: $username) {
-            contributionsCollection(from: $from, to: $to) {
-                totalPullRequestContributions
-                totalIssueContributions
-                totalCommitContributions
-                contributionCalendar {
-                    totalContributions
-                    weeks {
-                        contributionDays {
-                            contributionCount
-                        }
-                    }
-                }
-            }
+        if with_history:
+            history = default_branch_ref.get("target").get("history")
+            if not history:
+                raise ValueError("`history` not in repo['defaultBranchRef']['target']")
+        else:
+            history = {"nodes": [], "pageInfo": {"hasNextPage": False}}
+
+        commits = history.get("nodes")
+        if not commits:
+            commits = []
+
+        page_info = history.get("pageInfo")
+
+        commit_cursor = None
+        if page_info.get("hasNextPage"):
+            commit_cursor = page_info.get("endCursor")
+            if not commit_cursor:
+                raise ValueError(
+                    "`endCursor` not in repo['defaultBranchRef']['target']"
+                    "['history']['pageInfo']"
+                )
+
+        detail = {
+            "stargazerCount": repo["stargazerCount"],
+            "forkCount": repo["forkCount"],
+            "isPrivate": repo["isPrivate"],
+            "isFork": repo["isFork"],
+            "createdAt": repo["createdAt"],
+            "pushedAt": repo.get("pushedAt"),
+            "languages": [],
+            "commits": commits,
         }
-    }
+        repos.append((repo_name, detail, commit_cursor))
+
+    return repos, repositories["pageInfo"]
+
+
+@functools.lru_cache(maxsize=None)
+def build_repo_query(commit_fields: tuple = DEFAULT_COMMIT_FIELDS) -> str:
     """
+    Build the repository listing query, with only the given fields of each commit.
 
-    start_time = f"{year}-01-01T00:00:00Z"
-    end_time = f"{year}-12-31T23:59:59Z"
+    The page size is left as `%d` to be filled in for every page.
 
-    variables = {
-        "username": user_name,
-        "from": start_time,
-        "to": end_time,
+    Args:
+        commit_fields (tuple): The commit fields to fetch, out of `COMMIT_FIELDS`.
+
+    Raises:
+        ValueError: If a field is not in `COMMIT_FIELDS`.
+    """
+    return REPO_QUERY % {
+        "rate_limit": RATE_LIMIT_FIELD,
+        "commit_fields": commit_field_selection(commit_fields, 40),
     }
 
-    result = _graphql_query(query, variables, token)["user"]["contributionsCollection"]
+
+def is_dormant(repos: list, year: int) -> bool:
+    """
+    Check whether a page of repositories, listed by `pushedAt` descending, ends with a
+    repository that was last pushed before the given year in every timezone. All repositories
+    after it were pushed even earlier, so they have no commits and were not created in the year.
+    """
+    if not repos:
+        return False
+    pushed_at = repos[-1][1].get("pushedAt")
+    # The year starts up to 14 hours earlier than in UTC (UTC+14)
+    return bool(pushed_at) and pushed_at < f"{year - 1}-12-31T00:00:00Z"
+
+
+def is_new_repo(created_at: str, year: int, last_year: int = None) -> bool:
+    """
+    Check whether a repository may have been created in the given year, or from `year` to
+    `last_year`, in some timezone. Only these repositories need their languages for the
+    report.
+    """
+    # Timezones range from UTC-12 to UTC+14
+    return (
+        f"{year - 1}-12-31T00:00:00Z" <= created_at < f"{(last_year or year) + 1}-01-02T00:00:00Z"
+    )
+
+
+def parse_contribution(result: dict) -> dict:
+    """Convert the result of `CONTRIBUTION_QUERY` to the contribution info."""
+    result = result["user"]["contributionsCollection"]
 
     pr_num = result["totalPullRequestContributions"]
     issue_num = result["totalIssueContributions"]
@@ -352,59 +383,497 @@ def _get_contribution(user_name: str, token: str, year: int) -> dict:
     }
 
 
-def get_github_info(username: str, token: str, year: int) -> dict:
+def _get_basic(user_name: str, token: str) -> dict:
+    variables = {
+        "username": user_name,
+    }
+
+    result = _graphql_query(BASIC_QUERY, variables, token)
+    if result.get("viewer"):
+        # From now on, the cache entries of the token are those of its user
+        graphql_cache.set_viewer(token, result["viewer"]["id"])
+    return parse_basic(result)
+
+
+def _iter_repo(
+    user_name: str,
+    user_id: str,
+    token: str,
+    year: int,
+    commit_fields: tuple,
+    last_year: int,
+    resume: dict = None,
+) -> Iterator[tuple]:
     """
-    Get the GitHub information for the given year.
+    Yield the repositories of the user with their commits from `year` to `last_year`, as
+    they arrive.
+
+    Repositories are listed by `pushedAt` descending with an adaptive page size, see
+    `PageSizeController`. Once the listing reaches repositories that were not pushed to since
+    before the year, the rest is listed with `REPO_LIGHT_QUERY`, which skips the commit
+    history. Repositories with more than one page of commits are collected into batches of
+    `commit_batch_size()`, which are paged further on a pool of
+    `Config.COMMIT_FETCH_WORKERS` threads while the listing goes on. Languages are only
+    fetched for repositories created in the year, in batches on the same pool.
+
+    After every listing page and every follow-up page once the listing is done, a
+    checkpoint of what is left to fetch is yielded. Passing it as `resume` continues the
+    crawl from there, without the events that were yielded before it.
+
+    Yields:
+        tuple: ("repo", name, detail) with the first page of commits in `detail`, then
+               ("commits", name, commits) for each further page,
+               ("languages", name, languages) for repositories created in the years and
+               ("checkpoint", checkpoint).
+    """
+    controller = PageSizeController(initial_page_size(user_name))
+    logging.info("Processing repo: username=%s, page_size=%d", user_name, controller.size)
 
-    Args:
-        username (str): The GitHub username.
-        token (str): The GitHub access token.
-        year (int): The year to get the information.
+    start_time, end_time = year_range(year, last_year)
 
-    Returns:
-        dict: The GitHub information.
+    variables = {
+        "username": user_name,
+        "id": user_id,
+        "since": start_time,
+        "until": end_time,
+        "after": None,
+    }
+
+    batch = {}
+    batch_size = commit_batch_size()
+    language_batch = []
+    dormant = False
+
+    workers = Config.COMMIT_FETCH_WORKERS
+    executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+    follow_ups = FollowUps(
+        executor, _graphql_query, user_name, user_id, token, year, commit_fields, last_year
+    )
+    listed = False
+    if resume:
+        logging.info("Resuming repo: username=%s, after=%s", user_name, resume["after"])
+        variables["after"] = resume["after"]
+        listed = resume["listed"]
+        dormant = resume["dormant"]
+        for commit_batch in resume["commits"]:
+            follow_ups.add_commits(commit_batch["cursors"], commit_batch["since"])
+        for names in resume["languages"]:
+            follow_ups.add_languages(names)
+
+    def checkpoint() -> tuple:
+        state = follow_ups.checkpoint()
+        if batch:
+            state["commits"].append({"cursors": dict(batch), "since": None})
+        if language_batch:
+            state["languages"].append(list(language_batch))
+        state.update(after=variables["after"], listed=listed, dormant=dormant)
+        return "checkpoint", state
+
+    try:
+        while not listed:
+            if dormant:
+                repos, page_info = parse_repo_page(
+                    _graphql_query(
+                        REPO_LIGHT_QUERY,
+                        {"username": user_name, "after": variables["after"]},
+                        token,
+                    ),
+                    with_history=False,
+                )
+            else:
+                repos, page_info = _get_repo_page(
+                    variables, token, controller, commit_fields
+                )
+                if is_dormant(repos, year):
+                    logging.info(
+                        "Listing remaining repos without history: username=%s", user_name
+                    )
+                    dormant = True
+
+            for repo_name, detail, commit_cursor in repos:
+                yield "repo", repo_name, detail
+                if commit_cursor:
+                    batch[repo_name] = commit_cursor
+                if is_new_repo(detail["createdAt"], year, last_year):
+                    language_batch.append(repo_name)
+
+                if len(batch) >= batch_size:
+                    follow_ups.add_commits(batch)
+                    batch = {}
+
+                if len(language_batch) >= language_batch_size():
+                    follow_ups.add_languages(language_batch)
+                    language_batch = []
+
+            # Hand out the follow-up pages that are ready without waiting for the others
+            yield from follow_ups.drain(block=False)
+
+            if page_info["hasNextPage"]:
+                variables["after"] = page_info["endCursor"]
+            else:
+                listed = True
+            yield checkpoint()
+
+        if batch:
+            follow_ups.add_commits(batch)
+            batch = {}
+        if language_batch:
+            follow_ups.add_languages(language_batch)
+            language_batch = []
+
+        while follow_ups.pending():
+            yield from follow_ups.drain(block=True, count=1)
+            yield checkpoint()
+    finally:
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    remember_page_size(user_name, controller.size)
+
+
+def _iter_repo_updates(
+    user_name: str,
+    user_id: str,
+    token: str,
+    year: int,
+    commit_fields: tuple,
+    last_seen: dict,
+    pushed_after: str,
+) -> Iterator[tuple]:
+    """
+    Yield the repositories of the user with only their commits that are newer than the
+    last seen ones.
+
+    All repositories are listed with `REPO_LIGHT_QUERY`, as their stars may have changed.
+    Only the repositories pushed to since `pushed_after` have their commits fetched, from
+    one second after their time in `last_seen`, or from the start of the year for
+    repositories without one. Languages are only fetched for repositories that are not in
+    `last_seen` and were created in the year.
+
+    Yields:
+        tuple: The events of `_iter_repo`, with no commits in the "repo" events.
     """
+    logging.info("Processing repo updates: username=%s, since=%s", user_name, pushed_after)
 
-    logging.info("Processing basic info: username=%s", username)
-    basic_info = _get_basic(username, token)
-    if not basic_info["id"]:
-        raise ValueError("Failed to get user id")
+    # Callers may update their own copy while the events are consumed
+    last_seen = dict(last_seen)
 
-    user_id = basic_info["id"]
+    batch = {}
+    since = {}
+    batch_size = commit_batch_size()
+    language_batch = []
+    after = None
 
-    interval = 10
-    repo_info = None
-    while not repo_info:
-        try:
-            logging.info(
-                "Processing repo: username=%s, interval=%d", username, interval
+    workers = Config.COMMIT_FETCH_WORKERS
+    executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+    follow_ups = FollowUps(
+        executor, _graphql_query, user_name, user_id, token, year, commit_fields, None
+    )
+    try:
+        while True:
+            repos, page_info = parse_repo_page(
+                _graphql_query(REPO_LIGHT_QUERY, {"username": user_name, "after": after}, token),
+                with_history=False,
             )
-            repo_info = _get_repo(username, user_id, token, year, interval)
-            if repo_info:
+
+            for repo_name, detail, _ in repos:
+                yield "repo", repo_name, detail
+                if (detail["pushedAt"] or "") >= pushed_after:
+                    batch[repo_name] = None
+                    since[repo_name] = _next_second(last_seen.get(repo_name))
+                if repo_name not in last_seen and is_new_repo(detail["createdAt"], year):
+                    language_batch.append(repo_name)
+
+                if len(batch) >= batch_size:
+                    follow_ups.add_commits(batch, since)
+                    batch, since = {}, {}
+
+                if len(language_batch) >= language_batch_size():
+                    follow_ups.add_languages(language_batch)
+                    language_batch = []
+
+            yield from follow_ups.drain(block=False)
+
+            if not page_info["hasNextPage"]:
                 break
-        except Exception as e:
+
+            after = page_info["endCursor"]
+
+        if batch:
+            follow_ups.add_commits(batch, since)
+        if language_batch:
+            follow_ups.add_languages(language_batch)
+
+        yield from follow_ups.drain(block=True)
+    finally:
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _next_second(timestamp: str) -> str:
+    """Get the timestamp one second after the given one, or None."""
+    if not timestamp:
+        return None
+    seconds = calendar.timegm(time.strptime(timestamp, "%Y-%m-%dT%H:%M:%SZ")) + 1
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(seconds))
+
+
+def _get_repo_page(
+    variables: dict, token: str, controller: PageSizeController, commit_fields: tuple
+) -> tuple:
+    """
+    Get one page of repositories, shrinking the page size until the page succeeds.
+
+    Pages are tried once per page size, and the size shrinks when they time out or exceed
+    the resource limits, see `is_page_size_error`. Other errors, like rate limits, leave the
+    size as is: the page is sent again with the full retry policy of `_graphql_query`, as it
+    always is at the minimum page size.
+    """
+    repo_query = build_repo_query(commit_fields)
+    full_retry = False
+    while True:
+        query = repo_query % (controller.size)
+        query_fn = _graphql_query
+        if controller.size > controller.minimum and not full_retry:
+            query_fn = _graphql_query_once
+
+        start = time.perf_counter()
+        try:
+            page = parse_repo_page(query_fn(query, variables, token, cache_query=repo_query))
+        except Exception as e:  # pylint: disable=broad-except
+            if not is_page_size_error(e):
+                if query_fn is _graphql_query:
+                    raise ValueError("Failed to get repo info") from e
+                logging.warning(
+                    "Failed to get repo info: %s. Retrying with the same page size.", e
+                )
+                full_retry = True
+                continue
             logging.error(
-                "Unexpected error: Failed to get repo info: %s. Trying to decrease the interval.",
+                "Unexpected error: Failed to get repo info: %s. Trying to decrease the page size.",
                 e,
             )
-            interval = interval // 2
+            if controller.failure():
+                full_retry = False
+                continue
+            raise ValueError("Failed to get repo info") from e
+
+        controller.success(time.perf_counter() - start)
+        return page
+
+
+def is_page_size_error(error: Exception) -> bool:
+    """
+    Check whether a failed page of repositories may succeed with a smaller page size: it
+    timed out, or exceeded the resource limits of GitHub. Rate limits, server errors and
+    others are not caused by the page size.
+    """
+    if isinstance(error, RetryError):
+        error = error.last_attempt.exception()
+    if isinstance(error, GraphQLError):
+        return any(
+            e.get("type") in PAGE_SIZE_ERROR_TYPES
+            or "timeout" in str(e.get("message")).lower()
+            or "resource limits" in str(e.get("message")).lower()
+            for e in error.errors
+        )
+    if isinstance(error, requests.HTTPError):
+        # Gateway timeout
+        return error.response is not None and error.response.status_code == 504
+    return isinstance(error, (requests.Timeout, asyncio.TimeoutError))
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """
+    Check whether a failed crawl would fail the same way when it is started again: the token
+    is invalid or lacks access, GitHub rejects a query, or the repositories cannot be listed
+    at any page size. Rate limits, timeouts and server errors may pass.
+    """
+    if isinstance(error, RetryError):
+        error = error.last_attempt.exception()
+    if isinstance(error, GraphQLError):
+        return not is_page_size_error(error)
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code in (401, 403, 404)
+    # Raised when the repositories cannot be listed or the user is not found
+    return isinstance(error, ValueError)
+
+
+def _get_contribution(user_name: str, token: str, year: int) -> dict:
+    start_time, end_time = year_range(year)
+
+    variables = {
+        "username": user_name,
+        "from": start_time,
+        "to": end_time,
+    }
+
+    return parse_contribution(_graphql_query(CONTRIBUTION_QUERY, variables, token))
 
-            if interval < 1:
-                raise ValueError("Failed to get repo info") from e
-        else:
-            logging.error(
-                "Unexpected error: Failed to get repo info. Trying to decrease the interval."
-            )
-            interval = interval // 2
 
-            if interval < 1:
-                raise ValueError("Failed to get repo info") from e
+def _timed(fn, *args) -> tuple:
+    """Call `fn` and return its result with the elapsed seconds."""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
 
-    logging.info("Processing contribution: username=%s", username)
-    contribution_info = _get_contribution(username, token, year)
+
+def iter_github_info(
+    username: str,
+    token: str,
+    year: int,
+    commit_fields: tuple = DEFAULT_COMMIT_FIELDS,
+    last_year: int = None,
+    resume: dict = None,
+) -> Iterator[tuple]:
+    """
+    Yield the GitHub information for the given year, or years, as it arrives.
+
+    Only the pages that are being fetched are held in memory, so the memory used does not
+    grow with the number of commits of the account. The contribution calendar does not
+    depend on the other phases, so it is fetched in the background while the basic info and
+    the repositories are fetched.
+
+    With `last_year`, the repositories are crawled once for the commits of all years from
+    `year` to `last_year`, and a contribution calendar is fetched for each of them.
+
+    Args:
+        username (str): The GitHub username.
+        token (str): The GitHub access token.
+        year (int): The year to get the information.
+        commit_fields (tuple): The fields of each commit to fetch, out of `COMMIT_FIELDS`.
+        last_year (int): The last year to get the information, by default `year`.
+        resume (dict): A checkpoint yielded by an earlier call with the same arguments, to
+                       continue from.
+
+    Yields:
+        tuple: ("basic", basic_info) first, then the repository events of `_iter_repo`, and
+               ("contribution", contribution_info, year) for each year last.
+    """
+    start = time.perf_counter()
+    years = range(year, (last_year or year) + 1)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        logging.info("Processing contribution: username=%s", username)
+        contribution_futures = [
+            executor.submit(_timed, _get_contribution, username, token, contribution_year)
+            for contribution_year in years
+        ]
+
+        logging.info("Processing basic info: username=%s", username)
+        basic_info, basic_time = _timed(_get_basic, username, token)
+        if not basic_info["id"]:
+            raise ValueError("Failed to get user id")
+
+        user_id = basic_info["id"]
+        yield "basic", basic_info
+
+        repo_start = time.perf_counter()
+        yield from _iter_repo(
+            username, user_id, token, year, commit_fields, last_year, resume
+        )
+        repo_time = time.perf_counter() - repo_start
+
+        contributions = [future.result() for future in contribution_futures]
+        contribution_time = sum(elapsed for _, elapsed in contributions)
+
+    logging.info(
+        "Phase timing: username=%s, basic=%.2fs, repo=%.2fs, contribution=%.2fs, total=%.2fs",
+        username,
+        basic_time,
+        repo_time,
+        contribution_time,
+        time.perf_counter() - start,
+    )
+    # The counters are shared by all crawls of the process, not only this one
+    logging.info("Transport stats (process-wide totals): %s", transport.get_stats())
+
+    for contribution_year, (contribution_info, _) in zip(years, contributions):
+        yield "contribution", contribution_info, contribution_year
+
+
+def iter_github_updates(
+    username: str,
+    token: str,
+    year: int,
+    last_seen: dict,
+    pushed_after: str,
+    commit_fields: tuple = DEFAULT_COMMIT_FIELDS,
+) -> Iterator[tuple]:
+    """
+    Yield the GitHub information for the given year that changed since an earlier fetch.
+
+    The basic info, the repository list and the contribution calendar are fetched again,
+    but commits only for the repositories pushed to since the earlier fetch, and only those
+    newer than the last commit seen of each repository. Commits that are pushed later with
+    an older commit date are not picked up.
+
+    Args:
+        username (str): The GitHub username.
+        token (str): The GitHub access token.
+        year (int): The year to get the information.
+        last_seen (dict): The time of the last commit seen of each known repository, or
+                          None for repositories without commits in the year.
+        pushed_after (str): The time of the earlier fetch.
+        commit_fields (tuple): The fields of each commit to fetch, out of `COMMIT_FIELDS`.
+
+    Yields:
+        tuple: The events of `iter_github_info`, with only the new commits.
+    """
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        contribution_future = executor.submit(_get_contribution, username, token, year)
+
+        basic_info = _get_basic(username, token)
+        if not basic_info["id"]:
+            raise ValueError("Failed to get user id")
+        yield "basic", basic_info
+
+        yield from _iter_repo_updates(
+            username, basic_info["id"], token, year, commit_fields, last_seen, pushed_after
+        )
+
+        contribution_info = contribution_future.result()
+
+    logging.info(
+        "Update timing: username=%s, total=%.2fs", username, time.perf_counter() - start
+    )
+    # The counters are shared by all crawls of the process, not only this one
+    logging.info("Transport stats (process-wide totals): %s", transport.get_stats())
+
+    yield "contribution", contribution_info, year
+
+
+def get_github_info(
+    username: str, token: str, year: int, commit_fields: tuple = DEFAULT_COMMIT_FIELDS
+) -> dict:
+    """
+    Get the GitHub information for the given year.
+
+    Args:
+        username (str): The GitHub username.
+        token (str): The GitHub access token.
+        year (int): The year to get the information.
+        commit_fields (tuple): The fields of each commit to fetch, out of `COMMIT_FIELDS`.
+
+    Returns:
+        dict: The GitHub information.
+    """
+    info = {"repo": {}}
+    for event in iter_github_info(username, token, year, commit_fields):
+        kind = event[0]
+        if kind == "repo":
+            info["repo"][event[1]] = event[2]
+        elif kind == "commits":
+            info["repo"][event[1]]["commits"].extend(event[2])
+        elif kind == "languages":
+            info["repo"][event[1]]["languages"] = event[2]
+        elif kind in ("basic", "contribution"):
+            info[kind] = event[1]
 
     return {
-        "basic": basic_info,
-        "repo": repo_info,
-        "contribution": contribution_info,
+        "basic": info["basic"],
+        "repo": info["repo"],
+        "contribution": info["contribution"],
     }
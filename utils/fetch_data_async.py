@@ -0,0 +1,432 @@
+"""
+This module provides an asyncio version of `utils.fetch_data` built on aiohttp.
+
+It sends the same GraphQL queries and returns the same data as `get_github_info`, but many
+users can be fetched at once on a single event loop instead of one thread per report.
+
+Functions:
+    get_github_info_async(username: str, token: str, year: int, commit_fields: tuple) -> dict:
+        Get the GitHub information for the given year.
+"""
+
+import asyncio
+import json
+import logging
+import time
+
+import aiohttp
+import requests
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+
+from config.config import Config
+from utils import cassette, graphql_cache, rate_limit, transport
+from utils.batch_query import (
+    build_commit_batch_query,
+    build_language_batch_query,
+    commit_batch_size,
+    commit_batch_variables,
+    fail_commit_batch,
+    language_batch_size,
+    language_batch_variables,
+    merge_commit_batch,
+    parse_language_batch,
+)
+from utils.fetch_data import (
+    BASIC_QUERY,
+    CONTRIBUTION_QUERY,
+    REPO_LIGHT_QUERY,
+    build_repo_query,
+    graphql_data,
+    is_dormant,
+    is_new_repo,
+    is_page_size_error,
+    parse_basic,
+    parse_contribution,
+    parse_repo_page,
+)
+from utils.logging_config import setup_logging
+from utils.page_size import PageSizeController, initial_page_size, remember_page_size
+from utils.query_fields import DEFAULT_COMMIT_FIELDS, year_range
+
+setup_logging()
+
+# One client session per event loop, so the keep-alive pool is shared by every fetch on it
+_sessions = {}
+
+
+def _get_session() -> aiohttp.ClientSession:
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=Config.GITHUB_POOL_SIZE, keepalive_timeout=60
+        )
+        session = aiohttp.ClientSession(connector=connector, auto_decompress=True)
+        _sessions[loop] = session
+    return session
+
+
+async def close_session() -> None:
+    """
+    Close the client session of the running event loop.
+    """
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session:
+        await session.close()
+
+
+@retry(
+    retry=retry_if_exception(rate_limit.is_retryable),
+    stop=stop_after_attempt(5),
+    wait=rate_limit.wait_rate_limit(wait_exponential(multiplier=1, min=2, max=64)),
+    before_sleep=transport.record_retry,
+)
+async def _graphql_query(
+    query: str, variables: dict, token: str, cache_query: str = None
+) -> dict:
+    cache_key = graphql_cache.make_key(cache_query or query, variables, token)
+    data = graphql_cache.get(cache_key)
+    if data is not None:
+        return data
+
+    await rate_limit.acquire_async(token)
+
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json",
+        "Accept-Encoding": "gzip, deflate",
+    }
+    payload = {"query": query, "variables": variables}
+    start = time.perf_counter()
+    if cassette.is_replaying():
+        status, response_headers, content = await cassette.replay_async(
+            "POST", Config.GITHUB_GRAPHQL_URL, payload
+        )
+    else:
+        async with _get_session().post(
+            Config.GITHUB_GRAPHQL_URL,
+            json=payload,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=Config.REQUEST_TIMEOUT),
+        ) as response:
+            status, response_headers = response.status, response.headers
+            content = await response.read()
+        if cassette.is_recording():
+            cassette.record(
+                "POST", Config.GITHUB_GRAPHQL_URL, payload, status, response_headers, content
+            )
+    transport.record_call(0, len(content), time.perf_counter() - start, error=status >= 400)
+    try:
+        body = json.loads(content)
+    except ValueError:
+        body = None
+
+    rate_limit.observe(token, response_headers)
+    rate_limit.check_response(token, status, response_headers, body)
+    if status >= 400:
+        # With the status, like the errors of `raise_for_status`
+        http_response = requests.Response()
+        http_response.status_code = status
+        raise requests.HTTPError(
+            f"{status} Error for url: {Config.GITHUB_GRAPHQL_URL}", response=http_response
+        )
+    data = graphql_data(body, token)
+
+    if data is not None and not body.get("errors"):
+        graphql_cache.put(cache_key, data, graphql_cache.ttl_for(variables))
+    return data
+
+
+# Single attempt, for callers that react to failures themselves
+_graphql_query_once = _graphql_query.retry_with(stop=stop_after_attempt(1))
+
+
+async def _get_basic(user_name: str, token: str) -> dict:
+    variables = {
+        "username": user_name,
+    }
+
+    result = await _graphql_query(BASIC_QUERY, variables, token)
+    if result.get("viewer"):
+        # From now on, the cache entries of the token are those of its user
+        graphql_cache.set_viewer(token, result["viewer"]["id"])
+    return parse_basic(result)
+
+
+async def _get_repo(
+    user_name: str, user_id: str, token: str, year: int, commit_fields: tuple
+) -> dict:
+    controller = PageSizeController(initial_page_size(user_name))
+    logging.info("Processing repo: username=%s, page_size=%d", user_name, controller.size)
+
+    start_time, end_time = year_range(year)
+
+    variables = {
+        "username": user_name,
+        "id": user_id,
+        "since": start_time,
+        "until": end_time,
+        "after": None,
+    }
+
+    all_repos = {}
+    pending = []
+    batch = {}
+    batch_size = commit_batch_size()
+    pending_languages = []
+    language_batch = []
+    dormant = False
+    semaphore = asyncio.Semaphore(max(Config.COMMIT_FETCH_WORKERS, 1))
+
+    try:
+        while True:
+            if dormant:
+                repos, page_info = parse_repo_page(
+                    await _graphql_query(
+                        REPO_LIGHT_QUERY,
+                        {"username": user_name, "after": variables["after"]},
+                        token,
+                    ),
+                    with_history=False,
+                )
+            else:
+                repos, page_info = await _get_repo_page(
+                    variables, token, controller, commit_fields
+                )
+                if is_dormant(repos, year):
+                    logging.info(
+                        "Listing remaining repos without history: username=%s", user_name
+                    )
+                    dormant = True
+
+            for repo_name, detail, commit_cursor in repos:
+                all_repos[repo_name] = detail
+                if commit_cursor:
+                    batch[repo_name] = commit_cursor
+                if is_new_repo(detail["createdAt"], year):
+                    language_batch.append(repo_name)
+
+                if len(batch) >= batch_size:
+                    pending.append(
+                        asyncio.create_task(
+                            _get_commit_histories(
+                                semaphore, user_name, user_id, token, year, commit_fields, batch
+                            )
+                        )
+                    )
+                    batch = {}
+
+                if len(language_batch) >= language_batch_size():
+                    pending_languages.append(
+                        asyncio.create_task(
+                            _get_languages(semaphore, user_name, token, language_batch)
+                        )
+                    )
+                    language_batch = []
+
+            if not page_info["hasNextPage"]:
+                break
+
+            variables["after"] = page_info["endCursor"]
+
+        if batch:
+            pending.append(
+                asyncio.create_task(
+                    _get_commit_histories(
+                        semaphore, user_name, user_id, token, year, commit_fields, batch
+                    )
+                )
+            )
+
+        if language_batch:
+            pending_languages.append(
+                asyncio.create_task(
+                    _get_languages(semaphore, user_name, token, language_batch)
+                )
+            )
+
+        # Merge follow-up pages in listing order so the result does not depend on timing
+        for task in pending:
+            for repo_name, commits in (await task).items():
+                all_repos[repo_name]["commits"].extend(commits)
+        for task in pending_languages:
+            for repo_name, languages in (await task).items():
+                all_repos[repo_name]["languages"] = languages
+    finally:
+        for task in pending + pending_languages:
+            task.cancel()
+
+    remember_page_size(user_name, controller.size)
+
+    return all_repos
+
+
+async def _get_repo_page(
+    variables: dict, token: str, controller: PageSizeController, commit_fields: tuple
+) -> tuple:
+    repo_query = build_repo_query(commit_fields)
+    full_retry = False
+    while True:
+        query = repo_query % (controller.size)
+        query_fn = _graphql_query
+        if controller.size > controller.minimum and not full_retry:
+            query_fn = _graphql_query_once
+
+        start = time.perf_counter()
+        try:
+            page = parse_repo_page(
+                await query_fn(query, variables, token, cache_query=repo_query)
+            )
+        except Exception as e:  # pylint: disable=broad-except
+            # Only errors caused by the page size shrink it, see `utils.fetch_data`
+            if not is_page_size_error(e):
+                if query_fn is _graphql_query:
+                    raise ValueError("Failed to get repo info") from e
+                logging.warning(
+                    "Failed to get repo info: %s. Retrying with the same page size.", e
+                )
+                full_retry = True
+                continue
+            logging.error(
+                "Unexpected error: Failed to get repo info: %s. Trying to decrease the page size.",
+                e,
+            )
+            if controller.failure():
+                full_retry = False
+                continue
+            raise ValueError("Failed to get repo info") from e
+
+        controller.success(time.perf_counter() - start)
+        return page
+
+
+async def _get_commit_histories(
+    semaphore: asyncio.Semaphore,
+    user_name: str,
+    user_id: str,
+    token: str,
+    year: int,
+    commit_fields: tuple,
+    cursors: dict,
+) -> dict:
+    cursors = dict(cursors)
+    commits = {name: [] for name in cursors}
+    tries = {}
+
+    while cursors:
+        names = list(cursors)
+        try:
+            async with semaphore:
+                result = await _graphql_query(
+                    build_commit_batch_query(len(names), commit_fields),
+                    commit_batch_variables(user_name, user_id, year, names, cursors),
+                    token,
+                )
+            merge_commit_batch(result, names, cursors, tries, commits)
+        except Exception as e:  # pylint: disable=broad-except
+            logging.error(
+                "Unexpected error: Failed to get commit info: %s.",
+                e,
+            )
+            fail_commit_batch(names, cursors, tries)
+
+    return commits
+
+
+async def _get_languages(
+    semaphore: asyncio.Semaphore, user_name: str, token: str, names: list
+) -> dict:
+    try:
+        async with semaphore:
+            result = await _graphql_query(
+                build_language_batch_query(len(names)),
+                language_batch_variables(user_name, names),
+                token,
+            )
+        return parse_language_batch(result, names)
+    except Exception as e:  # pylint: disable=broad-except
+        logging.error(
+            "Unexpected error: Failed to get languages info: %s.",
+            e,
+        )
+        return {}
+
+
+async def _get_contribution(user_name: str, token: str, year: int) -> dict:
+    start_time, end_time = year_range(year)
+
+    variables = {
+        "username": user_name,
+        "from": start_time,
+        "to": end_time,
+    }
+
+    return parse_contribution(
+        await _graphql_query(CONTRIBUTION_QUERY, variables, token)
+    )
+
+
+async def _timed(coro) -> tuple:
+    """Await `coro` and return its result with the elapsed seconds."""
+    start = time.perf_counter()
+    result = await coro
+    return result, time.perf_counter() - start
+
+
+async def _get_basic_and_repo(
+    username: str, token: str, year: int, commit_fields: tuple
+) -> tuple:
+    logging.info("Processing basic info: username=%s", username)
+    basic_info, basic_time = await _timed(_get_basic(username, token))
+    if not basic_info["id"]:
+        raise ValueError("Failed to get user id")
+
+    repo_info, repo_time = await _timed(
+        _get_repo(username, basic_info["id"], token, year, commit_fields)
+    )
+    return basic_info, basic_time, repo_info, repo_time
+
+
+async def get_github_info_async(
+    username: str, token: str, year: int, commit_fields: tuple = DEFAULT_COMMIT_FIELDS
+) -> dict:
+    """
+    Get the GitHub information for the given year.
+
+    The contribution calendar is fetched at the same time as the basic info and the
+    repositories.
+
+    Args:
+        username (str): The GitHub username.
+        token (str): The GitHub access token.
+        year (int): The year to get the information.
+        commit_fields (tuple): The fields of each commit to fetch, out of `COMMIT_FIELDS`.
+
+    Returns:
+        dict: The GitHub information, in the same shape as `get_github_info`.
+    """
+    start = time.perf_counter()
+
+    logging.info("Processing contribution: username=%s", username)
+    (basic_info, basic_time, repo_info, repo_time), (
+        contribution_info,
+        contribution_time,
+    ) = await asyncio.gather(
+        _get_basic_and_repo(username, token, year, commit_fields),
+        _timed(_get_contribution(username, token, year)),
+    )
+
+    logging.info(
+        "Phase timing: username=%s, basic=%.2fs, repo=%.2fs, contribution=%.2fs, total=%.2fs",
+        username,
+        basic_time,
+        repo_time,
+        contribution_time,
+        time.perf_counter() - start,
+    )
+
+    return {
+        "basic": basic_info,
+        "repo": repo_info,
+        "contribution": contribution_info,
+    }
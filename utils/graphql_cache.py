@@ -0,0 +1,210 @@
+"""
+This module provides a cache of GraphQL responses, used under `_graphql_query`.
+
+Responses are keyed by a hash of the query, its variables and the user the access token
+authenticates, so a cached response is only ever served to the user it was fetched for, and
+is still served after a new login gives them a new token. Until the user of a token is known
+(see `set_viewer`), as for its first basic query, entries are keyed by a digest of the token
+instead. Data of finished years never
+changes and is kept for `Config.GRAPHQL_CACHE_TTL_PAST` seconds; everything else is kept for
+`Config.GRAPHQL_CACHE_TTL_CURRENT` seconds. The memory tier holds at most
+`Config.GRAPHQL_CACHE_SIZE` responses; an optional disk tier in `Config.GRAPHQL_CACHE_DIR`
+keeps them across restarts and workers.
+
+Functions:
+    set_viewer(token: str, viewer: str) -> None:
+        Scope the cache entries of a token to the user it authenticates.
+    make_key(query: str, variables: dict, token: str) -> str:
+        Get the cache key of a query.
+    ttl_for(variables: dict) -> int:
+        Get how long the response to a query with the given variables can be cached.
+    get(key: str) -> dict:
+        Get a cached response.
+    put(key: str, data: dict, ttl: int) -> None:
+        Cache a response.
+    clear() -> None:
+        Remove all responses from the memory tier.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from config.config import Config
+from utils import cassette
+
+# Bound on the number of tokens whose user is remembered
+_MAX_VIEWERS = 10000
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+# The user authenticated by each token, by digest of the token
+_viewers = OrderedDict()
+
+
+def _token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def set_viewer(token: str, viewer: str) -> None:
+    """
+    Scope the cache entries of a token to the user it authenticates, so that they are shared
+    by every token of that user.
+
+    Args:
+        token (str): The access token.
+        viewer (str): The id of the user the token authenticates.
+    """
+    with _lock:
+        _viewers[_token_digest(token)] = viewer
+        _viewers.move_to_end(_token_digest(token))
+        while len(_viewers) > _MAX_VIEWERS:
+            _viewers.popitem(last=False)
+
+
+def _scope(token: str) -> str:
+    token_digest = _token_digest(token)
+    with _lock:
+        viewer = _viewers.get(token_digest)
+    return f"viewer:{viewer}" if viewer else f"token:{token_digest}"
+
+
+def make_key(query: str, variables: dict, token: str) -> str:
+    """
+    Get the cache key of a query.
+
+    Args:
+        query (str): The GraphQL query.
+        variables (dict): The query variables.
+        token (str): The access token the query is sent with.
+
+    Returns:
+        str: The cache key, scoped to the user of the token if known.
+    """
+    digest = hashlib.sha256()
+    digest.update(query.encode("utf-8"))
+    digest.update(json.dumps(variables, sort_keys=True).encode("utf-8"))
+    digest.update(_scope(token).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def ttl_for(variables: dict) -> int:
+    """
+    Get how long the response to a query with the given variables can be cached.
+
+    Args:
+        variables (dict): The query variables.
+
+    Returns:
+        int: The TTL in seconds, long if the query only covers a finished year.
+    """
+    until = variables.get("until") or variables.get("to")
+    if until and until < time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()):
+        return Config.GRAPHQL_CACHE_TTL_PAST
+    return Config.GRAPHQL_CACHE_TTL_CURRENT
+
+
+def _disk_path(key: str) -> str:
+    return os.path.join(Config.GRAPHQL_CACHE_DIR, key[:2], f"{key}.json.gz")
+
+
+def _read_disk(key: str) -> tuple:
+    try:
+        with gzip.open(_disk_path(key), "rt", encoding="utf-8") as f:
+            entry = json.load(f)
+        return entry["expires_at"], entry["data"]
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        logging.error("Failed to read GraphQL cache entry %s: %s", key, e)
+        return None
+
+
+def _write_disk(key: str, expires_at: float, text: str) -> None:
+    path = _disk_path(key)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump({"expires_at": expires_at, "data": text}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.error("Failed to write GraphQL cache entry %s: %s", key, e)
+
+
+def _remember(key: str, expires_at: float, text: str) -> None:
+    with _lock:
+        _entries[key] = (expires_at, text)
+        _entries.move_to_end(key)
+        while len(_entries) > Config.GRAPHQL_CACHE_SIZE:
+            _entries.popitem(last=False)
+
+
+def get(key: str) -> dict:
+    """
+    Get a cached response.
+
+    Args:
+        key (str): The cache key, see `make_key`.
+
+    Returns:
+        dict: A fresh copy of the cached `data`, or None if it is not cached or expired.
+    """
+    if not Config.GRAPHQL_CACHE_ENABLED or cassette.is_recording():
+        # A cassette has to contain every exchange of the session
+        return None
+
+    now = time.time()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                _entries.move_to_end(key)
+            else:
+                del _entries[key]
+                entry = None
+
+    if entry is None and Config.GRAPHQL_CACHE_DIR:
+        entry = _read_disk(key)
+        if entry is not None and entry[0] > now:
+            _remember(key, *entry)
+        else:
+            entry = None
+
+    if entry is None:
+        return None
+
+    # Entries are stored as JSON text, so callers are free to modify what they get
+    return json.loads(entry[1])
+
+
+def put(key: str, data: dict, ttl: int) -> None:
+    """
+    Cache a response.
+
+    Args:
+        key (str): The cache key, see `make_key`.
+        data (dict): The `data` of the response.
+        ttl (int): The seconds to keep the response, see `ttl_for`.
+    """
+    if not Config.GRAPHQL_CACHE_ENABLED or ttl <= 0:
+        return
+
+    expires_at = time.time() + ttl
+    text = json.dumps(data, separators=(",", ":"))
+    _remember(key, expires_at, text)
+    if Config.GRAPHQL_CACHE_DIR:
+        _write_disk(key, expires_at, text)
+
+
+def clear() -> None:
+    """
+    Remove all responses from the memory tier.
+    """
+    with _lock:
+        _entries.clear()
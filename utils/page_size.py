@@ -0,0 +1,112 @@
+"""
+This module provides an adaptive page size for the repository crawl.
+
+The number of repositories that fit in one GraphQL page depends on the account: every
+repository carries a page of its commits, so a page that is fast for one user times out for
+another. The controller grows the page size while pages come back quickly and shrinks it on
+slow pages and failures, and the last good size is remembered per user.
+
+Classes:
+    PageSizeController:
+        Adjust the page size between pages from their latency and failures.
+
+Functions:
+    initial_page_size(username: str) -> int:
+        Get the page size to start a crawl for the given user with.
+    remember_page_size(username: str, size: int) -> None:
+        Remember a good page size for the given user.
+"""
+
+import logging
+import math
+import threading
+from collections import OrderedDict
+
+from config.config import Config
+
+# Bound on the number of users whose page size is remembered
+_MAX_REMEMBERED = 10000
+
+_remembered = OrderedDict()
+_remembered_lock = threading.Lock()
+
+
+def initial_page_size(username: str) -> int:
+    """
+    Get the page size to start a crawl for the given user with.
+
+    Args:
+        username (str): The GitHub username.
+
+    Returns:
+        int: The remembered page size, or `Config.REPO_PAGE_SIZE` for a new user.
+    """
+    with _remembered_lock:
+        size = _remembered.get(username)
+        if size is not None:
+            _remembered.move_to_end(username)
+            return size
+    return Config.REPO_PAGE_SIZE
+
+
+def remember_page_size(username: str, size: int) -> None:
+    """
+    Remember a good page size for the given user.
+
+    Args:
+        username (str): The GitHub username.
+        size (int): The page size.
+    """
+    with _remembered_lock:
+        _remembered[username] = size
+        _remembered.move_to_end(username)
+        while len(_remembered) > _MAX_REMEMBERED:
+            _remembered.popitem(last=False)
+
+
+class PageSizeController:
+    """
+    Adjust the page size between pages from their latency and failures.
+
+    Pages faster than `Config.REPO_PAGE_FAST_SECONDS` grow the size by half, pages slower
+    than `Config.REPO_PAGE_SLOW_SECONDS` shrink it by a quarter and failed pages halve it.
+    A size that failed is not tried again by the same controller.
+    """
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = None):
+        self.minimum = minimum
+        self.maximum = maximum or Config.REPO_PAGE_SIZE_MAX
+        self.size = min(max(initial, self.minimum), self.maximum)
+
+    def success(self, elapsed: float) -> None:
+        """
+        Record a successful page.
+
+        Args:
+            elapsed (float): The seconds the page took.
+        """
+        if elapsed < Config.REPO_PAGE_FAST_SECONDS:
+            self._resize(math.ceil(self.size * 1.5))
+        elif elapsed > Config.REPO_PAGE_SLOW_SECONDS:
+            self._resize(self.size * 3 // 4)
+
+    def failure(self) -> bool:
+        """
+        Record a failed page.
+
+        Returns:
+            bool: Whether the size was decreased. False means the size is already at its
+                  minimum and the page has to be retried as is.
+        """
+        if self.size <= self.minimum:
+            return False
+        # Do not grow back to a size that already failed during this crawl
+        self.maximum = self.size - 1
+        self._resize(self.size // 2)
+        return True
+
+    def _resize(self, size: int) -> None:
+        size = min(max(size, self.minimum), self.maximum)
+        if size != self.size:
+            logging.info("Repo page size: %d -> %d", self.size, size)
+            self.size = size
@@ -0,0 +1,53 @@
+"""
+This module provides the pieces shared by the GitHub GraphQL queries of `utils.fetch_data`
+and `utils.batch_query`.
+
+Functions:
+    commit_field_selection(commit_fields: tuple, indent: int) -> str:
+        Get the selection of the given commit fields in a query.
+    year_range(year: int, last_year: int) -> tuple:
+        Get the first timestamp of the given year and the last of `last_year`.
+"""
+
+# Added to every query, so that the rate limit budget is known after each call
+RATE_LIMIT_FIELD = """
+        rateLimit {
+            cost
+            remaining
+            resetAt
+        }"""
+
+# Fields of a commit that a report can ask for, see `utils.fetch_data.build_repo_query`
+COMMIT_FIELDS = (
+    "oid",
+    "message",
+    "messageHeadline",
+    "messageBody",
+    "committedDate",
+    "authoredDate",
+    "additions",
+    "deletions",
+)
+
+# Commit fields fetched when the caller does not ask for specific fields: those the report
+# reads, so that the data of every fetch can be passed to `utils.context.build_context`
+DEFAULT_COMMIT_FIELDS = ("messageHeadline", "committedDate")
+
+
+def commit_field_selection(commit_fields: tuple, indent: int) -> str:
+    """
+    Get the selection of the given commit fields in a query, one field per line.
+
+    Raises:
+        ValueError: If a field is not in `COMMIT_FIELDS`, or no field is given.
+    """
+    unknown = [field for field in commit_fields if field not in COMMIT_FIELDS]
+    if unknown or not commit_fields:
+        raise ValueError(f"Unknown commit fields: {unknown or commit_fields}")
+    return "".join(f"\n{' ' * indent}{field}" for field in commit_fields)
+
+
+def year_range(year: int, last_year: int = None) -> tuple:
+    """Get the first timestamp of the given year and the last of `last_year`, by default the
+    same year."""
+    return f"{year}-01-01T00:00:00Z", f"{last_year or year}-12-31T23:59:59Z"
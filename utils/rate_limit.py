@@ -0,0 +1,317 @@
+"""
+This module keeps track of the GitHub rate limit budget of every access token and paces
+calls before GitHub starts rejecting them.
+
+The budget is learnt from the `X-RateLimit-*` headers of every response and from the
+`rateLimit { cost remaining resetAt }` field of GraphQL queries. GraphQL and REST calls have
+separate budgets, called resources, as on GitHub.
+
+Classes:
+    RateLimitExceeded:
+        Raised when GitHub rejects a call because the rate limit is exhausted.
+    RateLimitScheduler:
+        Track the budget of every token and decide how long a call has to wait.
+
+Functions:
+    acquire(token: str, resource: str) -> None:
+        Wait until a call with the given token is within its budget.
+    acquire_async(token: str, resource: str) -> None:
+        Wait until a call with the given token is within its budget, without blocking the loop.
+    observe(token: str, headers: dict, rate_limit: dict, resource: str) -> None:
+        Update the budget of a token from a response.
+    get_budget(token: str) -> dict:
+        Get the known budget of a token.
+    check_response(token: str, status: int, headers: dict, body: dict, resource: str) -> None:
+        Raise `RateLimitExceeded` if a response was rejected by the rate limit.
+    is_retryable(error: Exception) -> bool:
+        Check whether a failed call is worth retrying.
+"""
+
+import asyncio
+import calendar
+import hashlib
+import logging
+import threading
+import time
+
+from tenacity.wait import wait_base
+
+from config.config import Config
+
+
+class RateLimitExceeded(Exception):
+    """
+    Raised when GitHub rejects a call because the rate limit is exhausted.
+    """
+
+    def __init__(self, message: str, reset_at: float):
+        super().__init__(message)
+        self.reset_at = reset_at
+
+
+def _token_key(token: str) -> str:
+    # Tokens are never kept in memory longer than needed, only a digest of them
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+
+
+def _parse_reset(value) -> float:
+    """Convert an epoch (header) or ISO time (GraphQL) to epoch seconds."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)) or str(value).isdigit():
+        return float(value)
+    try:
+        return float(calendar.timegm(time.strptime(value, "%Y-%m-%dT%H:%M:%SZ")))
+    except ValueError:
+        return None
+
+
+class RateLimitScheduler:
+    """
+    Track the budget of every token and decide how long a call has to wait.
+
+    A call waits for the reset of its budget when fewer than `Config.RATE_LIMIT_RESERVE`
+    points are left. Below `Config.RATE_LIMIT_PACE_BELOW` points, calls are spread evenly over
+    the time until the reset instead of spending the rest of the budget at once.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._budgets = {}
+
+    def observe(
+        self, token: str, headers: dict = None, rate_limit: dict = None, resource: str = "graphql"
+    ) -> None:
+        """
+        Update the budget of a token from a response.
+
+        Args:
+            token (str): The access token of the call.
+            headers (dict): The response headers.
+            rate_limit (dict): The `rateLimit` field of a GraphQL response.
+            resource (str): The resource of the call, "graphql" or "core".
+        """
+        update = {}
+        if headers:
+            resource = headers.get("X-RateLimit-Resource", resource)
+            if headers.get("X-RateLimit-Remaining") is not None:
+                update["remaining"] = int(headers["X-RateLimit-Remaining"])
+            if headers.get("X-RateLimit-Limit") is not None:
+                update["limit"] = int(headers["X-RateLimit-Limit"])
+            if headers.get("X-RateLimit-Reset") is not None:
+                update["reset_at"] = _parse_reset(headers["X-RateLimit-Reset"])
+        if rate_limit:
+            # The GraphQL field is evaluated after the query, so it is the freshest value
+            update["remaining"] = rate_limit.get("remaining", update.get("remaining"))
+            update["cost"] = rate_limit.get("cost", 1)
+            update["reset_at"] = _parse_reset(rate_limit.get("resetAt")) or update.get(
+                "reset_at"
+            )
+        if not update:
+            return
+
+        with self._lock:
+            budget = self._budgets.setdefault((_token_key(token), resource), {"cost": 1})
+            budget.update({k: v for k, v in update.items() if v is not None})
+            budget["updated_at"] = time.time()
+
+    def exhaust(self, token: str, reset_at: float, resource: str = "graphql") -> None:
+        """
+        Record that the budget of a token is spent until a time, after GitHub rejected a call.
+
+        Args:
+            token (str): The access token of the call.
+            reset_at (float): The epoch seconds until which calls are rejected.
+            resource (str): The resource of the call, "graphql" or "core".
+        """
+        with self._lock:
+            budget = self._budgets.setdefault((_token_key(token), resource), {"cost": 1})
+            budget.update({"remaining": 0, "reset_at": reset_at, "updated_at": time.time()})
+
+    def reserve(self, token: str, resource: str = "graphql") -> float:
+        """
+        Reserve the budget of one call.
+
+        Args:
+            token (str): The access token of the call.
+            resource (str): The resource of the call, "graphql" or "core".
+
+        Returns:
+            float: The seconds the call has to wait before it is sent.
+        """
+        now = time.time()
+        with self._lock:
+            budget = self._budgets.get((_token_key(token), resource))
+            if not budget or "remaining" not in budget or not budget.get("reset_at"):
+                return 0.0
+
+            if now >= budget["reset_at"]:
+                # A new window started; the next response tells the new budget
+                return 0.0
+
+            cost = max(budget.get("cost", 1), 1)
+            remaining = budget["remaining"]
+            until_reset = budget["reset_at"] - now
+            if remaining - cost < Config.RATE_LIMIT_RESERVE:
+                # Deferred to the next window, whose budget the next response tells
+                return until_reset + 1
+
+            # Count the call right away, so that concurrent callers see each other
+            budget["remaining"] = remaining - cost
+            if remaining < Config.RATE_LIMIT_PACE_BELOW:
+                return until_reset / max(remaining // cost, 1)
+            return 0.0
+
+    def get_budget(self, token: str) -> dict:
+        """
+        Get the known budget of a token.
+
+        Args:
+            token (str): The access token.
+
+        Returns:
+            dict: The `limit`, `remaining`, `cost` of the last query and `reset_at` time of
+                  each resource with a known budget.
+        """
+        key = _token_key(token)
+        with self._lock:
+            return {
+                resource: dict(budget)
+                for (token_key, resource), budget in self._budgets.items()
+                if token_key == key
+            }
+
+
+_scheduler = RateLimitScheduler()
+
+
+def _wait_time(token: str, resource: str) -> float:
+    delay = _scheduler.reserve(token, resource)
+    if delay > Config.RATE_LIMIT_MAX_WAIT:
+        raise RateLimitExceeded(
+            f"Rate limit of {resource} exhausted for {delay:.0f}s", time.time() + delay
+        )
+    if delay > 1:
+        logging.info("Rate limit: deferring %s call by %.1fs", resource, delay)
+    return delay
+
+
+def acquire(token: str, resource: str = "graphql") -> None:
+    """
+    Wait until a call with the given token is within its budget.
+
+    Args:
+        token (str): The access token of the call.
+        resource (str): The resource of the call, "graphql" or "core".
+
+    Raises:
+        RateLimitExceeded: If the call would have to wait longer than
+                           `Config.RATE_LIMIT_MAX_WAIT` seconds.
+    """
+    delay = _wait_time(token, resource)
+    if delay > 0:
+        time.sleep(delay)
+
+
+async def acquire_async(token: str, resource: str = "graphql") -> None:
+    """
+    Wait until a call with the given token is within its budget, without blocking the loop.
+
+    Args:
+        token (str): The access token of the call.
+        resource (str): The resource of the call, "graphql" or "core".
+
+    Raises:
+        RateLimitExceeded: If the call would have to wait longer than
+                           `Config.RATE_LIMIT_MAX_WAIT` seconds.
+    """
+    delay = _wait_time(token, resource)
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+def observe(
+    token: str, headers: dict = None, rate_limit: dict = None, resource: str = "graphql"
+) -> None:
+    """
+    Update the budget of a token from a response, see `RateLimitScheduler.observe`.
+    """
+    _scheduler.observe(token, headers, rate_limit, resource)
+
+
+def get_budget(token: str) -> dict:
+    """
+    Get the known budget of a token, see `RateLimitScheduler.get_budget`.
+    """
+    return _scheduler.get_budget(token)
+
+
+def check_response(
+    token: str, status: int, headers: dict, body: dict = None, resource: str = "graphql"
+) -> None:
+    """
+    Raise `RateLimitExceeded` if a response was rejected by the rate limit.
+
+    GitHub answers REST calls over the limit with 403 or 429, and GraphQL queries with an
+    error of type RATE_LIMITED. The budget of the token is then spent until the reset, so
+    that concurrent calls wait for it instead of being rejected too.
+
+    Args:
+        token (str): The access token of the call.
+        status (int): The response status code.
+        headers (dict): The response headers.
+        body (dict): The decoded JSON body, if any.
+        resource (str): The resource of the call, "graphql" or "core".
+    """
+    limited = status in (403, 429) and (
+        headers.get("Retry-After") is not None
+        or headers.get("X-RateLimit-Remaining") == "0"
+    )
+    if isinstance(body, dict):
+        limited = limited or any(
+            error.get("type") == "RATE_LIMITED" for error in body.get("errors") or []
+        )
+    if not limited:
+        return
+
+    if headers.get("Retry-After") is not None:
+        reset_at = time.time() + float(headers["Retry-After"])
+    else:
+        reset_at = _parse_reset(headers.get("X-RateLimit-Reset")) or time.time() + 60
+    _scheduler.exhaust(token, reset_at, headers.get("X-RateLimit-Resource", resource))
+    raise RateLimitExceeded(f"Rate limit exceeded, status={status}", reset_at)
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Check whether a failed call is worth retrying: any error but a rate limit that resets
+    later than `Config.RATE_LIMIT_MAX_WAIT` seconds from now. Can be used as a tenacity
+    `retry_if_exception` predicate.
+
+    Args:
+        error (Exception): The error of the call.
+
+    Returns:
+        bool: Whether to retry the call.
+    """
+    if isinstance(error, RateLimitExceeded):
+        return error.reset_at - time.time() <= Config.RATE_LIMIT_MAX_WAIT
+    return True
+
+
+class wait_rate_limit(wait_base):  # pylint: disable=invalid-name
+    """
+    Tenacity wait strategy that sleeps until the reset of the rate limit after a
+    `RateLimitExceeded`, and falls back to another strategy for other errors.
+    """
+
+    def __init__(self, fallback: wait_base):
+        self.fallback = fallback
+
+    def __call__(self, retry_state) -> float:
+        error = retry_state.outcome.exception() if retry_state.outcome else None
+        if isinstance(error, RateLimitExceeded):
+            delay = max(error.reset_at - time.time(), 0) + 1
+            logging.info("Rate limit exceeded: waiting %.1fs for the reset", delay)
+            return min(delay, Config.RATE_LIMIT_MAX_WAIT)
+        return self.fallback(retry_state)
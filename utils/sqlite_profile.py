@@ -0,0 +1,94 @@
+"""
+This module applies the SQLite profile of the report database to its SQLAlchemy engine.
+
+Reports are saved by many background threads at once. With `Config.SQLITE_PROFILE` set to
+"tuned", the database file is opened:
+
+- in WAL mode, so reads do not block the writer and the writer does not block reads;
+- with `synchronous=NORMAL`, which syncs the WAL at checkpoints instead of on every commit,
+  and is still safe against corruption in WAL mode;
+- with a busy timeout, so a writer waits for the lock instead of failing with "database is
+  locked";
+- with a memory map and a larger page cache, so reads of big contexts and facts skip copies;
+
+and the engine pools a few connections, so threads that commit together mostly queue for a
+connection instead of polling for the write lock. "default" keeps the defaults of SQLite and
+SQLAlchemy. In-memory databases and other databases are left alone.
+
+Functions:
+    engine_options(config: dict) -> dict:
+        Get the SQLAlchemy engine options of the SQLite profile.
+    register_pragmas(engine: Engine, config: dict) -> None:
+        Set the pragmas of the SQLite profile on every new connection of an engine.
+"""
+
+import logging
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+from utils.logging_config import setup_logging
+
+setup_logging()
+
+
+def _is_tuned(config: dict) -> bool:
+    """Check whether the tuned profile applies to the database of a configuration."""
+    if config.get("SQLITE_PROFILE") != "tuned":
+        return False
+    url = make_url(config["SQLALCHEMY_DATABASE_URI"])
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+def engine_options(config: dict) -> dict:
+    """
+    Get the SQLAlchemy engine options of the SQLite profile.
+
+    Args:
+        config (dict): The application configuration.
+
+    Returns:
+        dict: The engine options, empty unless the tuned profile applies.
+    """
+    if not _is_tuned(config):
+        return {}
+    timeout = config["SQLITE_BUSY_TIMEOUT"] / 1000
+    return {
+        "pool_size": config["SQLITE_POOL_SIZE"],
+        "max_overflow": config["SQLITE_MAX_OVERFLOW"],
+        # A thread waits for a pooled connection as long as for the lock
+        "pool_timeout": timeout,
+        "connect_args": {"timeout": timeout, "check_same_thread": False},
+    }
+
+
+def register_pragmas(engine: Engine, config: dict) -> None:
+    """
+    Set the pragmas of the SQLite profile on every new connection of an engine.
+
+    Args:
+        engine (Engine): The engine of the database.
+        config (dict): The application configuration.
+    """
+    if not _is_tuned(config):
+        return
+    pragmas = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT'])}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+        # Negative sizes are in KiB instead of pages
+        f"PRAGMA cache_size={-int(config['SQLITE_CACHE_SIZE'])}",
+    )
+
+    def set_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    event.listen(engine, "connect", set_pragmas)
+
+    logging.info("SQLite profile: tuned (%s)", ", ".join(pragmas))
@@ -0,0 +1,234 @@
+"""
+This module maps commit timestamps to local hours and days of a year in bulk.
+
+`TimezoneBuckets` resolves the timezone once and precomputes the UTC offsets in effect around
+the year, so a timestamp is bucketed with integer arithmetic and a table lookup instead of a
+`datetime` per commit. Timestamps outside the table, or not in GitHub's
+"YYYY-MM-DDTHH:MM:SSZ" form, take the `datetime` path and give the same result. With the
+NumPy backend of `calendar_stats`, int64 buffers of epochs are counted per hour as a whole.
+
+Classes:
+    TimezoneBuckets:
+        Local hour and day buckets of a year in a timezone.
+"""
+
+import calendar
+import logging
+import re
+import time
+from array import array
+from bisect import bisect_right
+from datetime import datetime
+
+import pytz
+
+from utils import calendar_stats
+from utils.logging_config import setup_logging
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+setup_logging()
+
+_ISO_UTC = re.compile(r"([0-9]{4}-[0-9]{2}-[0-9]{2})T([0-9]{2}):([0-9]{2}):([0-9]{2})Z")
+
+# Unparsable timestamps count as midnight on 2000-01-01, local time
+_INVALID_LOCAL_EPOCH = calendar.timegm((2000, 1, 1, 0, 0, 0))
+
+# Epoch of unparsable timestamps where None cannot be stored, like int64 columns
+INVALID_EPOCH = -(2 ** 63)
+
+_DAY = 86400
+
+
+class TimezoneBuckets:
+    """
+    Local hour and day buckets of a year in a timezone.
+
+    Args:
+        time_zone (str): The timezone.
+        year (int): The year whose days are indexed.
+    """
+
+    def __init__(self, time_zone: str, year: int):
+        self.timezone = pytz.timezone(time_zone)
+        self.year = year
+        self.year_start = calendar.timegm((year, 1, 1, 0, 0, 0))
+        self.days_in_year = 366 if calendar.isleap(year) else 365
+
+        # Offsets from two days before to two days after the year in UTC, which covers
+        # every commit of the year in any timezone
+        self._start = self.year_start - 2 * _DAY
+        self._end = self.year_start + (self.days_in_year + 2) * _DAY
+        self._transitions, self._offsets = self._offset_table()
+        self._day_starts = {}
+
+    def _offset(self, epoch: int) -> int:
+        return int(
+            datetime.fromtimestamp(epoch, pytz.UTC)
+            .astimezone(self.timezone)
+            .utcoffset()
+            .total_seconds()
+        )
+
+    def _offset_table(self) -> tuple:
+        # Probe the offset daily, then bisect each day it changes in to the second
+        transitions = [self._start]
+        offsets = [self._offset(self._start)]
+        for day_start in range(self._start, self._end, _DAY):
+            day_end = min(day_start + _DAY, self._end)
+            if self._offset(day_end) == offsets[-1]:
+                continue
+            low, high = day_start, day_end
+            while high - low > 1:
+                middle = (low + high) // 2
+                if self._offset(middle) == offsets[-1]:
+                    low = middle
+                else:
+                    high = middle
+            transitions.append(high)
+            offsets.append(self._offset(high))
+        return transitions, offsets
+
+    def _day_start(self, day: str) -> int:
+        # Commits share few days, so each is parsed once; False marks an invalid date
+        start = self._day_starts.get(day)
+        if start is None:
+            try:
+                start = calendar.timegm(time.strptime(day, "%Y-%m-%d"))
+            except ValueError:
+                start = False
+            self._day_starts[day] = start
+        return start
+
+    def _parse(self, date: str) -> int:
+        match = _ISO_UTC.fullmatch(date)
+        if match:
+            day, hour, minute, second = match.groups()
+            day_start = self._day_start(day)
+            hour, minute, second = int(hour), int(minute), int(second)
+            if day_start is not False and hour < 24 and minute < 60 and second < 60:
+                return day_start + hour * 3600 + minute * 60 + second
+
+        try:
+            return calendar.timegm(datetime.strptime(date, "%Y-%m-%dT%H:%M:%SZ").timetuple())
+        except ValueError as e:
+            logging.error("Failed to parse time: %s", e)
+            logging.error("Time: %s", date)
+            return None
+
+    def epochs(self, dates: list) -> list:
+        """
+        Parse UTC timestamps.
+
+        Args:
+            dates (list): The timestamps, like a commit's `committedDate`.
+
+        Returns:
+            list: The epoch seconds of each timestamp, None if it cannot be parsed.
+        """
+        return [self._parse(date) for date in dates]
+
+    def local_epochs(self, epochs: list) -> list:
+        """
+        Shift epoch seconds to the local time of the timezone.
+
+        Args:
+            epochs (list): The epoch seconds, None or `INVALID_EPOCH` for unparsable
+                           timestamps.
+
+        Returns:
+            list: The local seconds since 1970-01-01 00:00 local time of each epoch.
+        """
+        start, end = self._start, self._end
+        transitions, offsets = self._transitions, self._offsets
+        local = []
+        for epoch in epochs:
+            if epoch is None or epoch == INVALID_EPOCH:
+                local.append(_INVALID_LOCAL_EPOCH)
+            elif start <= epoch < end:
+                local.append(epoch + offsets[bisect_right(transitions, epoch) - 1])
+            else:
+                local.append(epoch + self._offset(epoch))
+        return local
+
+    def hours(self, dates: list) -> list:
+        """
+        Get the local hour of UTC timestamps.
+
+        Args:
+            dates (list): The timestamps, like a commit's `committedDate`.
+
+        Returns:
+            list: The local hour (0-23) of each timestamp.
+        """
+        return self.hours_of_epochs(self.epochs(dates))
+
+    def hours_of_epochs(self, epochs: list) -> list:
+        """
+        Get the local hour of epoch seconds. See `hours`.
+        """
+        return [local // 3600 % 24 for local in self.local_epochs(epochs)]
+
+    def hour_counts(self, epochs) -> list:
+        """
+        Count epoch seconds in each local hour.
+
+        Args:
+            epochs (list): The epoch seconds, None or `INVALID_EPOCH` for unparsable
+                           timestamps; an int64 `array` or `memoryview`, like the columns of
+                           a `CommitStore`, is read in place with the NumPy backend.
+
+        Returns:
+            list: The number of epochs in each of the 24 hours.
+        """
+        if not (calendar_stats.use_numpy() and isinstance(epochs, (array, memoryview))):
+            return calendar_stats.hour_histogram(self.hours_of_epochs(epochs))
+
+        values = np.frombuffer(epochs, dtype=np.int64)
+        inside = (values >= self._start) & (values < self._end)
+        local = np.full(len(values), _INVALID_LOCAL_EPOCH, dtype=np.int64)
+        local[inside] = values[inside] + np.asarray(self._offsets, dtype=np.int64)[
+            np.searchsorted(
+                np.asarray(self._transitions, dtype=np.int64), values[inside], side="right"
+            )
+            - 1
+        ]
+        outside = np.flatnonzero(~inside & (values != INVALID_EPOCH))
+        if len(outside):
+            local[outside] = self.local_epochs(values[outside].tolist())
+        return np.bincount(local // 3600 % 24, minlength=24).tolist()
+
+    def days(self, dates: list) -> list:
+        """
+        Get the local day of UTC timestamps in the year.
+
+        Args:
+            dates (list): The timestamps, like a repository's `createdAt`.
+
+        Returns:
+            list: The index of the local day of each timestamp from January 1st of the year,
+                  negative or past the last day for timestamps in other years.
+        """
+        return self.days_of_epochs(self.epochs(dates))
+
+    def days_of_epochs(self, epochs: list) -> list:
+        """
+        Get the local day of epoch seconds in the year. See `days`.
+        """
+        year_start = self.year_start
+        return [(local - year_start) // _DAY for local in self.local_epochs(epochs)]
+
+    def in_year(self, date: str) -> bool:
+        """
+        Check whether a UTC timestamp is in the year, local time.
+
+        Args:
+            date (str): The timestamp.
+
+        Returns:
+            bool: True if the local day of the timestamp is in the year.
+        """
+        return 0 <= self.days([date])[0] < self.days_in_year
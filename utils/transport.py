@@ -0,0 +1,201 @@
+"""
+This module provides a shared, pooled HTTP transport for all GitHub API calls.
+
+A single process-wide `requests.Session` keeps TLS connections to api.github.com alive
+between calls, so paginated GraphQL crawls reuse a handful of sockets instead of opening
+a new connection per request. Every call is measured and added to the transport counters.
+Calls are recorded to or replayed from a cassette when `Config.CASSETTE_MODE` is set.
+
+Functions:
+    get_session() -> requests.Session:
+        Get the process-wide session, creating it on first use.
+    request(method: str, url: str, **kwargs) -> requests.Response:
+        Send a request through the shared session and record its statistics.
+    record_call(sent: int, received: int, elapsed: float, error: bool) -> None:
+        Add a finished call to the transport counters.
+    record_retry() -> None:
+        Count a retry of a GitHub call.
+    get_stats() -> dict:
+        Get a snapshot of the transport counters, totals of all calls of the process.
+    reset_stats() -> None:
+        Reset the transport counters.
+"""
+
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config.config import Config
+from utils import cassette
+
+_session = None
+_session_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {
+    "calls": 0,
+    "errors": 0,
+    "retries": 0,
+    "bytes_sent": 0,
+    "bytes_received": 0,
+    "latency": 0.0,
+}
+
+
+def get_session() -> requests.Session:
+    """
+    Get the process-wide session, creating it on first use.
+
+    Returns:
+        requests.Session: The shared session.
+    """
+    global _session  # pylint: disable=global-statement
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                adapter = HTTPAdapter(
+                    pool_connections=Config.GITHUB_POOL_CONNECTIONS,
+                    pool_maxsize=Config.GITHUB_POOL_SIZE,
+                    pool_block=False,
+                )
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({"Accept-Encoding": "gzip, deflate"})
+                _session = session
+    return _session
+
+
+def _body_size(kwargs: dict) -> int:
+    body = kwargs.get("data")
+    if body is None and kwargs.get("json") is not None:
+        # requests serialises `json` itself; this is an estimate of the payload size
+        body = str(kwargs["json"])
+    if body is None:
+        return 0
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+    return len(str(body).encode("utf-8"))
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    """
+    Send a request through the shared session and record its statistics.
+
+    Args:
+        method (str): The HTTP method.
+        url (str): The request URL.
+        **kwargs: Arguments passed through to `requests.Session.request`.
+
+    Returns:
+        requests.Response: The response.
+    """
+    kwargs.setdefault("timeout", Config.REQUEST_TIMEOUT)
+    sent = _body_size(kwargs)
+    payload = kwargs.get("json", kwargs.get("params"))
+
+    start = time.perf_counter()
+    if cassette.is_replaying():
+        response = _replayed_response(method, url, payload)
+    else:
+        try:
+            response = get_session().request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            record_call(sent, 0, time.perf_counter() - start, error=True)
+            raise
+        if cassette.is_recording():
+            cassette.record(
+                method, url, payload, response.status_code, response.headers, response.content
+            )
+    elapsed = time.perf_counter() - start
+
+    # Content-Length is the compressed size on the wire when gzip is used
+    received = response.headers.get("Content-Length")
+    received = int(received) if received and received.isdigit() else len(response.content)
+
+    record_call(sent, received, elapsed, error=not response.ok)
+    logging.debug(
+        "%s %s: status=%d, sent=%d, received=%d, latency=%.3fs",
+        method,
+        url,
+        response.status_code,
+        sent,
+        received,
+        elapsed,
+    )
+    return response
+
+
+def _replayed_response(method: str, url: str, payload) -> requests.Response:
+    status, headers, content = cassette.replay(method, url, payload)
+    response = requests.Response()
+    response.status_code = status
+    response.headers = headers
+    response._content = content  # pylint: disable=protected-access
+    response.url = url
+    response.request = requests.Request(method, url).prepare()
+    return response
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """Send a GET request through the shared session."""
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    """Send a POST request through the shared session."""
+    return request("POST", url, **kwargs)
+
+
+def put(url: str, **kwargs) -> requests.Response:
+    """Send a PUT request through the shared session."""
+    return request("PUT", url, **kwargs)
+
+
+def record_call(sent: int, received: int, elapsed: float, error: bool = False) -> None:
+    """
+    Add a finished call to the transport counters. Used by clients that do not send
+    through the shared session, such as the asyncio fetch engine.
+    """
+    with _stats_lock:
+        _stats["calls"] += 1
+        _stats["bytes_sent"] += sent
+        _stats["bytes_received"] += received
+        _stats["latency"] += elapsed
+        if error:
+            _stats["errors"] += 1
+
+
+def record_retry(*_args) -> None:
+    """
+    Count a retry of a GitHub call. Can be used directly as a tenacity `before_sleep` hook.
+    """
+    with _stats_lock:
+        _stats["retries"] += 1
+
+
+def get_stats() -> dict:
+    """
+    Get a snapshot of the transport counters, totals of all calls of the process.
+
+    Returns:
+        dict: The number of calls, errors and retries, the bytes sent and received and the
+              total and average latency in seconds.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["average_latency"] = stats["latency"] / stats["calls"] if stats["calls"] else 0.0
+    return stats
+
+
+def reset_stats() -> None:
+    """
+    Reset the transport counters.
+    """
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0.0 if key == "latency" else 0